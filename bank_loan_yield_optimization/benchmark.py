@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+    Benchmark harness for `LoanFacilitiesServer`.
+
+    Times the following stages separately, each repeated `--repeat` times on a fresh server:
+        1. parse: Constructor, i.e. loading and parsing facilities and covenants
+        2. process_loans_stream: Assignment of the full loan stream (including its logging)
+        3. log_loan_assignment: Logging I/O in isolation, replaying the produced assignments
+        4. generate_facility_yield_report: Final report
+
+    Results are written as JSON (min / median / max seconds per stage plus dataset and
+    environment metadata). Passing a previous result file with `--compare` prints per-stage ratios
+    and exits with a non-zero status if any stage regressed by more than `--tolerance`.
+
+    Usage:
+        python generate_data.py --output bench/ --facilities 2000 --loans 500000
+        python benchmark.py --dir bench/ --output bench_before.json
+        python benchmark.py --dir bench/ --output bench_after.json --compare bench_before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from loan_facilities_server import LoanFacilitiesServer
+from vectorized_engine import VectorizedAssignmentEngine
+
+STAGES = ['parse', 'process_loans_stream', 'log_loan_assignment', 'generate_facility_yield_report']
+
+
+def count_rows(csv_filepath):
+    with open(csv_filepath) as csvfile:
+        return sum(1 for _ in csvfile) - 1
+
+
+def run_once(dir_path, engine, output_dir):
+    """
+        Runs and times every stage once
+
+        Arguments:
+            dir_path (string): Directory with facilities, covenants and loans csv
+            engine (string): 'greedy' or 'vectorized'
+            output_dir (string): Scratch directory for outputs
+
+        Returns:
+            timings (dictionary): Seconds per stage
+    """
+    timings = {}
+    assignment_csv_path = os.path.join(output_dir, 'assignment.csv')
+    replay_csv_path = os.path.join(output_dir, 'replay.csv')
+    for csv_filepath in (assignment_csv_path, replay_csv_path):
+        if os.path.exists(csv_filepath):
+            os.remove(csv_filepath)
+
+    start = time.perf_counter()
+    loan_server = LoanFacilitiesServer(os.path.join(dir_path, 'facilities.csv'),
+                                       os.path.join(dir_path, 'covenants.csv'),
+                                       os.path.join(dir_path, 'loans.csv'))
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if engine == 'vectorized':
+        VectorizedAssignmentEngine(loan_server).process_loans_stream(assignment_csv_path)
+    else:
+        loan_server.process_loans_stream(assignment_csv_path)
+    timings['process_loans_stream'] = time.perf_counter() - start
+
+    # Replay produced assignments through the logger alone
+    with open(assignment_csv_path) as csvfile:
+        next(csvfile)
+        assignments = [line.rstrip().split(',') for line in csvfile]
+    start = time.perf_counter()
+    for loan_id, facility_id in assignments:
+        loan_server.log_loan_assignment(replay_csv_path, loan_id, facility_id)
+    loan_server.close_assignment_sinks()
+    timings['log_loan_assignment'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loan_server.generate_facility_yield_report(os.path.join(output_dir, 'yields.csv'))
+    timings['generate_facility_yield_report'] = time.perf_counter() - start
+
+    return timings
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {'min': samples[0], 'median': samples[len(samples) // 2], 'max': samples[-1], 'samples': samples}
+
+
+def compare(results, baseline, tolerance):
+    """
+        Prints per-stage ratios against a baseline result file
+
+        Arguments:
+            results (dictionary)
+            baseline (dictionary)
+            tolerance (float): Allowed relative slowdown of the median, e.g. 0.1 for 10%
+
+        Returns:
+            regressed (list of string): Stages slower than the tolerance allows
+    """
+    regressed = []
+    print('%-32s %12s %12s %8s' % ('stage', 'baseline', 'current', 'ratio'))
+    for stage in STAGES:
+        if stage not in baseline['stages']:
+            continue
+        before = baseline['stages'][stage]['median']
+        after = results['stages'][stage]['median']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressed.append(stage)
+            flag = '  REGRESSION'
+        print('%-32s %12.4f %12.4f %8.2f%s' % (stage, before, after, ratio, flag))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default='large/', help='Directory with facilities, covenants and loans csv')
+    parser.add_argument('--engine', default='greedy', choices=['greedy', 'vectorized'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        runs = [run_once(args.dir, args.engine, output_dir) for _ in range(args.repeat)]
+        assignments = count_rows(os.path.join(output_dir, 'assignment.csv'))
+    finally:
+        shutil.rmtree(output_dir)
+
+    results = {'engine': args.engine,
+               'repeat': args.repeat,
+               'dataset': {'dir': args.dir,
+                           'facilities': count_rows(os.path.join(args.dir, 'facilities.csv')),
+                           'covenants': count_rows(os.path.join(args.dir, 'covenants.csv')),
+                           'loans': count_rows(os.path.join(args.dir, 'loans.csv')),
+                           'assignments': assignments},
+               'environment': {'python': platform.python_version(),
+                               'platform': platform.platform(),
+                               'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+               'stages': {stage: summarize([run[stage] for run in runs]) for stage in STAGES}}
+
+    print(json.dumps(results, indent=4, sort_keys=True))
+    if args.output:
+        with open(args.output, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent=4, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as jsonfile:
+            regressed = compare(results, json.load(jsonfile), args.tolerance)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
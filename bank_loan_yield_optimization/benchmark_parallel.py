@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+    Scaling benchmark for `ParallelAssignmentEngine`.
+
+    Runs the sequential greedy engine once as a baseline, then the parallel engine in exact and
+    relaxed mode for an increasing number of worker processes. Reports wall-clock time, loan
+    throughput, speedup over the baseline and total expected yield.
+
+    Usage:
+        python benchmark_parallel.py --dir large/ --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from loan_facilities_server import LoanFacilitiesServer
+from parallel_engine import EXACT_MODE, RELAXED_MODE, ParallelAssignmentEngine
+
+
+def run_engine(dir_path, engine, workers, chunksize, output_dir):
+    """
+        Runs a single engine configuration on a freshly parsed server
+
+        Arguments:
+            dir_path (string): Directory with facilities, covenants and loans csv
+            engine (string): 'greedy', `EXACT_MODE` or `RELAXED_MODE`
+            workers (integer)
+            chunksize (integer): Loans per chunk
+            output_dir (string): Scratch directory for assignment logs
+
+        Returns:
+            result (dictionary)
+    """
+    loan_server = LoanFacilitiesServer(os.path.join(dir_path, 'facilities.csv'),
+                                       os.path.join(dir_path, 'covenants.csv'),
+                                       os.path.join(dir_path, 'loans.csv'),
+                                       loans_chunksize=chunksize)
+    assignment_csv_path = os.path.join(output_dir, '%s_%d_assignment.csv' % (engine, workers))
+
+    start = time.perf_counter()
+    if engine == 'greedy':
+        loan_server.process_loans_stream(assignment_csv_path)
+    else:
+        ParallelAssignmentEngine(loan_server, workers, engine).process_loans_stream(assignment_csv_path)
+    elapsed = time.perf_counter() - start
+
+    with open(assignment_csv_path) as csvfile:
+        assignments = sum(1 for _ in csvfile) - 1
+    return {'engine': engine,
+            'workers': workers,
+            'seconds': elapsed,
+            'assignments': assignments,
+            'total_yield': sum(f.current_yield for f in loan_server.facilities_list)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default='large/', help='Directory with facilities, covenants and loans csv')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted(set([1, 2, 4, multiprocessing.cpu_count()])))
+    parser.add_argument('--chunksize', type=int, default=4096)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.dir, 'loans.csv')) as csvfile:
+        loans = sum(1 for _ in csvfile) - 1
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        baseline = run_engine(args.dir, 'greedy', 1, args.chunksize, output_dir)
+        results = [baseline]
+        for mode in (EXACT_MODE, RELAXED_MODE):
+            for workers in args.workers:
+                results.append(run_engine(args.dir, mode, workers, args.chunksize, output_dir))
+    finally:
+        shutil.rmtree(output_dir)
+
+    print('%-8s %7s %10s %12s %8s %12s %16s' % ('engine', 'workers', 'seconds', 'loans/s', 'speedup',
+                                               'assignments', 'total_yield'))
+    for result in results:
+        result['speedup'] = baseline['seconds'] / result['seconds']
+        result['loans_per_second'] = loans / result['seconds']
+        print('%-8s %7d %10.3f %12.0f %8.2f %12d %16.2f' % (result['engine'], result['workers'], result['seconds'],
+                                                            result['loans_per_second'], result['speedup'],
+                                                            result['assignments'], result['total_yield']))
+
+    if args.output:
+        with open(args.output, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+    Startup time benchmark for short `LoanFacilitiesServer` invocations.
+
+    Every case runs in a fresh interpreter, timed from the parent process, thus interpreter
+    startup and module imports are included. Cases:
+        1. interpreter: Bare `python -c pass`, the floor of any invocation
+        2. import pandas: Import cost the lean I/O path avoids
+        3. lean: Full greedy run over --dir with `lean_io=True` (stdlib csv)
+        4. pandas: Full greedy run over --dir with `lean_io=False` (`pd.read_csv`)
+
+    Each child also reports whether pandas and numpy ended up imported.
+
+    Usage:
+        python benchmark_startup.py --dir small/ --repeat 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RUN_SERVER = """
+import os, sys
+from loan_facilities_server import LoanFacilitiesServer
+loan_server = LoanFacilitiesServer(os.path.join({dir!r}, 'facilities.csv'), os.path.join({dir!r}, 'covenants.csv'),
+                                   os.path.join({dir!r}, 'loans.csv'), banks_csv_path=os.path.join({dir!r}, 'banks.csv'),
+                                   lean_io={lean_io!r})
+loan_server.process_loans_stream(os.path.join({output_dir!r}, 'assignment.csv'))
+loan_server.generate_facility_yield_report(os.path.join({output_dir!r}, 'yields.csv'))
+loan_server.generate_bank_yield_report(os.path.join({output_dir!r}, 'bank_yields.csv'))
+"""
+REPORT_IMPORTS = """
+import json, sys
+print(json.dumps({'pandas': 'pandas' in sys.modules, 'numpy': 'numpy' in sys.modules}))
+"""
+
+
+def run_case(code, repeat):
+    """
+        Times `code` in fresh interpreters
+
+        Arguments:
+            code (string): Python source run with `python -c`
+            repeat (integer)
+
+        Returns:
+            result (dictionary): min / median seconds and the modules imported
+
+        Raises:
+            subprocess.CalledProcessError: if the child fails
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', code + REPORT_IMPORTS],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    result = json.loads(output.decode().splitlines()[-1])
+    result.update({'min': samples[0], 'median': samples[len(samples) // 2]})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default='small/', help='Directory with banks, facilities, covenants and loans csv')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    dir_path = os.path.abspath(args.dir)
+    output_dir = tempfile.mkdtemp()
+    try:
+        cases = [('interpreter', 'pass'),
+                 ('import pandas', 'import pandas'),
+                 ('lean', RUN_SERVER.format(dir=dir_path, output_dir=output_dir, lean_io=True)),
+                 ('pandas', RUN_SERVER.format(dir=dir_path, output_dir=output_dir, lean_io=False))]
+        results = [dict(run_case(code, args.repeat), case=case) for case, code in cases]
+    finally:
+        shutil.rmtree(output_dir)
+
+    print('%-14s %10s %10s %8s %8s' % ('case', 'min ms', 'median ms', 'pandas', 'numpy'))
+    for result in results:
+        print('%-14s %10.1f %10.1f %8s %8s' % (result['case'], 1000 * result['min'], 1000 * result['median'],
+                                               result['pandas'], result['numpy']))
+
+    if args.output:
+        with open(args.output, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent=4)
+
+
+if __name__ == '__main__':
+    main()
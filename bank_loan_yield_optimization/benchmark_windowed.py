@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+    Yield vs. window size vs. latency benchmark for `WindowedAssignmentEngine`.
+
+    Runs the sequential greedy engine once as a baseline, then the windowed engine for an
+    increasing window size. Reports total expected yield (as computed by
+    `Facility.compute_loan_yield()`) and its gain over greedy, loan throughput, per-window latency
+    (from the first loan of a window arriving until the window is committed) and the number of
+    windows that fell back to greedy because the time budget ran out.
+
+    Windows serve every loan greedy would, thus gains come from placement alone. Pass
+    `--drop-unprofitable` to also leave out loans losing yield, see `WindowedAssignmentEngine`.
+
+    Usage:
+        python generate_data.py --output bench/ --facilities 2000 --loans 200000
+        python benchmark_windowed.py --dir bench/ --window-sizes 1 16 64 256 1024
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from loan_facilities_server import LoanFacilitiesServer
+from windowed_engine import DEFAULT_OPTIONS, DEFAULT_TIME_BUDGET, WindowedAssignmentEngine
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(int(fraction * len(samples)), len(samples) - 1)] if samples else 0.
+
+
+def run_engine(dir_path, window_size, time_budget, options, output_dir, drop_unprofitable=False):
+    """
+        Runs a single engine configuration on a freshly parsed server
+
+        Arguments:
+            dir_path (string): Directory with facilities, covenants and loans csv
+            window_size (integer) or None: None runs the greedy baseline
+            time_budget (float): Solver seconds per window
+            options (integer): Facilities considered per loan
+            output_dir (string): Scratch directory for assignment logs
+            drop_unprofitable (bool): See `WindowedAssignmentEngine`
+
+        Returns:
+            result (dictionary)
+    """
+    loan_server = LoanFacilitiesServer(os.path.join(dir_path, 'facilities.csv'),
+                                       os.path.join(dir_path, 'covenants.csv'),
+                                       os.path.join(dir_path, 'loans.csv'))
+    assignment_csv_path = os.path.join(output_dir, '%s_assignment.csv' % window_size)
+
+    engine = None
+    start = time.perf_counter()
+    if window_size is None:
+        loan_server.process_loans_stream(assignment_csv_path)
+    else:
+        engine = WindowedAssignmentEngine(loan_server, window_size, time_budget=time_budget, options=options,
+                                          drop_unprofitable=drop_unprofitable)
+        engine.process_loans_stream(assignment_csv_path)
+    elapsed = time.perf_counter() - start
+
+    latencies = engine.window_latencies if engine is not None else []
+    return {'engine': 'greedy' if engine is None else 'windowed',
+            'window_size': window_size or 1,
+            'seconds': elapsed,
+            'loans_per_second': loan_server.metrics.counters['loans'] / elapsed,
+            'assignments': loan_server.metrics.counters['assignments'],
+            'total_yield': sum(f.current_yield for f in loan_server.facilities_list),
+            'window_latency_p50': percentile(latencies, 0.5),
+            'window_latency_p99': percentile(latencies, 0.99),
+            'fallbacks': engine.fallbacks if engine is not None else 0,
+            'windows': engine.windows if engine is not None else 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default='large/', help='Directory with facilities, covenants and loans csv')
+    parser.add_argument('--window-sizes', type=int, nargs='+', default=[1, 16, 64, 256, 1024])
+    parser.add_argument('--time-budget', type=float, default=DEFAULT_TIME_BUDGET, help='Solver seconds per window')
+    parser.add_argument('--options', type=int, default=DEFAULT_OPTIONS, help='Facilities considered per loan')
+    parser.add_argument('--drop-unprofitable', action='store_true',
+                        help='Leave loans unassigned that lose yield in every facility')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        baseline = run_engine(args.dir, None, args.time_budget, args.options, output_dir)
+        results = [baseline]
+        for window_size in args.window_sizes:
+            results.append(run_engine(args.dir, window_size, args.time_budget, args.options, output_dir,
+                                      args.drop_unprofitable))
+    finally:
+        shutil.rmtree(output_dir)
+
+    print('%-9s %7s %12s %10s %12s %18s %10s %12s %12s %10s' % (
+        'engine', 'window', 'loans/s', 'seconds', 'assignments', 'total_yield', 'gain %', 'p50 ms', 'p99 ms',
+        'fallbacks'))
+    for result in results:
+        result['yield_gain'] = result['total_yield'] / baseline['total_yield'] - 1 if baseline['total_yield'] else 0.
+        print('%-9s %7d %12.0f %10.3f %12d %18.2f %10.4f %12.3f %12.3f %10d' % (
+            result['engine'], result['window_size'], result['loans_per_second'], result['seconds'],
+            result['assignments'], result['total_yield'], 100 * result['yield_gain'],
+            1000 * result['window_latency_p50'], 1000 * result['window_latency_p99'], result['fallbacks']))
+
+    if args.output:
+        with open(args.output, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent=4)
+
+
+if __name__ == '__main__':
+    main()
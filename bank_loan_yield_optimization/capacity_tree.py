@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+NO_CAPACITY = float('-inf')
+
+
+class CapacityTree(object):
+    """
+        Max segment tree over the remaining balances of an interest-rate-sorted list of facilities.
+
+        Answers "first facility in `facilities_list` order with balance >= amount" in logarithmic
+        time. Every internal node holds the largest balance in its range, thus ranges of drained
+        facilities are pruned from the search with a single comparison.
+
+        Layout: implicit binary tree in a flat list. Root at index 1, leaves at
+        `[leaf_offset, leaf_offset + len(facilities_list))`, padding leaves hold `NO_CAPACITY`.
+        Any indexable sequence of floats works as storage, e.g. a shared-memory array.
+
+        NOTE: Leaves are refreshed from the live `Facility` objects. Callers must `update()` a
+        position after its balance changed; `find_facility()` also verifies its answer against the
+        live balance and repairs stale leaves on the fly.
+
+        Idempotent Interfaces:
+            CapacityTree(): Constructor that builds the tree from facility balances
+            capacity(): Balance held by a leaf
+            max_capacity(): Largest balance of all facilities
+            first_at_least(): First position at or after `start` with balance >= amount
+
+        Non-Idempotent Interfaces:
+            build(): (Re)builds the whole tree from facility balances
+            insert(): Accounts a facility inserted into `facilities_list`
+            update(): Refreshes a leaf and its ancestors from the facility balance
+            set_capacity(): Sets a leaf and refreshes its ancestors
+            find_facility(): First candidate position with balance >= amount
+    """
+
+    def __init__(self, facilities_list):
+        """
+            Constructor for `CapacityTree`
+
+            Arguments:
+                facilities_list (list of Facility objects): Sorted in assignment preference order
+
+            Returns:
+                `CapacityTree` object
+        """
+        self.facilities_list = facilities_list
+        # Number of candidate facilities examined by `find_facility()`, for instrumentation
+        self.probes = 0
+        self.build()
+
+    def build(self):
+        """
+            (Re)builds the whole tree from facility balances
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                Replaces `self.tree`
+        """
+        facilities_list = self.facilities_list
+        self.leaf_offset = 1
+        while self.leaf_offset < len(facilities_list):
+            self.leaf_offset *= 2
+
+        self.tree = [NO_CAPACITY] * (2 * self.leaf_offset)
+        for position, facility in enumerate(facilities_list):
+            self.tree[self.leaf_offset + position] = facility.balance_amount
+        for node in reversed(range(1, self.leaf_offset)):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def insert(self, position):
+        """
+            Accounts a facility inserted into `facilities_list` at `position`: leaves from
+            `position` onwards shift right by one and only their ancestors are recomputed. The
+            tree doubles (and is rebuilt) once its padding leaves are used up.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                position (integer): Position of the new facility in `facilities_list`
+
+            Returns:
+                None
+
+            Side Effects:
+                Updates `self.tree`
+        """
+        facilities_list = self.facilities_list
+        if len(facilities_list) > self.leaf_offset:
+            self.build()
+            return
+
+        tree = self.tree
+        first = self.leaf_offset + position
+        last = self.leaf_offset + len(facilities_list) - 1
+        for node in range(first, last + 1):
+            tree[node] = facilities_list[node - self.leaf_offset].balance_amount
+        first >>= 1
+        last >>= 1
+        while first:
+            for node in range(first, last + 1):
+                tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            first >>= 1
+            last >>= 1
+
+    def update(self, position):
+        """
+            Refreshes the leaf at `position` from its facility balance and propagates the new
+            maximum towards the root
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                position (integer): Position in `facilities_list`
+
+            Returns:
+                None
+
+            Side Effects:
+                Updates `self.tree`
+        """
+        self.set_capacity(position, self.facilities_list[position].balance_amount)
+
+    def set_capacity(self, position, balance):
+        """
+            Sets the leaf at `position` and propagates the new maximum towards the root
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                position (integer): Position in `facilities_list`
+                balance (float)
+
+            Returns:
+                None
+
+            Side Effects:
+                Updates `self.tree`
+        """
+        tree = self.tree
+        node = self.leaf_offset + position
+        tree[node] = balance
+        node >>= 1
+        while node:
+            capacity = max(tree[2 * node], tree[2 * node + 1])
+            if tree[node] == capacity:
+                break
+            tree[node] = capacity
+            node >>= 1
+
+    def capacity(self, position):
+        """
+            Balance held by the leaf at `position`
+
+            Arguments:
+                position (integer): Position in `facilities_list`
+
+            Returns:
+                balance (float)
+        """
+        return self.tree[self.leaf_offset + position]
+
+    def max_capacity(self):
+        """
+            Largest balance of all facilities, read from the root in constant time
+
+            Arguments:
+                None
+
+            Returns:
+                balance (float): `NO_CAPACITY` if there are no facilities
+        """
+        return self.tree[1]
+
+    def first_at_least(self, amount, start=0):
+        """
+            Finds the first position at or after `start` whose balance is at least `amount`
+
+            Arguments:
+                amount (float)
+                start (integer): Position in `facilities_list`
+
+            Returns:
+                position (integer) or None
+        """
+        if start >= self.leaf_offset:
+            return None
+
+        tree = self.tree
+        node = self.leaf_offset + start
+        while tree[node] < amount:
+            # Climb while `node` is a right child, then step to the adjacent range on the right
+            while node & 1:
+                node >>= 1
+            if not node:
+                return None
+            node += 1
+
+        # Descend into the leftmost child with enough capacity
+        while node < self.leaf_offset:
+            node *= 2
+            if tree[node] < amount:
+                node += 1
+        return node - self.leaf_offset
+
+    def find_facility(self, amount, candidates):
+        """
+            Finds the first candidate facility with balance >= amount by leapfrogging between the
+            candidates bitmap and the tree.
+
+            Arguments:
+                amount (float)
+                candidates (integer bitmap): Bit `i` set if `facilities_list[i]` is a candidate
+
+            Returns:
+                position (integer) or None: Position in `facilities_list`
+
+            Side Effects:
+                Repairs leaves found to be stale
+        """
+        # NOTE: Capacity is not a constraint for non-positive (or NaN) amounts
+        if not amount > 0:
+            return (candidates & -candidates).bit_length() - 1 if candidates else None
+
+        position = 0
+        while True:
+            self.probes += 1
+            position = self.first_at_least(amount, position)
+            if position is None:
+                return None
+
+            # Skip ahead to the next candidate at or after `position`
+            remaining = candidates >> position
+            if not remaining:
+                return None
+            offset = (remaining & -remaining).bit_length() - 1
+            if offset:
+                position += offset
+                continue
+
+            # Guard against balances changed without an `update()`
+            if amount > self.facilities_list[position].balance_amount:
+                self.update(position)
+                continue
+
+            return position
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+    Regression check of worker failures in `ParallelAssignmentEngine`.
+
+    A worker process is killed while it commits a given loan. The stream must fail with a
+    `RuntimeError` within a deadline, in exact and relaxed mode, instead of waiting forever for the
+    dead worker. Exits with status 1 on the first failure.
+
+    Usage:
+        python check_parallel_failure.py --dir large/ --workers 2 --kill-loan 200
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import sys
+import tempfile
+
+from loan_facilities_server import LoanFacilitiesServer
+from parallel_engine import EXACT_MODE, RELAXED_MODE, ParallelAssignmentEngine
+
+
+class FailingEngine(ParallelAssignmentEngine):
+    """
+        `ParallelAssignmentEngine` whose worker dies on a given loan
+
+        Idempotent Interfaces:
+            FailingEngine(): Constructor
+
+        Non-Idempotent Interfaces:
+            reserve_and_commit(): Exits the worker process on `kill_loan_id`
+    """
+
+    def __init__(self, loan_server, workers, mode, kill_loan_id):
+        super(FailingEngine, self).__init__(loan_server, workers, mode)
+        self.kill_loan_id = kill_loan_id
+
+    def reserve_and_commit(self, loan_request, candidates):
+        if loan_request.loan_id == self.kill_loan_id:
+            os._exit(1)
+        return super(FailingEngine, self).reserve_and_commit(loan_request, candidates)
+
+
+def on_deadline(signum, frame):
+    raise AssertionError('Stream did not fail within the deadline')
+
+
+def check_mode(dir_path, mode, workers, kill_loan_id, chunksize, deadline, output_dir):
+    """
+        Runs the failing engine once
+
+        Arguments:
+            dir_path (string): Directory with facilities, covenants and loans csv
+            mode (string): `EXACT_MODE` or `RELAXED_MODE`
+            workers (integer)
+            kill_loan_id (integer)
+            chunksize (integer): Loans per chunk
+            deadline (integer): Seconds the stream may take to fail
+            output_dir (string): Scratch directory for assignment logs
+
+        Returns:
+            error (string) or None: None if the stream failed as expected
+    """
+    loan_server = LoanFacilitiesServer(os.path.join(dir_path, 'facilities.csv'),
+                                       os.path.join(dir_path, 'covenants.csv'),
+                                       os.path.join(dir_path, 'loans.csv'),
+                                       loans_chunksize=chunksize)
+    engine = FailingEngine(loan_server, workers, mode, kill_loan_id)
+    signal.signal(signal.SIGALRM, on_deadline)
+    signal.alarm(deadline)
+    try:
+        engine.process_loans_stream(os.path.join(output_dir, '%s_assignment.csv' % mode))
+    except RuntimeError:
+        return None
+    except AssertionError as error:
+        return str(error)
+    finally:
+        signal.alarm(0)
+    return 'Stream completed although a worker died'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Regression check of parallel engine worker failures')
+    parser.add_argument('--dir', default='large/', help='Directory with facilities, covenants and loans csv')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--kill-loan', type=int, default=200, help='Id of the loan whose worker dies')
+    parser.add_argument('--chunksize', type=int, default=16, help='Loans per chunk')
+    parser.add_argument('--deadline', type=int, default=30, help='Seconds the stream may take to fail')
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        failures = 0
+        for mode in [EXACT_MODE, RELAXED_MODE]:
+            error = check_mode(args.dir, mode, args.workers, args.kill_loan, args.chunksize, args.deadline,
+                               output_dir)
+            print('%s: %s' % (mode, error or 'ok'))
+            failures += error is not None
+    finally:
+        shutil.rmtree(output_dir)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+    Compact binary checkpoints of facility state.
+
+    Layout (little endian):
+        header: magic (8 bytes), number of facilities, loans processed, last processed loan id,
+                assignment log offset (bytes), payload crc32
+        payload: facility ids (int64), balances (float64), yields (float64), loan counts (int64),
+                 then optionally the state exposures of facilities with stateful covenants as a JSON
+                 list of [facility id, state, amount]
+
+    A checkpoint is written to a temporary file, synced and atomically renamed over the previous
+    one, thus a crash while checkpointing leaves the last complete checkpoint in place.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+from array import array
+
+CHECKPOINT_MAGIC = b'LFSCKPT1'
+HEADER_FORMAT = '<8sqqqqI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+NO_LOAN_ID = -1
+
+
+def write_checkpoint(checkpoint_path, facilities_list, facility_loans, loans_processed, last_loan_id,
+                     assignment_log_offset):
+    """
+        Atomically writes a checkpoint of facility state
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            checkpoint_path (string)
+            facilities_list (list of Facility objects)
+            facility_loans (dictionary): Number of loans issued by facility_id
+            loans_processed (integer): Number of loans consumed from the loans stream
+            last_loan_id (integer): Id of the last processed loan, `NO_LOAN_ID` if none
+            assignment_log_offset (integer): Size of the assignment log covering these loans
+
+        Returns:
+            None
+
+        Raises:
+            OSError: if checkpoint_path is not accessible
+
+        Side Effects:
+            Writing to a file
+    """
+    # NOTE: Exposures only matter to stateful covenants, other facilities are left out
+    exposures = [[f.facility_id, state, amount] for f in facilities_list if f.has_stateful_covenants()
+                 for state, amount in f.state_exposures.items()]
+    payload = b''.join([array('q', [f.facility_id for f in facilities_list]).tobytes(),
+                        array('d', [f.balance_amount for f in facilities_list]).tobytes(),
+                        array('d', [f.current_yield for f in facilities_list]).tobytes(),
+                        array('q', [facility_loans[f.facility_id] for f in facilities_list]).tobytes(),
+                        json.dumps(exposures).encode() if exposures else b''])
+    header = struct.pack(HEADER_FORMAT, CHECKPOINT_MAGIC, len(facilities_list), loans_processed, last_loan_id,
+                         assignment_log_offset, zlib.crc32(payload))
+
+    temporary_path = checkpoint_path + '.tmp'
+    with open(temporary_path, 'wb') as checkpoint_file:
+        checkpoint_file.write(header + payload)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary_path, checkpoint_path)
+
+
+def read_checkpoint(checkpoint_path):
+    """
+        Reads a checkpoint written by `write_checkpoint()`
+
+        Arguments:
+            checkpoint_path (string)
+
+        Returns:
+            checkpoint (dictionary): `facility_ids`, `balances`, `yields`, `facility_loans` (lists in
+                checkpointed facility order), `state_exposures` (amount by state by facility_id),
+                `loans_processed`, `last_loan_id` and `assignment_log_offset`
+
+        Raises:
+            OSError: if checkpoint_path is not accessible
+            ValueError: if the file is not a valid checkpoint
+    """
+    with open(checkpoint_path, 'rb') as checkpoint_file:
+        content = checkpoint_file.read()
+
+    if len(content) < HEADER_SIZE:
+        raise ValueError('Truncated checkpoint: %s' % checkpoint_path)
+    magic, facilities, loans_processed, last_loan_id, assignment_log_offset, crc = struct.unpack_from(
+        HEADER_FORMAT, content)
+    payload = content[HEADER_SIZE:]
+    if magic != CHECKPOINT_MAGIC or len(payload) < 32 * facilities or zlib.crc32(payload) != crc:
+        raise ValueError('Corrupt checkpoint: %s' % checkpoint_path)
+
+    columns = []
+    for column, typecode in enumerate('qddq'):
+        values = array(typecode)
+        values.frombytes(payload[column * 8 * facilities:(column + 1) * 8 * facilities])
+        columns.append(values.tolist())
+
+    state_exposures = {}
+    if len(payload) > 32 * facilities:
+        for facility_id, state, amount in json.loads(payload[32 * facilities:].decode()):
+            state_exposures.setdefault(facility_id, {})[state] = amount
+
+    return {'facility_ids': columns[0],
+            'balances': columns[1],
+            'yields': columns[2],
+            'facility_loans': columns[3],
+            'state_exposures': state_exposures,
+            'loans_processed': loans_processed,
+            'last_loan_id': last_loan_id,
+            'assignment_log_offset': assignment_log_offset}
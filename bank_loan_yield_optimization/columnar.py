@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+    Columnar binary input format for `LoanFacilitiesServer`.
+
+    A table (facilities, covenants, banks or loans) is stored as an uncompressed NumPy `.npz`
+    archive holding one `.npy` array per column, in csv column order. Members of an uncompressed
+    archive are stored verbatim, thus each column is memory-mapped in place: loading a table
+    costs no parsing and no copies, rows are only materialized chunk by chunk.
+
+    Column types are the ones `pd.read_csv` infers for the csv layout. Text columns are stored
+    as fixed width unicode arrays, with missing values stored as empty strings.
+
+    Usage:
+        python columnar.py large/                      # Converts the input tables in large/
+        python columnar.py large/loans.csv --output loans.npz
+"""
+
+import argparse
+import collections
+import os.path
+import struct
+import utils
+import zipfile
+
+COLUMNAR_SUFFIX = '.npz'
+CSV_SUFFIX = '.csv'
+INPUT_TABLES = ['banks', 'covenants', 'facilities', 'loans']
+ZIP_LOCAL_HEADER_SIZE = 30
+
+np = utils.LazyModule('numpy')
+pd = utils.LazyModule('pandas')
+
+
+def is_columnar(path):
+    return path.endswith(COLUMNAR_SUFFIX)
+
+
+def preferred_path(csv_filepath):
+    """
+        Prefers a columnar copy of a csv input, i.e. `loans.npz` next to `loans.csv`, if present
+        and not older than the csv. A csv modified after its conversion is read as csv, thus a
+        stale copy never shadows it.
+
+        Arguments:
+            csv_filepath (string)
+
+        Returns:
+            path (string): Columnar path if it exists and is up to date, csv_filepath otherwise
+    """
+    if csv_filepath.endswith(CSV_SUFFIX):
+        columnar_path = csv_filepath[:-len(CSV_SUFFIX)] + COLUMNAR_SUFFIX
+        if os.path.exists(columnar_path) and \
+                (not os.path.exists(csv_filepath) or os.path.getmtime(columnar_path) >= os.path.getmtime(csv_filepath)):
+            return columnar_path
+    return csv_filepath
+
+
+def write_columns(npz_filepath, table_df):
+    """
+        Writes a dataframe as a columnar `.npz` archive
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            npz_filepath (string)
+            table_df (dataframe)
+
+        Returns:
+            None
+
+        Raises:
+            OSError: if npz_filepath is not accessible
+
+        Side Effects:
+            Writing to a file
+    """
+    columns = collections.OrderedDict()
+    for name in table_df.columns:
+        values = table_df[name].values
+        if values.dtype.hasobject:
+            # Pickled objects cannot be memory-mapped
+            values = table_df[name].fillna('').astype(str).values.astype(np.str_)
+        columns[str(name)] = values
+    # NOTE: Uncompressed on purpose, see `load_columns()`
+    with open(npz_filepath, 'wb') as npzfile:
+        np.savez(npzfile, **columns)
+
+
+def load_columns(npz_filepath):
+    """
+        Memory-maps every column of a columnar `.npz` archive without reading it
+
+        Arguments:
+            npz_filepath (string)
+
+        Returns:
+            columns (OrderedDict): Read-only array by column name, in csv column order
+
+        Raises:
+            OSError: if npz_filepath is not accessible
+            ValueError: if the archive is compressed or holds object arrays
+    """
+    columns = collections.OrderedDict()
+    with zipfile.ZipFile(npz_filepath) as archive, open(npz_filepath, 'rb') as npzfile:
+        for member in archive.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('Compressed columnar archive: %s' % npz_filepath)
+
+            # Skip the zip local file header to the embedded `.npy` member
+            npzfile.seek(member.header_offset)
+            name_length, extra_length = struct.unpack('<HH', npzfile.read(ZIP_LOCAL_HEADER_SIZE)[26:30])
+            npzfile.seek(member.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length)
+            version = np.lib.format.read_magic(npzfile)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npzfile)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npzfile)
+            if dtype.hasobject:
+                raise ValueError('Object column %s in %s' % (member.filename, npz_filepath))
+
+            name = member.filename[:-len('.npy')]
+            if not np.prod(shape):
+                columns[name] = np.empty(shape, dtype)  # Empty files cannot be mapped
+            else:
+                columns[name] = np.memmap(npz_filepath, dtype=dtype, mode='r', offset=npzfile.tell(), shape=shape,
+                                          order='F' if fortran_order else 'C')
+    return columns
+
+
+def column_rows(columns):
+    return len(next(iter(columns.values()))) if columns else 0
+
+
+def columns_to_frame(columns, start=0, stop=None):
+    """
+        Materializes rows `start:stop` of memory-mapped columns as a dataframe, restoring missing
+        text values the way `pd.read_csv` reads them
+
+        Arguments:
+            columns (OrderedDict)
+            start (integer)
+            stop (integer) or None
+
+        Returns:
+            table_df (dataframe)
+    """
+    frame_columns = collections.OrderedDict()
+    for name, values in columns.items():
+        values = np.array(values[start:stop])
+        if values.dtype.kind == 'U':
+            values = values.astype(object)
+            values[values == ''] = np.nan
+        frame_columns[name] = values
+    return pd.DataFrame(frame_columns)
+
+
+def read_frame(path):
+    """
+        Reads a whole csv or columnar table as a dataframe, depending on the path suffix
+
+        Arguments:
+            path (string)
+
+        Returns:
+            table_df (dataframe)
+
+        Raises:
+            OSError: if path is not accessible
+    """
+    if is_columnar(path):
+        return columns_to_frame(load_columns(path))
+    return pd.read_csv(path)
+
+
+def iter_frames(columns, chunksize, start=0):
+    """
+        Streams rows of memory-mapped columns as dataframe chunks, starting at row `start`
+
+        Arguments:
+            columns (OrderedDict)
+            chunksize (integer)
+            start (integer)
+
+        Returns:
+            generator of dataframe
+    """
+    rows = column_rows(columns)
+    for chunk_start in range(start, rows, chunksize):
+        yield columns_to_frame(columns, chunk_start, min(chunk_start + chunksize, rows))
+
+
+def convert_csv(csv_filepath, npz_filepath=None):
+    """
+        One-shot conversion of a csv table to the columnar format
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            csv_filepath (string)
+            npz_filepath (string) or None: Defaults to csv_filepath with a `.npz` suffix
+
+        Returns:
+            npz_filepath (string)
+
+        Raises:
+            OSError: if any of the files are not accessible
+
+        Side Effects:
+            Writing to a file
+    """
+    if npz_filepath is None:
+        npz_filepath = os.path.splitext(csv_filepath)[0] + COLUMNAR_SUFFIX
+    write_columns(npz_filepath, pd.read_csv(csv_filepath))
+    return npz_filepath
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='csv file, or directory whose input tables are converted')
+    parser.add_argument('--output', help='Output path when converting a single csv file')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input):
+        print('%s -> %s' % (args.input, convert_csv(args.input, args.output)))
+        return
+
+    for table in INPUT_TABLES:
+        csv_filepath = os.path.join(args.input, table + CSV_SUFFIX)
+        if os.path.exists(csv_filepath):
+            print('%s -> %s' % (csv_filepath, convert_csv(csv_filepath)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+
+import operator
+import utils
+
+from bisect import bisect_left
+
+from covenants import COVENANT_TYPES, ThresholdIndex
+
+np = utils.LazyModule('numpy')
+pd = utils.LazyModule('pandas')
+
+
+class CovenantIndex(object):
+    """
+        Precomputed covenant index over an interest-rate-sorted list of facilities.
+
+        Facilities are addressed by their position in `facilities_list` and sets of facilities are
+        represented as bitmaps (arbitrary precision integers, bit `i` <=> `facilities_list[i]`):
+            1. Per-state eligibility bitmap: facilities that do _not_ ban the state
+            2. Default likelihood buckets: distinct `max_default_likelihood` thresholds in
+               ascending order, each with a bitmap of facilities allowing at least that threshold
+            3. Pluggable covenant types: one `ThresholdIndex` per type in `covenants.COVENANT_TYPES`
+               used by at least one facility
+
+        A loan intersects its state, likelihood and covenant type bitmaps. The lowest set bit is
+        the cheapest facility passing its covenants. `candidates_batch()` does the same for a
+        batch of loans, computing buckets with vectorized searches and intersecting bitmaps once
+        per distinct combination of buckets. Balances are dynamic and thus not part of this index,
+        see `CapacityTree`. Neither are the dynamic parts of stateful covenant types:
+        `stateful_mask` flags the facilities that must still be checked with
+        `Facility.is_valid_assignment()` once a search settles on them.
+
+        Global bounds reject impossible loans without touching any bitmap:
+            1. `max_default_likelihood`: highest `max_default_likelihood` across facilities
+            2. `banned_everywhere`: states banned by every facility
+
+        Idempotent Interfaces:
+            CovenantIndex(): Constructor that builds the bitmaps
+            candidates(): Bitmap of facilities passing a loan's static covenants
+            candidates_batch(): Candidate bitmaps for a batch of loans
+            candidates_requests(): Candidate bitmaps for a batch of parsed loans
+            covenant_rejection(): First covenant type no facility admits
+            covenant_rejections(): Vectorized `covenant_rejection()`
+            covenant_rejection_requests(): `covenant_rejection()` for a batch of parsed loans
+
+        Non-Idempotent Interfaces:
+            insert(): Accounts a facility inserted into `facilities_list`
+    """
+
+    def __init__(self, facilities_list):
+        """
+            Constructor for `CovenantIndex`
+
+            Arguments:
+                facilities_list (list of Facility objects): Sorted in assignment preference order
+
+            Returns:
+                `CovenantIndex` object
+        """
+        self.facilities_list = facilities_list
+        self.all_mask = (1 << len(facilities_list)) - 1
+
+        # Per-state eligibility bitmaps. States not banned by any facility map to `all_mask`
+        self.state_masks = {}
+        for position, facility in enumerate(facilities_list):
+            for state in facility.banned_states:
+                self.state_masks[state] = self.state_masks.get(state, self.all_mask) & ~(1 << position)
+
+        # Default likelihood buckets. `likelihood_masks[k]` holds all facilities whose
+        # `max_default_likelihood` is at least `likelihood_thresholds[k]`
+        self.likelihood_thresholds = sorted(set(f.max_default_likelihood for f in facilities_list))
+        self.likelihood_masks = [0] * (len(self.likelihood_thresholds) + 1)
+        for position, facility in enumerate(facilities_list):
+            bucket = bisect_left(self.likelihood_thresholds, facility.max_default_likelihood)
+            self.likelihood_masks[bucket] |= 1 << position
+        for bucket in reversed(range(len(self.likelihood_thresholds))):
+            self.likelihood_masks[bucket] |= self.likelihood_masks[bucket + 1]
+
+        # Pluggable covenant types, only those constraining some facility are compiled
+        self.threshold_indexes = []
+        for covenant in COVENANT_TYPES:
+            if any(covenant.column in facility.covenant_limits for facility in facilities_list):
+                self.threshold_indexes.append(self.compile(covenant))
+
+        # Facilities carrying a stateful covenant type, see `covenants.py`
+        self.stateful_mask = 0
+        for position, facility in enumerate(facilities_list):
+            if facility.has_stateful_covenants():
+                self.stateful_mask |= 1 << position
+
+        # Global bounds
+        self.max_default_likelihood = self.likelihood_thresholds[-1] if self.likelihood_thresholds else float('-inf')
+        self.banned_everywhere = set(state for state, mask in self.state_masks.items()
+                                     if not mask and isinstance(state, str))
+
+        # Bitmaps by state code for `candidates_batch()`, see `state_codes()`
+        self.state_table = None
+
+    def compile(self, covenant):
+        return ThresholdIndex(covenant, [facility.covenant_limits.get(covenant.column)
+                                         for facility in self.facilities_list])
+
+    def insert(self, position, facility):
+        """
+            Accounts a facility inserted into `facilities_list` at `position`. Every bitmap is
+            split at `position` and its upper part shifted left by one bit to make room for the
+            new facility, so no bitmap is rebuilt from `facilities_list`.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                position (integer): Position of the new facility in `facilities_list`
+                facility (Facility)
+
+            Returns:
+                None
+
+            Side Effects:
+                Updates bitmaps, thresholds and global bounds
+        """
+        bit = 1 << position
+        low_mask = bit - 1
+
+        def shift(mask, eligible):
+            return (mask & low_mask) | ((mask & ~low_mask) << 1) | (bit if eligible else 0)
+
+        self.all_mask = shift(self.all_mask, True)
+        banned_states = set(facility.banned_states)
+        for state, mask in self.state_masks.items():
+            self.state_masks[state] = shift(mask, state not in banned_states)
+        for state in banned_states:
+            if state not in self.state_masks:
+                self.state_masks[state] = self.all_mask & ~bit
+
+        # A new threshold starts out with the facilities allowing the next higher threshold
+        bucket = bisect_left(self.likelihood_thresholds, facility.max_default_likelihood)
+        if bucket == len(self.likelihood_thresholds) or \
+                self.likelihood_thresholds[bucket] != facility.max_default_likelihood:
+            self.likelihood_thresholds.insert(bucket, facility.max_default_likelihood)
+            self.likelihood_masks.insert(bucket, self.likelihood_masks[bucket])
+        self.likelihood_masks = [shift(mask, k <= bucket) for k, mask in enumerate(self.likelihood_masks)]
+
+        compiled = set()
+        for threshold_index in self.threshold_indexes:
+            threshold_index.insert(position, facility.covenant_limits.get(threshold_index.covenant.column), shift)
+            compiled.add(threshold_index.covenant.column)
+        if not set(facility.covenant_limits) <= compiled:
+            # First facility using a covenant type, `facilities_list` already holds it
+            self.threshold_indexes = [self.compile(covenant) for covenant in COVENANT_TYPES
+                                      if covenant.column in compiled or covenant.column in facility.covenant_limits]
+        self.stateful_mask = shift(self.stateful_mask, facility.has_stateful_covenants())
+
+        # Global bounds
+        self.max_default_likelihood = self.likelihood_thresholds[-1]
+        self.banned_everywhere = set(state for state in banned_states
+                                     if not self.state_masks[state] and isinstance(state, str))
+        self.state_table = None
+
+    def candidates(self, loan_request):
+        """
+            Computes the bitmap of facilities passing a loan's static covenants
+
+            Arguments:
+                loan_request (LoanRequest)
+
+            Returns:
+                candidates (integer bitmap)
+        """
+        state_mask = self.state_masks.get(loan_request.origin_state, self.all_mask)
+        likelihood_mask = self.likelihood_masks[bisect_left(self.likelihood_thresholds,
+                                                            loan_request.default_likelihood)]
+        candidates = state_mask & likelihood_mask
+        for threshold_index in self.threshold_indexes:
+            candidates &= threshold_index.mask(getattr(loan_request, threshold_index.covenant.loan_attribute))
+        return candidates
+
+    def state_codes(self, origin_states):
+        """
+            Codes origin states as rows of `self.state_table`, the last row holding `all_mask` for
+            states no facility bans
+
+            Arguments:
+                origin_states (series of string)
+
+            Returns:
+                codes (numpy integer array)
+        """
+        if self.state_table is None:
+            # NOTE: Loan states are parsed as strings, other keys (e.g. NaN) never match
+            states = [state for state in self.state_masks if isinstance(state, str)]
+            self.state_keys = pd.Index(states)
+            self.state_table = [self.state_masks[state] for state in states] + [self.all_mask]
+        codes = self.state_keys.get_indexer(origin_states)
+        codes[codes < 0] = len(self.state_table) - 1
+        return codes
+
+    def bucket_codes(self, loans_df):
+        """
+            Bucket of every loan of a batch for each bitmap family: states, likelihood buckets and
+            pluggable covenant types, in that order
+
+            Arguments:
+                loans_df (dataframe)
+
+            Returns:
+                codes (numpy integer array of shape (loans, families))
+        """
+        default_likelihoods = loans_df.default_likelihood.values.astype(float)
+        codes = [self.state_codes(loans_df.state.astype(str)),
+                 # NOTE: Mirrors `bisect_left()`, which puts NaN in the first bucket
+                 np.where(np.isnan(default_likelihoods), 0,
+                          np.searchsorted(np.array(self.likelihood_thresholds, dtype=float), default_likelihoods))]
+        for threshold_index in self.threshold_indexes:
+            codes.append(threshold_index.buckets(loans_df[threshold_index.covenant.loan_attribute].values.astype(float)))
+        return np.stack(codes, axis=1)
+
+    def candidates_batch(self, loans_df):
+        """
+            Computes the candidate bitmaps of a batch of loans, see `candidates()`. Buckets are
+            computed with one vectorized search per bitmap family, then bitmaps are intersected
+            once per distinct combination of buckets, thus the per-loan cost does not depend on
+            the number of covenant types.
+
+            Arguments:
+                loans_df (dataframe): Loans with `state`, `default_likelihood` and the loan columns
+                    of the compiled covenant types
+
+            Returns:
+                candidates (list of integer bitmap): One per loan, in loans_df order
+        """
+        if not len(loans_df):
+            return []
+        combinations, inverse = np.unique(self.bucket_codes(loans_df), axis=0, return_inverse=True)
+        families = [self.state_table, self.likelihood_masks] + \
+            [threshold_index.masks for threshold_index in self.threshold_indexes]
+        combination_masks = []
+        for combination in combinations.tolist():
+            candidates = self.all_mask
+            for masks, code in zip(families, combination):
+                candidates &= masks[code]
+            combination_masks.append(candidates)
+        return [combination_masks[i] for i in inverse.ravel().tolist()]
+
+    def candidates_requests(self, loan_requests):
+        """
+            Computes the candidate bitmaps of a batch of parsed loans, see `candidates()`. Bitmaps
+            are looked up family by family over the whole batch, as in `candidates_batch()`, but
+            without dataframes (see `lean_csv.py`).
+
+            Arguments:
+                loan_requests (list of LoanRequest objects)
+
+            Returns:
+                candidates (list of integer bitmap): One per loan, in loan_requests order
+        """
+        all_mask = self.all_mask
+        state_masks = self.state_masks
+        candidates = [state_masks.get(loan_request.origin_state, all_mask) for loan_request in loan_requests]
+
+        likelihood_masks = self.likelihood_masks
+        likelihood_thresholds = self.likelihood_thresholds
+        candidates = [mask & likelihood_masks[bisect_left(likelihood_thresholds, loan_request.default_likelihood)]
+                      for mask, loan_request in zip(candidates, loan_requests)]
+
+        for threshold_index in self.threshold_indexes:
+            values = map(operator.attrgetter(threshold_index.covenant.loan_attribute), loan_requests)
+            candidates = list(map(operator.and_, candidates, threshold_index.mask_values(values)))
+        return candidates
+
+    def covenant_rejections(self, loans_df):
+        """
+            First pluggable covenant type (in `COVENANT_TYPES` order) that no facility admits, for
+            every loan of a batch
+
+            Arguments:
+                loans_df (dataframe)
+
+            Returns:
+                reasons (list of (numpy bool array, string)): Loans rejected per covenant type reason
+        """
+        rejections = []
+        for threshold_index in self.threshold_indexes:
+            codes = threshold_index.buckets(loans_df[threshold_index.covenant.loan_attribute].values.astype(float))
+            empty = np.array([not mask for mask in threshold_index.masks], dtype=bool)
+            rejections.append((empty[codes], threshold_index.covenant.reason))
+        return rejections
+
+    def covenant_rejection(self, loan_request):
+        """
+            First pluggable covenant type (in `COVENANT_TYPES` order) that no facility admits
+
+            Arguments:
+                loan_request (LoanRequest)
+
+            Returns:
+                reason (string) or None
+        """
+        for threshold_index in self.threshold_indexes:
+            if not threshold_index.mask(getattr(loan_request, threshold_index.covenant.loan_attribute)):
+                return threshold_index.covenant.reason
+        return None
+
+    def covenant_rejection_requests(self, loan_requests):
+        """
+            First pluggable covenant type (in `COVENANT_TYPES` order) that no facility admits, for
+            every loan of a batch of parsed loans
+
+            Arguments:
+                loan_requests (list of LoanRequest objects)
+
+            Returns:
+                reasons (list of string or None): One per loan, in loan_requests order
+        """
+        reasons = [None] * len(loan_requests)
+        # NOTE: Later types first, thus the first rejecting type in `COVENANT_TYPES` order wins
+        for threshold_index in reversed(self.threshold_indexes):
+            values = map(operator.attrgetter(threshold_index.covenant.loan_attribute), loan_requests)
+            reason = threshold_index.covenant.reason
+            for index, mask in enumerate(threshold_index.mask_values(values)):
+                if not mask:
+                    reasons[index] = reason
+        return reasons
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+"""
+    Pluggable covenant types, beyond the built-in banned states and max default likelihood.
+
+    A covenant type reads a per-facility limit from its own optional column of covenants.csv and
+    compares it with one attribute of each loan. Facilities without a value in that column are
+    not constrained by the type. Several rows of the same facility combine into the most
+    restrictive limit.
+
+    Every type used by at least one facility is compiled once into a `ThresholdIndex` of bucket
+    bitmaps, see `CovenantIndex`. A batch of loans is then evaluated with one vectorized search
+    per type, and loans falling into the same buckets share a single candidate bitmap, thus the
+    per-loan cost does not grow with the number of covenant types
+    (`CovenantIndex.candidates_batch()`).
+
+    Adding a covenant type:
+        1. Subclass `MaxCovenant` (loan value must not exceed the limit) or `MinCovenant` (loan
+           value must not fall below the limit), setting `column`, `loan_attribute` and `reason`
+        2. Append an instance to `COVENANT_TYPES`
+        3. Add the column to covenants.csv
+
+    Stateful covenant types (`stateful = True`, e.g. `MaxStateExposure`) also depend on the loans
+    a facility issued so far. Their static part (here: a loan larger than the cap never fits) is
+    compiled like any other type, the dynamic part (`violates_facility()`) is checked on the
+    facility a search settles on, see `CovenantIndex.stateful_mask`. A facility skipped that way
+    costs one more capacity search for the loan, thus the per-loan cost grows with the number of
+    capped facilities that are exhausted for the loan's state, not with the number of types.
+    Only the engines that issue loans one at a time from the server's facilities (greedy,
+    vectorized, the loan service) support stateful types.
+
+    NOTE: Comparisons are negated the same way as `Facility.is_valid_assignment()`, thus a
+    missing (NaN) loan value never violates a covenant.
+"""
+
+import utils
+
+from bisect import bisect_left, bisect_right
+
+np = utils.LazyModule('numpy')
+
+
+class Covenant(object):
+    """
+        Covenant type interface: a per-facility limit on one loan attribute
+
+        Idempotent Interfaces:
+            combine(): Most restrictive of several limits of a facility
+            violates(): Checks a single loan value against a limit
+            violates_facility(): Checks a loan against a limit and the facility's current state
+            violations(): Checks loan values against facility limits in bulk
+            bucket(): Bucket of a loan value in a `ThresholdIndex`
+            buckets(): Vectorized `bucket()`
+            slot(): Bucket a facility limit is first admitted in
+            admitted(): Whether a bucket admits the facilities of a slot
+
+        Non-Idempotent Interfaces:
+            None
+    """
+    column = None  # covenants.csv column holding the facility limit
+    loan_attribute = None  # `LoanRequest` attribute, also the loans csv column
+    reason = None  # Rejection reason code when no facility admits a loan
+    stateful = False  # Whether `violates_facility()` depends on the loans issued so far
+
+    def combine(self, limits):
+        raise NotImplementedError
+
+    def violates(self, value, limit):
+        raise NotImplementedError
+
+    def violates_facility(self, facility, loan_request, limit):
+        """
+            Checks a loan against a limit and the current state of the facility, on top of
+            `violates()`. Only called for stateful types.
+
+            Arguments:
+                facility (Facility)
+                loan_request (LoanRequest)
+                limit (float)
+
+            Returns:
+                violates (bool)
+        """
+        return False
+
+    def violations(self, values, limits):
+        """
+            Checks loan values against facility limits in bulk
+
+            Arguments:
+                values (numpy float array): One value per loan
+                limits (numpy float array): One limit per facility, NaN where unconstrained
+
+            Returns:
+                violations (numpy bool array of shape (loans, facilities))
+        """
+        raise NotImplementedError
+
+    def bucket(self, thresholds, value):
+        raise NotImplementedError
+
+    def buckets(self, thresholds, values):
+        raise NotImplementedError
+
+    def slot(self, thresholds, limit):
+        raise NotImplementedError
+
+    def admitted(self, bucket, slot):
+        raise NotImplementedError
+
+
+class MaxCovenant(Covenant):
+    """
+        Loan value must not exceed the facility limit. Bucket `k` admits loans with a value of at
+        most `thresholds[k]`, the last bucket loans above every threshold.
+    """
+
+    def combine(self, limits):
+        return min(limits)
+
+    def violates(self, value, limit):
+        return value > limit
+
+    def violations(self, values, limits):
+        return values[:, None] > limits[None, :]
+
+    def bucket(self, thresholds, value):
+        # NOTE: NaN lands in the first bucket, i.e. admitted by every facility
+        return bisect_left(thresholds, value)
+
+    def buckets(self, thresholds, values):
+        return np.where(np.isnan(values), 0, np.searchsorted(thresholds, values, side='left'))
+
+    def slot(self, thresholds, limit):
+        return len(thresholds) if limit is None else bisect_left(thresholds, limit)
+
+    def admitted(self, bucket, slot):
+        return bucket <= slot
+
+
+class MinCovenant(Covenant):
+    """
+        Loan value must not fall below the facility limit. Bucket `k` admits loans with a value of
+        at least `thresholds[k - 1]`, the first bucket loans below every threshold.
+    """
+
+    def combine(self, limits):
+        return max(limits)
+
+    def violates(self, value, limit):
+        return value < limit
+
+    def violations(self, values, limits):
+        return values[:, None] < limits[None, :]
+
+    def bucket(self, thresholds, value):
+        # NOTE: NaN lands in the last bucket, i.e. admitted by every facility
+        return bisect_right(thresholds, value)
+
+    def buckets(self, thresholds, values):
+        return np.where(np.isnan(values), len(thresholds), np.searchsorted(thresholds, values, side='right'))
+
+    def slot(self, thresholds, limit):
+        return 0 if limit is None else bisect_right(thresholds, limit)
+
+    def admitted(self, bucket, slot):
+        return bucket >= slot
+
+
+class MaxAmount(MaxCovenant):
+    column = 'max_amount'
+    loan_attribute = 'amount'
+    reason = 'max_amount'
+
+
+class MinInterestRate(MinCovenant):
+    column = 'min_interest_rate'
+    loan_attribute = 'interest_rate'
+    reason = 'min_interest_rate'
+
+
+class MaxStateExposure(MaxCovenant):
+    """
+        Total amount a facility lends to the loans of any single origin state. A loan above the
+        cap never fits (compiled), otherwise it must fit into what is left of the cap for its
+        state, see `Facility.state_exposures`.
+
+        NOTE: Exhausted caps are reported as `capacity` rejections
+    """
+    column = 'max_state_exposure'
+    loan_attribute = 'amount'
+    reason = 'max_state_exposure'
+    stateful = True
+
+    def violates_facility(self, facility, loan_request, limit):
+        return facility.state_exposures.get(loan_request.origin_state, 0.) + loan_request.amount > limit
+
+
+# Registered covenant types, in rejection reason precedence order
+COVENANT_TYPES = [MaxAmount(), MinInterestRate(), MaxStateExposure()]
+COVENANT_TYPES_BY_COLUMN = dict((covenant.column, covenant) for covenant in COVENANT_TYPES)
+STATEFUL_COLUMNS = frozenset(covenant.column for covenant in COVENANT_TYPES if covenant.stateful)
+
+
+class ThresholdIndex(object):
+    """
+        Bucket bitmaps of one covenant type over an interest-rate-sorted list of facilities.
+
+        `thresholds` holds the distinct facility limits in ascending order, `masks[k]` the bitmap
+        of facilities admitting the loans of bucket `k` (see `Covenant.bucket()`), thus a loan's
+        eligible facilities are a single lookup.
+
+        Idempotent Interfaces:
+            ThresholdIndex(): Constructor that builds the bitmaps
+            mask(): Bitmap of facilities admitting a loan value
+            mask_values(): Bitmaps of facilities admitting each loan value of a batch
+            buckets(): Bucket of every loan value of a batch
+
+        Non-Idempotent Interfaces:
+            insert(): Accounts a facility inserted into `facilities_list`
+    """
+
+    def __init__(self, covenant, limits):
+        """
+            Constructor for `ThresholdIndex`
+
+            Arguments:
+                covenant (Covenant)
+                limits (list of float or None): Limit per facility position, None if unconstrained
+
+            Returns:
+                `ThresholdIndex` object
+        """
+        self.covenant = covenant
+        self.thresholds = sorted(set(limit for limit in limits if limit is not None))
+        self.masks = [0] * (len(self.thresholds) + 1)
+        for position, limit in enumerate(limits):
+            self.masks[covenant.slot(self.thresholds, limit)] |= 1 << position
+
+        # A facility admitting a bucket also admits every less demanding bucket
+        order = list(range(len(self.masks)))
+        if isinstance(covenant, MaxCovenant):
+            order.reverse()
+        for previous, bucket in zip(order, order[1:]):
+            self.masks[bucket] |= self.masks[previous]
+        self.sorted_thresholds = None  # NumPy copy of `thresholds`, built on first use by `buckets()`
+
+    def mask(self, value):
+        return self.masks[self.covenant.bucket(self.thresholds, value)]
+
+    def mask_values(self, values):
+        """
+            Bitmaps of facilities admitting each loan value of a batch, see `mask()`
+
+            Arguments:
+                values (list of float)
+
+            Returns:
+                masks (list of integer bitmap): One per value
+        """
+        masks = self.masks
+        bucket = self.covenant.bucket
+        thresholds = self.thresholds
+        return [masks[bucket(thresholds, value)] for value in values]
+
+    def buckets(self, values):
+        """
+            Buckets of a batch of loan values
+
+            Arguments:
+                values (numpy float array)
+
+            Returns:
+                buckets (numpy integer array): Index into `self.masks` per loan
+        """
+        if self.sorted_thresholds is None:
+            self.sorted_thresholds = np.array(self.thresholds, dtype=float)
+        return self.covenant.buckets(self.sorted_thresholds, values)
+
+    def insert(self, position, limit, shift):
+        """
+            Accounts a facility inserted into `facilities_list` at `position`
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                position (integer)
+                limit (float) or None
+                shift (function): (mask, admitted) -> mask with a bit inserted at `position`
+
+            Returns:
+                None
+
+            Side Effects:
+                Updates thresholds and bitmaps
+        """
+        if limit is not None:
+            index = bisect_left(self.thresholds, limit)
+            if index == len(self.thresholds) or self.thresholds[index] != limit:
+                # A new threshold splits a bucket, both halves start out with the same facilities
+                self.thresholds.insert(index, limit)
+                self.masks.insert(index, self.masks[index])
+                self.sorted_thresholds = None
+        slot = self.covenant.slot(self.thresholds, limit)
+        self.masks = [shift(mask, self.covenant.admitted(bucket, slot)) for bucket, mask in enumerate(self.masks)]
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+from covenants import COVENANT_TYPES_BY_COLUMN, STATEFUL_COLUMNS
+
 
 class Facility(object):
     """
@@ -8,13 +10,16 @@ class Facility(object):
         Idempotent Interfaces:
             Facility(): Constructor to create a new facility
             is_valid_assignment(): Validates a loan assignment to this facility
+            has_stateful_covenants(): Whether a covenant depends on the loans issued so far
             compute_loan_yield(): Computes expected yield given a `LoanRequest`
 
         Non-Idempotent Interfaces:
             issue_loan(): Assigns a loan to this facility
+            set_covenant_limit(): Sets or removes the limit of a pluggable covenant type
     """
 
-    def __init__(self, facility_id, bank_id, initial_amount, interest_rate, max_default_likelihood, banned_states):
+    def __init__(self, facility_id, bank_id, initial_amount, interest_rate, max_default_likelihood, banned_states,
+                 covenant_limits=None):
         """
             Constructor for `Facility` object
 
@@ -25,6 +30,7 @@ class Facility(object):
                 interest_rate (float)
                 max_default_likelihood (float)
                 banned_states (list of string)
+                covenant_limits (dictionary) or None: Limit by covenant type column, see `covenants.py`
 
             Returns:
                 `Facility` object
@@ -41,10 +47,15 @@ class Facility(object):
         self.interest_rate = interest_rate
         self.max_default_likelihood = max_default_likelihood
         self.banned_states = set(banned_states)  # optimizes lookup
+        self.covenant_limits = dict(covenant_limits or {})
+        # NOTE: Only facilities with a stateful covenant pay for tracking their exposures
+        self.stateful = not STATEFUL_COLUMNS.isdisjoint(self.covenant_limits)
 
         # Dynamic attributes
         self.balance_amount = initial_amount
         self.current_yield = 0.
+        # Amount issued by loan origin state if `self.stateful`, see `covenants.MaxStateExposure`
+        self.state_exposures = {}
 
     def __repr__(self):
         """
@@ -78,9 +89,42 @@ class Facility(object):
             return False
         if loan_request.amount > self.balance_amount:
             return False
+        for column, limit in self.covenant_limits.items():
+            covenant = COVENANT_TYPES_BY_COLUMN[column]
+            if covenant.violates(getattr(loan_request, covenant.loan_attribute), limit):
+                return False
+            if covenant.stateful and covenant.violates_facility(self, loan_request, limit):
+                return False
 
         return True
 
+    def has_stateful_covenants(self):
+        return self.stateful
+
+    def set_covenant_limit(self, column, limit):
+        """
+            Sets or removes the limit of a pluggable covenant type
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Exposures are only
+            tracked from the first stateful covenant on, thus it must be called before any loan is
+            issued.
+
+            Arguments:
+                column (string): Covenant type column, see `covenants.py`
+                limit (float) or None: None removes the limit
+
+            Returns:
+                None
+
+            Side Effects:
+                Updates `self.covenant_limits` and `self.stateful`
+        """
+        if limit is None:
+            self.covenant_limits.pop(column, None)
+        else:
+            self.covenant_limits[column] = limit
+        self.stateful = not STATEFUL_COLUMNS.isdisjoint(self.covenant_limits)
+
     def compute_loan_yield(self, loan_request):
         """
             Validates loan request against all constraints and conventants goverened by this
@@ -109,9 +153,13 @@ class Facility(object):
             Side Effects:
                 1. `self.balance_amount` is updated to reflect remaining lendable amount in facility
                 2. `self.current_yield` is updated to reflect current effective yield of the facility
+                3. `self.state_exposures` is updated for the loan's origin state if `self.stateful`
         """
         # TODO(Future): Bake validation into issue_loan
         self.balance_amount = self.balance_amount - loan_request.amount
+        if self.stateful:
+            state = loan_request.origin_state
+            self.state_exposures[state] = self.state_exposures.get(state, 0.) + loan_request.amount
         expected_yield = self.compute_loan_yield(loan_request)
         self.current_yield += expected_yield
 
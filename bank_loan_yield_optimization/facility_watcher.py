@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+    Watched-directory mode for hot facility reloads, see `LoanFacilitiesServer.merge_facilities()`.
+
+    New facilities are dropped into the watched directory as a pair of csv files sharing a
+    prefix, e.g. `2026-10-18_facilities.csv` and `2026-10-18_covenants.csv`, in the same layout as
+    the inputs of `LoanFacilitiesServer`. A pair is picked up as soon as both files exist, thus
+    files should be moved into the directory once complete (write elsewhere, then rename).
+
+    A background thread polls the directory and parses each new pair into `Facility` objects. The
+    server merges them at its next batch boundary (`LoanFacilitiesServer.merge_pending_facilities()`),
+    thus the loan stream never waits on csv parsing.
+
+    A pair that fails to parse is logged and skipped, then parsed again once either of its files
+    is modified, e.g. replaced by a corrected copy.
+"""
+
+import logging
+import os
+import queue
+import threading
+
+import lean_csv
+
+FACILITIES_SUFFIX = 'facilities.csv'
+COVENANTS_SUFFIX = 'covenants.csv'
+DEFAULT_POLL_INTERVAL = 1.0  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class FacilityWatcher(object):
+    """
+        Polls a directory for new facilities and covenants csv pairs
+
+        Idempotent Interfaces:
+            FacilityWatcher(): Constructor
+            pending_pairs(): Complete csv pairs not picked up yet
+            pair_mtimes(): Modification times of a csv pair
+
+        Non-Idempotent Interfaces:
+            start(): Starts the polling thread
+            stop(): Stops the polling thread
+            scan(): Parses new csv pairs and queues their facilities
+    """
+
+    def __init__(self, directory, parse_facilities_and_covenants, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+            Constructor for `FacilityWatcher`
+
+            Arguments:
+                directory (string): Watched directory
+                parse_facilities_and_covenants (function): (facilities_table, covenants_table) ->
+                    list of Facility objects, see `LoanFacilitiesServer.parse_facilities_and_covenants()`
+                poll_interval (float): Seconds between directory scans
+
+            Returns:
+                `FacilityWatcher` object
+        """
+        self.directory = directory
+        self.parse_facilities_and_covenants = parse_facilities_and_covenants
+        self.poll_interval = poll_interval
+
+        # Parsed facilities per csv pair, in pickup order, drained by the server
+        self.updates = queue.Queue()
+        self.seen = set()
+        # (pair_mtimes(), error) by facilities csv path, failed pairs are retried once modified
+        self.failed = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def pending_pairs(self):
+        """
+            Lists complete csv pairs in the watched directory that were not picked up yet, or
+            failed to parse and were modified since
+
+            Arguments:
+                None
+
+            Returns:
+                pairs (list of (facilities_csv_path, covenants_csv_path)): In file name order
+
+            Raises:
+                OSError: if the watched directory or a failed pair is not accessible
+        """
+        pairs = []
+        names = set(os.listdir(self.directory))
+        for name in sorted(names):
+            if not name.endswith(FACILITIES_SUFFIX):
+                continue
+            covenants_name = name[:-len(FACILITIES_SUFFIX)] + COVENANTS_SUFFIX
+            facilities_csv_path = os.path.join(self.directory, name)
+            if covenants_name not in names or facilities_csv_path in self.seen:
+                continue
+            pair = (facilities_csv_path, os.path.join(self.directory, covenants_name))
+            failed = self.failed.get(facilities_csv_path)
+            if failed is None or failed[0] != self.pair_mtimes(*pair):
+                pairs.append(pair)
+        return pairs
+
+    @staticmethod
+    def pair_mtimes(facilities_csv_path, covenants_csv_path):
+        return os.stat(facilities_csv_path).st_mtime_ns, os.stat(covenants_csv_path).st_mtime_ns
+
+    def scan(self):
+        """
+            Parses every new csv pair and queues its facilities on `self.updates`. Pairs failing
+            to parse are logged and recorded in `self.failed`.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                pairs (integer): Number of csv pairs picked up
+
+            Raises:
+                OSError: if the watched directory is not accessible
+        """
+        pairs = self.pending_pairs()
+        for facilities_csv_path, covenants_csv_path in pairs:
+            # NOTE: Taken before parsing, thus a pair modified while being parsed is parsed again
+            mtimes = self.pair_mtimes(facilities_csv_path, covenants_csv_path)
+            try:
+                facilities_list = self.parse_facilities_and_covenants(lean_csv.read_table(facilities_csv_path),
+                                                                      lean_csv.read_table(covenants_csv_path))
+            except (OSError, ValueError, TypeError, KeyError) as error:
+                logger.warning('Skipping facilities %s until modified: %s', facilities_csv_path, error)
+                self.failed[facilities_csv_path] = (mtimes, error)
+                continue
+            self.seen.add(facilities_csv_path)
+            self.failed.pop(facilities_csv_path, None)
+            self.updates.put(facilities_list)
+        return len(pairs)
+
+    def run(self):
+        while True:
+            try:
+                self.scan()
+            except OSError:
+                pass  # Directory (temporarily) unavailable, try again on the next poll
+            if self.stopped.wait(self.poll_interval):
+                return
+
+    def start(self):
+        """
+            Starts the polling thread, scanning the directory every `poll_interval` seconds
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+        """
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name='facility-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+            Stops the polling thread
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
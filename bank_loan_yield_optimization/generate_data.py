@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+    Synthetic data generator for `LoanFacilitiesServer`.
+
+    Writes banks.csv, facilities.csv, covenants.csv and loans.csv in the same layout as the
+    `small/` and `large/` fixtures, at a configurable scale. Distributions loosely follow the
+    fixtures:
+        1. Facility amounts are log-normal, interest rates cluster around 2-6%
+        2. Every facility has one `max_default_likelihood` covenant and a few banned states
+        3. Loan amounts are log-normal, default likelihoods skew low and loan interest rates grow
+           with default likelihood
+        4. Loan origin states are drawn with a skew, so a handful of states dominate the stream
+        5. Optionally (`--covenant-types`), some facilities also cap loan amounts or require a
+           minimum loan interest rate, see `covenants.py`
+
+    Usage:
+        python generate_data.py --output huge/ --facilities 2000 --loans 1000000
+"""
+
+import argparse
+import csv
+import os
+import random
+
+STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS',
+          'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY',
+          'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV',
+          'WI', 'WY']
+# Skewed state popularity: weight 1 / rank
+STATE_WEIGHTS = [1. / rank for rank in range(1, len(STATES) + 1)]
+
+FACILITY_INTEREST_RATES = [0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08]
+FACILITY_INTEREST_RATE_WEIGHTS = [1, 3, 4, 5, 4, 3, 2, 1]
+MAX_DEFAULT_LIKELIHOODS = [0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.09]
+LOAN_INTEREST_RATES = [0.15, 0.2, 0.25, 0.3, 0.35]
+MAX_AMOUNT_MULTIPLES = [1, 2, 4]  # of the mean loan amount
+MIN_INTEREST_RATES = [0.15, 0.2, 0.25]
+COVENANT_TYPE_PROBABILITY = 0.3
+
+
+def write_csv(csv_filepath, header, rows):
+    """
+        Writes rows to a csv file with a header
+
+        Arguments:
+            csv_filepath (string)
+            header (list of strings)
+            rows (iterable of lists)
+
+        Returns:
+            None
+
+        Side Effects:
+            Writing to a file
+    """
+    with open(csv_filepath, 'w') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate_banks(banks):
+    """
+        Generates bank rows
+
+        Arguments:
+            banks (integer): Number of banks
+
+        Returns:
+            generator of bank rows
+    """
+    for bank_id in range(1, banks + 1):
+        yield [bank_id, 'Bank %d' % bank_id]
+
+
+def generate_facilities_and_covenants(rng, facilities, banks, loans_volume):
+    """
+        Generates facilities and their covenants
+
+        Arguments:
+            rng (random.Random)
+            facilities (integer): Number of facilities
+            banks (integer): Number of banks
+            loans_volume (float): Expected total loan amount, facility sizes are scaled so the
+                book covers roughly half of it and facilities drain during the stream
+
+        Returns:
+            (facility_rows, covenant_rows)
+    """
+    mean_amount = loans_volume / (2. * facilities)
+    facility_rows = []
+    covenant_rows = []
+    for facility_id in range(1, facilities + 1):
+        bank_id = rng.randint(1, banks)
+        amount = float(round(mean_amount * rng.lognormvariate(0, 0.75) / 1.32))
+        interest_rate = rng.choices(FACILITY_INTEREST_RATES, FACILITY_INTEREST_RATE_WEIGHTS)[0]
+        facility_rows.append([amount, interest_rate, facility_id, bank_id])
+
+        # First covenant row carries `max_default_likelihood`, the remaining ones only ban a state
+        banned_states = rng.sample(STATES, rng.choice([0, 1, 1, 2, 2, 3, 5]))
+        covenant_rows.append([facility_id, rng.choice(MAX_DEFAULT_LIKELIHOODS), bank_id,
+                              banned_states[0] if banned_states else ''])
+        for banned_state in banned_states[1:]:
+            covenant_rows.append([facility_id, '', bank_id, banned_state])
+    return facility_rows, covenant_rows
+
+
+def generate_covenant_type_limits(rng, covenant_rows, mean_loan_amount):
+    """
+        Adds `max_amount` and `min_interest_rate` limits to the first covenant row of some
+        facilities
+
+        Arguments:
+            rng (random.Random)
+            covenant_rows (list of covenant rows)
+            mean_loan_amount (float)
+
+        Returns:
+            covenant_rows (list of covenant rows): With two more columns
+    """
+    rows = []
+    for row in covenant_rows:
+        max_amount = min_interest_rate = ''
+        if row[1] != '':
+            if rng.random() < COVENANT_TYPE_PROBABILITY:
+                max_amount = mean_loan_amount * rng.choice(MAX_AMOUNT_MULTIPLES)
+            if rng.random() < COVENANT_TYPE_PROBABILITY:
+                min_interest_rate = rng.choice(MIN_INTEREST_RATES)
+        rows.append(row + [max_amount, min_interest_rate])
+    return rows
+
+
+def generate_loans(rng, loans, mean_loan_amount):
+    """
+        Lazily generates loan rows
+
+        Arguments:
+            rng (random.Random)
+            loans (integer): Number of loans
+            mean_loan_amount (float)
+
+        Returns:
+            generator of loan rows
+    """
+    states = rng.choices(STATES, STATE_WEIGHTS, k=loans)
+    for loan_id in range(1, loans + 1):
+        default_likelihood = min(round(rng.betavariate(2, 40), 2), 0.2)
+        interest_rate = LOAN_INTEREST_RATES[min(int(default_likelihood * 50), len(LOAN_INTEREST_RATES) - 1)]
+        amount = int(mean_loan_amount * rng.lognormvariate(0, 0.6) / 1.2)
+        yield [interest_rate, amount, loan_id, default_likelihood, states[loan_id - 1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='Output directory')
+    parser.add_argument('--banks', type=int, default=20)
+    parser.add_argument('--facilities', type=int, default=1000)
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--mean-loan-amount', type=float, default=50000.)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--covenant-types', action='store_true',
+                        help='Add max_amount and min_interest_rate covenants to some facilities')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+
+    facility_rows, covenant_rows = generate_facilities_and_covenants(rng, args.facilities, args.banks,
+                                                                     args.loans * args.mean_loan_amount)
+    write_csv(os.path.join(args.output, 'banks.csv'), ['id', 'name'], generate_banks(args.banks))
+    write_csv(os.path.join(args.output, 'facilities.csv'), ['amount', 'interest_rate', 'id', 'bank_id'],
+              facility_rows)
+    covenants_header = ['facility_id', 'max_default_likelihood', 'bank_id', 'banned_state']
+    if args.covenant_types:
+        # Separate generator, thus the other files are the same with or without covenant types
+        covenant_rows = generate_covenant_type_limits(random.Random(args.seed + 1), covenant_rows,
+                                                      args.mean_loan_amount)
+        covenants_header += ['max_amount', 'min_interest_rate']
+    write_csv(os.path.join(args.output, 'covenants.csv'), covenants_header, covenant_rows)
+    write_csv(os.path.join(args.output, 'loans.csv'), ['interest_rate', 'amount', 'id', 'default_likelihood', 'state'],
+              generate_loans(rng, args.loans, args.mean_loan_amount))
+
+
+if __name__ == '__main__':
+    main()
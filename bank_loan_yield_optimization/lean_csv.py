@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+    Lean input path on the stdlib `csv` module, used by default (see `LEAN_IO` in `main.py`).
+
+    Importing pandas (and numpy) dominates the runtime of short invocations. Facilities,
+    covenants and banks are small tables and loans are parsed one row at a time anyway, thus the
+    lean path reads them without either. Values are typed the way `pd.read_csv` types them, so
+    both paths produce identical results:
+        1. Tables: A column holds integers if every value is an integer, floats if every present
+           value is a number (missing values are NaN) and strings otherwise (missing values are
+           None), see `is_missing()`.
+        2. Loans: Fields are converted one at a time, see `to_int()`, `to_float()` and `to_str()`.
+
+    pandas is only imported by engines and tools that need dataframes, see `utils.LazyModule`.
+"""
+
+import csv
+
+import columnar
+
+# Strings `pd.read_csv` reads as missing values
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                       '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+NAN = float('nan')
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))  # e.g. '7.0', NaN raises ValueError
+
+
+def to_float(value):
+    return NAN if value in NA_VALUES else float(value)
+
+
+def to_str(value):
+    # NOTE: Same as `str()` of a value pandas read as missing
+    return 'nan' if value in NA_VALUES else value
+
+
+class Table(object):
+    """
+        Typed columns of a small csv or columnar table, a lean stand-in for a dataframe
+
+        Idempotent Interfaces:
+            Table(): Constructor
+            __getitem__(): Values of a column as a list
+            __contains__(): Whether a column exists
+            __len__(): Number of rows
+    """
+
+    def __init__(self, columns):
+        """
+            Constructor for `Table`
+
+            Arguments:
+                columns (dictionary): List of values by column name, in csv column order
+
+            Returns:
+                `Table` object
+        """
+        self.columns = columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        return columnar.column_rows(self.columns)
+
+
+def infer_column(values):
+    """
+        Types the raw values of a csv column the way `pd.read_csv` does
+
+        Arguments:
+            values (list of string)
+
+        Returns:
+            values (list of integer, float or string): Missing values are NaN in float columns and
+                None in string columns
+    """
+    try:
+        if not any(value in NA_VALUES for value in values):
+            return [int(value) for value in values]
+    except ValueError:
+        pass
+    try:
+        return [NAN if value in NA_VALUES else float(value) for value in values]
+    except ValueError:
+        return [None if value in NA_VALUES else value for value in values]
+
+
+def is_missing(value):
+    return value is None or value != value  # NaN
+
+
+def read_table(path):
+    """
+        Reads a whole csv or columnar table, depending on the path suffix
+
+        Arguments:
+            path (string)
+
+        Returns:
+            table (Table)
+
+        Raises:
+            OSError: if path is not accessible
+            ValueError: if the csv file is empty
+    """
+    if columnar.is_columnar(path):
+        columns = {}
+        for name, values in columnar.load_columns(path).items():
+            values = values.tolist()
+            if values and isinstance(values[0], str):
+                # NOTE: Missing text values are stored as empty strings
+                values = [value if value else None for value in values]
+            columns[name] = values
+        return Table(columns)
+
+    with open(path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        names = next(reader, None)
+        if names is None:
+            raise ValueError('No columns in %s' % path)  # Same as `pd.read_csv`
+        rows = [row + [''] * (len(names) - len(row)) for row in reader if row]
+    return Table(dict((name, infer_column([row[i] for row in rows])) for i, name in enumerate(names)))
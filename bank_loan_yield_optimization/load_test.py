@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+    Load test client for `loan_service.py`.
+
+    Replays loans from a loans csv as `POST /loans` requests over concurrent keep-alive
+    connections and reports latency percentiles and throughput.
+
+    Usage:
+        python load_test.py --loans large/loans.csv --requests 10000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import time
+
+from loan_service import DEFAULT_HOST, DEFAULT_PORT
+
+
+def percentile(sorted_values, fraction):
+    """
+        Nearest-rank percentile of an already sorted list
+
+        Arguments:
+            sorted_values (list of float)
+            fraction (float): In [0, 1]
+
+        Returns:
+            value (float)
+    """
+    rank = max(int(round(fraction * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def post_loans(host, port, loans, latencies, statuses):
+    """
+        Sends loans one after another over a single keep-alive connection
+
+        Arguments:
+            host (string)
+            port (integer)
+            loans (iterator of dictionary): Shared across connections
+            latencies (list of float): Appended with per-request latency in seconds
+            statuses (dictionary): Counts of loan statuses returned by the service
+
+        Returns:
+            None
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for loan in loans:
+            body = json.dumps(loan).encode('utf-8')
+            start = time.perf_counter()
+            writer.write(('POST /loans HTTP/1.1\r\n'
+                          'Host: %s\r\n'
+                          'Content-Type: application/json\r\n'
+                          'Content-Length: %d\r\n\r\n' % (host, len(body))).encode('latin-1') + body)
+            await writer.drain()
+
+            await reader.readline()  # Status line
+            content_length = 0
+            while True:
+                header_line = await reader.readline()
+                if header_line in (b'\r\n', b''):
+                    break
+                name, _, value = header_line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    content_length = int(value)
+            response = json.loads((await reader.readexactly(content_length)).decode('utf-8'))
+            latencies.append(time.perf_counter() - start)
+
+            status = response.get('status', 'error')
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load_test(host, port, loans_csv_path, requests, concurrency):
+    """
+        Runs the load test
+
+        Arguments:
+            host (string)
+            port (integer)
+            loans_csv_path (string)
+            requests (integer): Total number of requests, loans are cycled if needed
+            concurrency (integer): Number of concurrent connections
+
+        Returns:
+            report (dictionary)
+    """
+    with open(loans_csv_path) as csvfile:
+        # NOTE: Loan ids are left to the service so loans can be replayed
+        loan_templates = [{'amount': float(row['amount']),
+                           'interest_rate': float(row['interest_rate']),
+                           'default_likelihood': float(row['default_likelihood']),
+                           'state': row['state']} for row in csv.DictReader(csvfile)]
+    loans = itertools.islice(itertools.cycle(loan_templates), requests)
+
+    latencies = []
+    statuses = {}
+    start = time.perf_counter()
+    await asyncio.gather(*[post_loans(host, port, loans, latencies, statuses) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {'requests': len(latencies),
+            'concurrency': concurrency,
+            'elapsed_seconds': elapsed,
+            'throughput_rps': len(latencies) / elapsed,
+            'latency_p50_ms': 1000 * percentile(latencies, 0.50),
+            'latency_p99_ms': 1000 * percentile(latencies, 0.99),
+            'latency_max_ms': 1000 * latencies[-1],
+            'statuses': statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--loans', default='large/loans.csv', help='Loans csv to replay')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args.host, args.port, args.loans, args.requests, args.concurrency))
+    print(json.dumps(report, indent=4, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
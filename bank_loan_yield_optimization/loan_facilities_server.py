@@ -1,10 +1,44 @@
 #!/usr/bin/env python
 
-import pandas as pd
+import checkpoint
+import collections
+import columnar
+import csv
+import itertools
+import lean_csv
+import os.path
 import utils
 
+from io import StringIO
+
+from capacity_tree import CapacityTree
+from covenant_index import CovenantIndex
+from covenants import COVENANT_TYPES
 from facility import Facility
+from facility_watcher import DEFAULT_POLL_INTERVAL, FacilityWatcher
 from loan_request import LoanRequest
+from metrics import Metrics
+from yield_ledger import YieldLedger
+
+ASSIGNMENT_HEADER = ['loan_id', 'facility_id']
+REJECTION_HEADER = ['loan_id', 'reason']
+YIELD_REPORT_HEADER = ['facility_id', 'expected_yield']
+LOAN_COLUMNS = ['id', 'amount', 'default_likelihood', 'interest_rate', 'state']  # `LoanRequest` fields
+DEFAULT_LOANS_CHUNKSIZE = 1024
+DEFAULT_CHECKPOINT_INTERVAL = 100000  # loans
+
+# NOTE: Only the dataframe input path and batch evaluation need these, see `lean_csv.py`
+np = utils.LazyModule('numpy')
+pd = utils.LazyModule('pandas')
+
+# Rejection reason codes
+REJECT_DEFAULT_LIKELIHOOD = 'default_likelihood'  # Above every facility's max_default_likelihood
+REJECT_BANNED_STATE = 'banned_state'  # Origin state banned by every facility
+REJECT_AMOUNT = 'amount'  # Above the largest remaining facility balance
+REJECT_COVENANTS = 'covenants'  # No single facility passes all covenants
+REJECT_CAPACITY = 'capacity'  # Facilities passing all covenants lack balance
+REJECT_UNPROFITABLE = 'unprofitable'  # Assignable, but left out to maximize yield
+# NOTE: Loans no facility admits under a pluggable covenant type are rejected with `Covenant.reason`
 
 
 class LoanFacilitiesServer(object):
@@ -19,89 +53,196 @@ class LoanFacilitiesServer(object):
             LoanFacilitiesServer(): Constructor that loads & parses facilities, covenants and loans csv
             parse_facilities_and_covenants(): Parses facilities and covenants into a unified list
             parse_loan_request(): Parses loan requests into a convenient `LoanRequest` object
+            parse_loan_requests(): Parses a loan chunk into `LoanRequest` objects without dataframes
+            iter_loan_line_batches(): Streams raw loan csv lines in bounded size batches
+            parse_loan_lines(): Parses a batch of raw loan csv lines into a dataframe
+            iter_loan_batches(): Streams loans in bounded size dataframe chunks
+            iter_loan_request_batches(): Streams loans in bounded size lists of `LoanRequest` objects
+            iter_loan_chunks(): Streams unparsed loan chunks, see `parse_loan_chunk()`
+            parse_loan_chunk(): Parses an unparsed loan chunk into a dataframe
+            find_facility(): Finds the cheapest facility that can issue a loan
+            fast_reject(): Rejects impossible loans in constant time using global bounds
+            fast_reject_batch(): Vectorized `fast_reject()` over a dataframe of loans
+            fast_reject_requests(): `fast_reject()` over a batch of parsed loans
+            rejection_reason(): Reason code for a loan that no facility can issue
 
         Non-Idempotent Interfaces:
             process_loans_stream(): Processes loans for optimal yield facility assignment
+            process_loan_batch(): Assigns a dataframe batch of loans
+            process_loan_requests(): Assigns a batch of parsed loans
+            issue_loan(): Issues a loan from a facility and keeps indexes up to date
+            add_facility(): Inserts a facility in interest rate order and keeps indexes up to date
+            merge_facility_list(): Adds facilities not served yet
+            replace_facilities(): Serves another list of facilities from scratch
+            merge_facilities(): Merges new facilities and covenants csv into the running server
+            watch_facilities(): Merges facilities dropped into a watched directory
+            merge_pending_facilities(): Merges facilities parsed by the directory watcher
+            stop_watching_facilities(): Stops watching the directory
+            advance_loans_stream(): Accounts processed loans and checkpoints when due
+            checkpoint(): Writes a checkpoint of facility state
+            recover(): Restores facility state from the last checkpoint and the assignment log
             log_loan_assignment(): Logs loan assignment
+            log_loan_rejections(): Logs loan rejections with reason codes
+            flush_assignment_sinks(): Flushes buffered assignment logs
+            close_assignment_sinks(): Flushes and closes buffered assignment logs
             generate_facility_yield_report(): Generates facility yield report
+            generate_bank_yield_report(): Generates bank yield report
     """
 
-    def __init__(self, facilities_csv_path, covenants_csv_path, loans_csv_path):
+    def __init__(self, facilities_csv_path, covenants_csv_path, loans_csv_path,
+                 loans_chunksize=DEFAULT_LOANS_CHUNKSIZE, follow_loans=False, metrics_target=None,
+                 banks_csv_path=None, checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 rejection_csv_path=None, lean_io=True):
         """
             Construtor for `LoanFacilitiesServer`.
 
             Performs the following steps:
-                1. Loads facilities, covenants and loans csv into dataframes.
+                1. Loads facilities and covenants csv into tables (see `lean_csv.py`). Loans are
+                   streamed lazily by `process_loans_stream()`, see `iter_loan_request_batches()`.
+                   Any input path ending in `.npz` is read in the memory-mapped columnar format,
+                   see `columnar.py`.
                 2. Parses facilities and covenants into a unified list of `Facility` objects.
                 3. Sorts `facilities_list` by `interest_rate` to optimize yield
+                4. Builds covenant and capacity indexes over `facilities_list`
+                5. Sets up running per-facility and per-bank aggregates (`self.yield_ledger`)
+                6. Sets up hot-path instrumentation (`self.metrics`)
 
             Arguments:
                 facilities_csv_path (string)
                 covenants_csv_path (string)
-                loans_csv_path (string)
+                loans_csv_path (string): Path, or `utils.STDIN_PATH` to read loans from stdin
+                loans_chunksize (integer): Maximum number of loans parsed and held in memory at once
+                follow_loans (bool): Treat loans_csv_path as a growing file, similar to `tail -f`
+                metrics_target (string) or None: File path or URL for periodic metrics snapshots
+                banks_csv_path (string) or None: Bank names for per-bank aggregates
+                checkpoint_path (string) or None: Facility state checkpoint, disabled if None
+                checkpoint_interval (integer): Loans processed between checkpoints
+                rejection_csv_path (string) or None: Rejection log, disabled if None
+                lean_io (bool): Stream loans with the stdlib csv parser instead of dataframes, thus
+                    the greedy engine never imports pandas, see `lean_csv.py`
 
             Returns:
                 `LoanFacilitiesServer` object
 
             Raises:
-                OSError: if any of the input files are not accessible
+                OSError: if any of the facilities or covenants files are not accessible
         """
 
         # Load Facilities with its associated Covenats
-        self.facilities_df = pd.read_csv(facilities_csv_path)
-        self.covenants_df = pd.read_csv(covenants_csv_path)
+        self.facilities_table = lean_csv.read_table(facilities_csv_path)
+        self.covenants_table = lean_csv.read_table(covenants_csv_path)
 
         # Parse Facilities & Covenants
         self.facilities_list = self.parse_facilities_and_covenants()
         # Sort facility by `interest_rate` to optimize yield
         self.facilities_list.sort(key=lambda facility: facility.interest_rate)
+        # Index covenants so loans only examine eligible facilities
+        self.covenant_index = CovenantIndex(self.facilities_list)
+        # Index remaining balances so drained facilities are skipped
+        self.capacity_tree = CapacityTree(self.facilities_list)
+        # Bumped whenever facilities are merged, so engines can refresh their own mirrors
+        self.facilities_version = 0
+        self.facility_watcher = None
+
+        # Loans csvfile is processed as a stream input
+        self.loans_csv_path = loans_csv_path
+        self.loans_chunksize = loans_chunksize
+        self.follow_loans = follow_loans
+        self.lean_io = lean_io
+        self.loan_columns = None  # Memory-mapped loan columns, see `parse_loan_chunk()`
+
+        # Long-lived buffered assignment and rejection logs keyed by csv path
+        self.assignment_sinks = {}
+        self.rejection_csv_path = rejection_csv_path
 
-        # Load Loans csvfile
-        # NOTE: This will be processed a stream input
-        self.loans_df = pd.read_csv(loans_csv_path)
+        # Position in the loans stream, advanced by the engines and restored by `recover()`
+        self.loans_processed = 0
+        self.last_loan_id = checkpoint.NO_LOAN_ID
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpointed_loans = 0
 
-    def parse_facilities_and_covenants(self, facilities_df=None, covenants_df=None):
+        # Running yield and capacity aggregates per facility and per bank
+        bank_names = None
+        if banks_csv_path is not None:
+            banks_table = lean_csv.read_table(banks_csv_path)
+            bank_names = dict(zip([int(bank_id) for bank_id in banks_table['id']], banks_table['name']))
+        self.yield_ledger = YieldLedger(self.facilities_list, bank_names)
+
+        # Hot-path instrumentation, cheap enough to be always on
+        self.metrics = Metrics(self.yield_ledger, metrics_target)
+
+    def parse_facilities_and_covenants(self, facilities_table=None, covenants_table=None):
         """
             Parses facilities and covenants into a unified list of `Facility` objects
 
             Arguments:
-                facilities_df (dataframe) or None
-                covenants_df (dataframe) or None
+                facilities_table (lean_csv.Table) or None
+                covenants_table (lean_csv.Table) or None
 
             Returns:
                 facilities_list (list of Facility objects)
 
             Raises:
-                AttributeError: if facilities_df or covenants_df are not valid dataframes
-                TypeError: if facilities_df or covenants_df have invalid values
+                KeyError: if a required column is missing
+                TypeError: if facilities_table or covenants_table have invalid values
+                ValueError: if facilities_table or covenants_table have invalid values
 
             Known Limitations:
-                Input format specific parser.
+                Input format specific parser. Columns of pluggable covenant types (see
+                `covenants.py`) are optional in covenants_table.
         """
         # TODO(Future): Move this function to an input source specific class
 
-        if facilities_df is None:
-            facilities_df = self.facilities_df
-        if covenants_df is None:
-            covenants_df = self.covenants_df
+        if facilities_table is None:
+            facilities_table = self.facilities_table
+        if covenants_table is None:
+            covenants_table = self.covenants_table
 
-        facilities_list = []
-        for facility_metadata in facilities_df.itertuples():
-            facility_covenants_df = covenants_df[covenants_df.facility_id == facility_metadata.id]
+        # Group covenants by facility in a single pass
+        # NOTE: Missing values are skipped, same as `dropna()`. A missing state never matches a loan
+        facility_max_default_likelihoods = {}
+        facility_covenant_limits = {}
+        facility_banned_states = {}
+        for facility_id, max_default_likelihood, banned_state in zip(covenants_table['facility_id'],
+                                                                     covenants_table['max_default_likelihood'],
+                                                                     covenants_table['banned_state']):
+            banned_states = facility_banned_states.setdefault(facility_id, [])
+            if not lean_csv.is_missing(banned_state):
+                banned_states.append(banned_state)
+            if not lean_csv.is_missing(max_default_likelihood):
+                facility_max_default_likelihoods.setdefault(facility_id, []).append(float(max_default_likelihood))
+
+        # Optional pluggable covenant type columns, rows without a value don't constrain the facility
+        for covenant in COVENANT_TYPES:
+            if covenant.column not in covenants_table:
+                continue
+            limits = {}
+            for facility_id, limit in zip(covenants_table['facility_id'], covenants_table[covenant.column]):
+                if not lean_csv.is_missing(limit):
+                    limits.setdefault(facility_id, []).append(float(limit))
+            for facility_id, facility_limits in limits.items():
+                facility_covenant_limits.setdefault(facility_id, {})[covenant.column] = covenant.combine(facility_limits)
 
-            max_default_likelihood = float(facility_covenants_df.max_default_likelihood.dropna())
-            facility_id = int(facility_metadata.id)
-            bank_id = int(facility_metadata.bank_id)
-            amount = float(facility_metadata.amount)
-            interest_rate = float(facility_metadata.interest_rate)
-            banned_states = facility_covenants_df.banned_state.tolist()
+        # Build all facilities in a single sweep with columns converted in bulk
+        facilities_list = []
+        for facility_id, bank_id, amount, interest_rate in zip(facilities_table['id'], facilities_table['bank_id'],
+                                                               facilities_table['amount'],
+                                                               facilities_table['interest_rate']):
+            facility_id = int(facility_id)
+            # Exactly one `max_default_likelihood` covenant is expected per facility
+            max_default_likelihoods = facility_max_default_likelihoods.get(facility_id, [])
+            if len(max_default_likelihoods) != 1:
+                raise TypeError('Facility %d has %d max_default_likelihood covenants, expected 1'
+                                % (facility_id, len(max_default_likelihoods)))
 
             facilities_list.append(Facility(facility_id,
-                                            bank_id,
-                                            amount,
-                                            interest_rate,
-                                            max_default_likelihood,
-                                            banned_states))
+                                            int(bank_id),
+                                            float(amount),
+                                            float(interest_rate),
+                                            max_default_likelihoods[0],
+                                            facility_banned_states.get(facility_id, []),
+                                            facility_covenant_limits.get(facility_id)))
         return facilities_list
 
     def parse_loan_request(self, loan):
@@ -136,6 +277,558 @@ class LoanFacilitiesServer(object):
                                    origin_state)
         return loan_request
 
+    def parse_loan_requests(self, header_line, rows):
+        """
+            Parses a chunk produced by `iter_loan_chunks()` straight into `LoanRequest` objects,
+            without dataframes: csv lines with the stdlib csv parser, columnar rows from the mapped
+            columns. Fields are typed the same way as by `parse_loan_request()`, see `lean_csv.py`.
+
+            Arguments:
+                header_line (string) or None
+                rows (list of string) or range
+
+            Returns:
+                loan_requests (list of LoanRequest objects)
+
+            Raises:
+                ValueError: if a loan column is missing or a loan has an invalid value
+        """
+        if header_line is None:
+            if self.loan_columns is None:
+                self.loan_columns = columnar.load_columns(self.loans_csv_path)
+            columns = [self.loan_columns[name][rows.start:rows.stop].tolist() for name in LOAN_COLUMNS]
+            # NOTE: Missing text values are stored as empty strings
+            return [LoanRequest(int(loan_id), float(amount), float(default_likelihood), float(interest_rate),
+                                str(origin_state) if origin_state != '' else 'nan')
+                    for loan_id, amount, default_likelihood, interest_rate, origin_state in zip(*columns)]
+
+        names = next(csv.reader([header_line]))
+        loan_id, amount, default_likelihood, interest_rate, origin_state = [names.index(name) for name in LOAN_COLUMNS]
+        loan_requests = []
+        for row in csv.reader(rows):
+            if not row:
+                continue  # Blank line, skipped by `pd.read_csv` as well
+            if len(row) < len(names):
+                row += [''] * (len(names) - len(row))
+            loan_requests.append(LoanRequest(lean_csv.to_int(row[loan_id]),
+                                             lean_csv.to_float(row[amount]),
+                                             lean_csv.to_float(row[default_likelihood]),
+                                             lean_csv.to_float(row[interest_rate]),
+                                             lean_csv.to_str(row[origin_state])))
+        return loan_requests
+
+    def iter_loan_line_batches(self, idle=False):
+        """
+            Streams raw loan csv lines in batches of at most `loans_chunksize` lines. Stdin and
+            followed files are read line by line so loans are handed out as soon as they arrive:
+            a partial batch is released whenever the input is drained, i.e. at the end of a
+            followed file or when stdin stays quiet for a poll interval (see `utils.stream_lines()`).
+
+            NOTE: While waiting on a drained input, buffered assignment logs are flushed so
+            downstream readers are not left behind. The first `loans_processed` loans are skipped.
+
+            Arguments:
+                idle (bool): Also yield an empty batch when the input is drained with no loans
+                    pending, thus consumers get control back while no loans arrive
+
+            Returns:
+                generator of (header_line, lines): csv header line and a list of data lines
+
+            Raises:
+                OSError: if loans_csv_path is not accessible
+        """
+        header_line = None
+        lines = []
+        skip_loans = self.loans_processed
+        for line in utils.stream_lines(self.loans_csv_path, self.follow_loans):
+            if line is None:
+                # Input drained: release what we have
+                self.flush_assignment_sinks()
+                if idle and not lines and header_line is not None:
+                    yield header_line, []
+                    continue
+            elif header_line is None:
+                header_line = line
+                continue
+            elif skip_loans:
+                # Processed before a restart
+                skip_loans -= 1
+                continue
+            else:
+                lines.append(line)
+                if len(lines) < self.loans_chunksize:
+                    continue
+
+            if lines:
+                yield header_line, lines
+                lines = []
+
+        if lines:
+            yield header_line, lines
+
+    @staticmethod
+    def parse_loan_lines(header_line, lines):
+        """
+            Parses a batch of raw loan csv lines into a dataframe
+
+            NOTE: Uses the same csv parser as regular files for identical typing
+
+            Arguments:
+                header_line (string)
+                lines (list of string)
+
+            Returns:
+                loans_df (dataframe)
+        """
+        return pd.read_csv(StringIO(header_line + ''.join(lines)))
+
+    def iter_loan_batches(self, idle=False):
+        """
+            Streams loans as dataframe chunks of at most `loans_chunksize` rows, thus peak memory is
+            bounded independent of the number of loans.
+
+            Regular files are read with the chunked csv parser. Stdin and followed files are read
+            line by line, see `iter_loan_line_batches()`. Columnar files are memory-mapped and
+            sliced into chunks. The first `loans_processed` loans are skipped without being parsed.
+
+            Arguments:
+                idle (bool): Also yield an empty chunk when the input is drained, see
+                    `iter_loan_line_batches()`
+
+            Returns:
+                generator of dataframe
+
+            Raises:
+                OSError: if loans_csv_path is not accessible
+        """
+        if columnar.is_columnar(self.loans_csv_path):
+            # NOTE: Columnar files are static, `follow_loans` does not apply
+            for loans_df in columnar.iter_frames(columnar.load_columns(self.loans_csv_path), self.loans_chunksize,
+                                                 self.loans_processed):
+                yield loans_df
+            return
+
+        if self.loans_csv_path != utils.STDIN_PATH and not self.follow_loans:
+            if not self.loans_processed:
+                for loans_df in pd.read_csv(self.loans_csv_path, chunksize=self.loans_chunksize):
+                    yield loans_df
+                return
+
+            # Resuming: skip processed lines without parsing them, then parse the rest as usual
+            with open(self.loans_csv_path) as csvfile:
+                names = next(csv.reader([next(csvfile)]))
+                collections.deque(itertools.islice(csvfile, self.loans_processed), maxlen=0)
+                for loans_df in pd.read_csv(csvfile, names=names, header=None, chunksize=self.loans_chunksize):
+                    if len(loans_df):
+                        yield loans_df
+            return
+
+        for header_line, lines in self.iter_loan_line_batches(idle):
+            yield self.parse_loan_lines(header_line, lines)
+
+    def iter_loan_request_batches(self, idle=False):
+        """
+            Streams loans as lists of at most `loans_chunksize` `LoanRequest` objects. With
+            `lean_io`, chunks are parsed by `parse_loan_requests()` and pandas is not imported,
+            otherwise dataframe batches are parsed row by row, see `iter_loan_batches()`. The
+            first `loans_processed` loans are skipped.
+
+            Arguments:
+                idle (bool): Also yield an empty list when the input is drained, see
+                    `iter_loan_line_batches()`
+
+            Returns:
+                generator of list of LoanRequest objects
+
+            Raises:
+                OSError: if loans_csv_path is not accessible
+        """
+        if not self.lean_io:
+            for loans_df in self.iter_loan_batches(idle):
+                yield [self.parse_loan_request(loan) for loan in loans_df.itertuples()]
+            return
+
+        for header_line, rows in self.iter_loan_chunks(idle):
+            loan_requests = self.parse_loan_requests(header_line, rows)
+            if loan_requests or not rows:
+                yield loan_requests
+
+    def iter_loan_chunks(self, idle=False):
+        """
+            Streams unparsed loan chunks of at most `loans_chunksize` loans, for engines that parse
+            loans in worker processes. A chunk is a pair of:
+                1. csv input: (header_line, lines), see `iter_loan_line_batches()`
+                2. columnar input: (None, rows), where rows is a `range` of row numbers
+
+            Both parts of a chunk are cheap to pickle and `len(rows)` is the number of loans.
+
+            Arguments:
+                idle (bool): Also yield a chunk without lines when the input is drained, see
+                    `iter_loan_line_batches()`
+
+            Returns:
+                generator of (header_line, rows)
+
+            Raises:
+                OSError: if loans_csv_path is not accessible
+        """
+        if not columnar.is_columnar(self.loans_csv_path):
+            for header_line, lines in self.iter_loan_line_batches(idle):
+                yield header_line, lines
+            return
+
+        rows = columnar.column_rows(columnar.load_columns(self.loans_csv_path))
+        for start in range(self.loans_processed, rows, self.loans_chunksize):
+            yield None, range(start, min(start + self.loans_chunksize, rows))
+
+    def parse_loan_chunk(self, header_line, rows):
+        """
+            Parses a chunk produced by `iter_loan_chunks()` into a dataframe
+
+            NOTE: Columnar loans are memory-mapped on first use, thus each process maps them once
+            and all processes share the same pages.
+
+            Arguments:
+                header_line (string) or None
+                rows (list of string) or range
+
+            Returns:
+                loans_df (dataframe)
+        """
+        if header_line is not None:
+            return self.parse_loan_lines(header_line, rows)
+
+        if self.loan_columns is None:
+            self.loan_columns = columnar.load_columns(self.loans_csv_path)
+        return columnar.columns_to_frame(self.loan_columns, rows.start, rows.stop)
+
+    def find_facility(self, loan_request, candidates=None, capacity_tree=None):
+        """
+            Finds the cheapest facility that can issue a loan request, i.e. the first facility in
+            `facilities_list` satisfying all its constraints and covenants. Facilities carrying a
+            stateful covenant type are validated once found and skipped if exhausted for the loan,
+            see `covenants.py`.
+
+            Arguments:
+                loan_request (LoanRequest)
+                candidates (integer bitmap) or None: Precomputed by `CovenantIndex.candidates_batch()`
+                capacity_tree (CapacityTree) or None: Defaults to `self.capacity_tree`
+
+            Returns:
+                position (integer) or None: Position in `facilities_list`
+        """
+        capacity_tree = capacity_tree or self.capacity_tree
+        if candidates is None:
+            candidates = self.covenant_index.candidates(loan_request)
+        stateful_mask = self.covenant_index.stateful_mask
+        probes = capacity_tree.probes
+        position = capacity_tree.find_facility(loan_request.amount, candidates)
+        while position is not None and stateful_mask >> position & 1 and \
+                not self.facilities_list[position].is_valid_assignment(loan_request):
+            candidates &= ~(1 << position)
+            position = capacity_tree.find_facility(loan_request.amount, candidates)
+        self.metrics.increment('facilities_scanned', capacity_tree.probes - probes)
+        return position
+
+    def fast_reject(self, loan_request, capacity_tree=None):
+        """
+            Rejects loans that no facility could ever issue, in constant time using global bounds
+            over all facilities (see `CovenantIndex` and `CapacityTree.max_capacity()`)
+
+            Arguments:
+                loan_request (LoanRequest)
+                capacity_tree (CapacityTree) or None: Defaults to `self.capacity_tree`
+
+            Returns:
+                reason (string) or None: Rejection reason code, None if the loan may be assignable
+        """
+        if loan_request.default_likelihood > self.covenant_index.max_default_likelihood:
+            return REJECT_DEFAULT_LIKELIHOOD
+        if loan_request.origin_state in self.covenant_index.banned_everywhere:
+            return REJECT_BANNED_STATE
+        reason = self.covenant_index.covenant_rejection(loan_request)
+        if reason is not None:
+            return reason
+        if loan_request.amount > (capacity_tree or self.capacity_tree).max_capacity():
+            return REJECT_AMOUNT
+        return None
+
+    def fast_reject_batch(self, loans_df):
+        """
+            Vectorized `fast_reject()` over a dataframe of loans
+
+            NOTE: Balances only decrease, thus a loan above the largest balance at the start of a
+            batch stays unassignable for the rest of the batch. A negative loan amount grows a
+            balance though, loans following it are checked against balances at their turn.
+
+            Arguments:
+                loans_df (dataframe)
+
+            Returns:
+                reasons (series) or None: Rejection reason code per loan (None where the loan may be
+                    assignable), None if no loan of the batch is rejected
+        """
+        covenant_index = self.covenant_index
+        default_likelihood = loans_df.default_likelihood.astype(float) > covenant_index.max_default_likelihood
+        banned_state = loans_df.state.astype(str).isin(covenant_index.banned_everywhere)
+        covenant_rejections = covenant_index.covenant_rejections(loans_df)
+        amounts = loans_df.amount.astype(float)
+        amount = (amounts > self.capacity_tree.max_capacity()).values
+        refunds = (amounts < 0).values
+        if refunds.any():
+            amount[refunds.argmax():] = False
+        if not (default_likelihood.any() or banned_state.any() or amount.any() or
+                any(rejected.any() for rejected, _ in covenant_rejections)):
+            return None
+
+        reasons = np.full(len(loans_df), None, dtype=object)
+        reasons[amount] = REJECT_AMOUNT
+        for rejected, reason in reversed(covenant_rejections):
+            reasons[rejected] = reason
+        reasons[banned_state.values] = REJECT_BANNED_STATE
+        reasons[default_likelihood.values] = REJECT_DEFAULT_LIKELIHOOD
+        return pd.Series(reasons, index=loans_df.index)
+
+    def fast_reject_requests(self, loan_requests):
+        """
+            `fast_reject()` over a batch of parsed loans, global bounds are looked up once per batch
+            rather than once per loan. Same balance semantics as `fast_reject_batch()`.
+
+            Arguments:
+                loan_requests (list of LoanRequest objects)
+
+            Returns:
+                reasons (list of string or None): Rejection reason code per loan, None where the
+                    loan may be assignable
+        """
+        covenant_index = self.covenant_index
+        max_default_likelihood = covenant_index.max_default_likelihood
+        banned_everywhere = covenant_index.banned_everywhere
+        max_capacity = self.capacity_tree.max_capacity()
+        reasons = covenant_index.covenant_rejection_requests(loan_requests)
+        for index, loan_request in enumerate(loan_requests):
+            if loan_request.amount < 0:
+                max_capacity = float('inf')  # NOTE: Refunds grow balances, see `fast_reject_batch()`
+            if loan_request.default_likelihood > max_default_likelihood:
+                reasons[index] = REJECT_DEFAULT_LIKELIHOOD
+            elif loan_request.origin_state in banned_everywhere:
+                reasons[index] = REJECT_BANNED_STATE
+            elif reasons[index] is None and loan_request.amount > max_capacity:
+                reasons[index] = REJECT_AMOUNT
+        return reasons
+
+    def rejection_reason(self, loan_request, capacity_tree=None, candidates=None):
+        """
+            Reason code for a loan that no facility can issue at the moment
+
+            Arguments:
+                loan_request (LoanRequest)
+                capacity_tree (CapacityTree) or None: Defaults to `self.capacity_tree`
+                candidates (integer bitmap) or None: Candidates of a facility search that just
+                    failed, thus the search is not repeated
+
+            Returns:
+                reason (string) or None: None if some facility can issue the loan
+        """
+        capacity_tree = capacity_tree or self.capacity_tree
+        reason = self.fast_reject(loan_request, capacity_tree)
+        if reason is not None:
+            return reason
+        if candidates is None:
+            candidates = self.covenant_index.candidates(loan_request)
+            if candidates and self.find_facility(loan_request, candidates, capacity_tree) is not None:
+                return None
+        return REJECT_CAPACITY if candidates else REJECT_COVENANTS
+
+    def add_facility(self, facility):
+        """
+            Inserts a facility into `facilities_list` after all facilities with the same or a
+            lower interest rate, i.e. where a stable sort would have put it, and accounts it in the
+            covenant index, the capacity tree and the yield ledger
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Positions of the
+            facilities following the new one shift by one, thus it must only be called between
+            loans.
+
+            Arguments:
+                facility (Facility)
+
+            Returns:
+                position (integer): Position of the new facility in `facilities_list`
+
+            Side Effects:
+                Updates `facilities_list` and all indexes
+        """
+        # Binary search for the first facility with a higher interest rate, i.e. `bisect_right()`
+        # NOTE: Written out, `bisect` only accepts a key function from Python 3.10 on
+        position = 0
+        high = len(self.facilities_list)
+        while position < high:
+            middle = (position + high) // 2
+            if facility.interest_rate < self.facilities_list[middle].interest_rate:
+                high = middle
+            else:
+                position = middle + 1
+        self.facilities_list.insert(position, facility)
+        self.covenant_index.insert(position, facility)
+        self.capacity_tree.insert(position)
+        self.yield_ledger.add_facility(facility)
+        self.facilities_version += 1
+        self.metrics.increment('facilities_added')
+        return position
+
+    def replace_facilities(self, facilities_list):
+        """
+            Serves another list of facilities from scratch, e.g. a what-if scenario with
+            overridden covenants (see `scenario_runner.py`). Covenant and capacity indexes and the
+            yield ledger are rebuilt, bank names are kept.
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Must only be called
+            between loans.
+
+            Arguments:
+                facilities_list (list of Facility objects): Sorted in assignment preference order
+
+            Returns:
+                None
+
+            Side Effects:
+                Replaces `facilities_list` and all indexes
+        """
+        bank_names = dict((bank_id, bank['name']) for bank_id, bank in self.yield_ledger.banks.items())
+        self.facilities_list = facilities_list
+        self.covenant_index = CovenantIndex(facilities_list)
+        self.capacity_tree = CapacityTree(facilities_list)
+        self.yield_ledger = YieldLedger(facilities_list, bank_names)
+        self.metrics.yield_ledger = self.yield_ledger
+        self.facilities_version += 1
+
+    def merge_facility_list(self, facilities_list):
+        """
+            Adds every facility not served yet, see `add_facility()`. Facilities already served
+            are left untouched, thus merging a full snapshot only adds what is new.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                facilities_list (list of Facility objects)
+
+            Returns:
+                facility_ids (list of integer): Ids of the added facilities
+        """
+        facility_ids = []
+        for facility in facilities_list:
+            if facility.facility_id not in self.yield_ledger.facilities:
+                self.add_facility(facility)
+                facility_ids.append(facility.facility_id)
+        return facility_ids
+
+    def merge_facilities(self, facilities_csv_path, covenants_csv_path):
+        """
+            Merges new facilities and covenants csv into the running server, keeping balances and
+            yields of the facilities already served
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Must only be called
+            between loans, e.g. from the thread running the loan stream.
+
+            Arguments:
+                facilities_csv_path (string)
+                covenants_csv_path (string)
+
+            Returns:
+                facility_ids (list of integer): Ids of the added facilities
+
+            Raises:
+                OSError: if any of the facilities or covenants files are not accessible
+                TypeError: if the files have invalid values
+        """
+        return self.merge_facility_list(self.parse_facilities_and_covenants(
+            lean_csv.read_table(facilities_csv_path), lean_csv.read_table(covenants_csv_path)))
+
+    def watch_facilities(self, directory, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+            Merges facilities dropped into a watched directory, see `facility_watcher.py`.
+            Facilities already in the directory are merged right away, later ones at the next
+            batch boundary after they were parsed in the background.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                directory (string)
+                poll_interval (float): Seconds between directory scans
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if directory is not accessible
+        """
+        self.facility_watcher = FacilityWatcher(directory, self.parse_facilities_and_covenants, poll_interval)
+        self.facility_watcher.scan()
+        self.merge_pending_facilities()
+        self.facility_watcher.start()
+
+    def merge_pending_facilities(self):
+        """
+            Merges facilities parsed by the directory watcher since the last call. No-op if no
+            directory is watched.
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Must only be called
+            between loans.
+
+            Arguments:
+                None
+
+            Returns:
+                facility_ids (list of integer): Ids of the added facilities
+        """
+        facility_ids = []
+        while self.facility_watcher is not None and not self.facility_watcher.updates.empty():
+            facility_ids.extend(self.merge_facility_list(self.facility_watcher.updates.get_nowait()))
+        return facility_ids
+
+    def stop_watching_facilities(self):
+        """
+            Stops the directory watcher started by `watch_facilities()`, if any
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+        """
+        if self.facility_watcher is not None:
+            self.facility_watcher.stop()
+
+    def issue_loan(self, position, loan_request):
+        """
+            Issues a loan from the facility at `position` and keeps indexes up to date
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                position (integer): Position in `facilities_list`
+                loan_request (LoanRequest)
+
+            Returns:
+                expected_yield (float)
+
+            Side Effects:
+                1. Updates facility balance and yield via `Facility.issue_loan()`
+                2. Updates `self.capacity_tree`, `self.yield_ledger` and `self.metrics`
+        """
+        facility = self.facilities_list[position]
+        expected_yield = facility.issue_loan(loan_request)
+        self.capacity_tree.update(position)
+        self.yield_ledger.record(facility, loan_request.amount, expected_yield)
+
+        self.metrics.increment('assignments')
+        if facility.balance_amount <= 0:
+            self.metrics.increment('exhausted_facilities')
+        return expected_yield
+
     def process_loans_stream(self, assignment_csv_path):
         """
             Processes a loan stream to find an optimal yield given a list of facilities
@@ -143,7 +836,7 @@ class LoanFacilitiesServer(object):
 
             For every loan in the stream, perform the following steps:
                 1. Parse a single loan request
-                2. Find an optimal valid loan assignment given `facilities_list`
+                2. Find an optimal valid loan assignment given `facilities_list` (via indexes)
                 3. Issue Loan via a facility
                 4. Log loan assignmnet
 
@@ -166,29 +859,298 @@ class LoanFacilitiesServer(object):
         # NOTE: On a large-scale high-performance production system this should be implemented
         # as a distributed system workers performing various streaming and batch reporting tasks
 
-        for loan in self.loans_df.itertuples():
-            # Parse a _single_ Loan Request
-            loan_request = self.parse_loan_request(loan)
-            # Iterate over facilities for loan assignments
-            for facility in self.facilities_list:
-                if facility.is_valid_assignment(loan_request):
-                    # Issue Loan and compute corresponding expected yield
-                    # NOTE: Return value `expected_yield` of `issue_loan` is unused here but could be used
-                    # to feed into a real-time monitoring dashboard. Imagine a graph of:
-                    #     (a) Overall Yield vs. Time, or
-                    #     (b) Yield Per Facility vs. Time
-                    facility.issue_loan(loan_request)
-
-                    # Log Loan Assignment
-                    self.log_loan_assignment(assignment_csv_path, loan_request.loan_id, facility.facility_id)
-
-                    # Loan request satisfied
+        metrics = self.metrics
+        try:
+            if self.lean_io:
+                for loan_requests in metrics.timed(self.iter_loan_request_batches(), 'read'):
+                    self.process_loan_requests(loan_requests, assignment_csv_path)
+                    self.advance_loans_stream(len(loan_requests), loan_requests[-1].loan_id, assignment_csv_path)
+            else:
+                for loans_df in metrics.timed(self.iter_loan_batches(), 'read'):
+                    self.process_loan_batch(loans_df, assignment_csv_path)
+                    self.advance_loans_stream(len(loans_df), int(loans_df.id.iloc[-1]), assignment_csv_path)
+            self.checkpoint(assignment_csv_path)
+        finally:
+            # Flush buffered assignments, also when interrupted by an exception
+            self.close_assignment_sinks()
+            metrics.export_snapshot(wait=True)
+
+    def process_loan_batch(self, loans_df, assignment_csv_path):
+        """
+            Assigns a dataframe batch of loans in loan order, see `process_loan_requests()`.
+            Global bounds and static covenants are evaluated for the whole batch at once.
+
+            NOTE: This is not an idempotent fuction as it issues side effects. The position in
+            the loans stream is not advanced, see `advance_loans_stream()`.
+
+            Arguments:
+                loans_df (dataframe)
+                assignment_csv_path (string) or None: Assignments are not logged if None
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if assignment_csv_path is not accessible
+                AttributeError: if `loan` is not a valid dataframe row
+                TypeError: if `loan` has an invalid value
+
+            Side Effects:
+                Updates facilities and indexes, writing to a file
+        """
+        metrics = self.metrics
+
+        # Reject impossible loans and evaluate static covenants of the whole batch at once
+        metrics.lap()
+        reasons = self.fast_reject_batch(loans_df)
+        candidates = self.covenant_index.candidates_batch(loans_df)
+        metrics.lap('search')
+
+        # Parse Loan Requests
+        loan_requests = [self.parse_loan_request(loan) for loan in loans_df.itertuples()]
+        metrics.lap('parse')
+
+        self.process_loan_requests(loan_requests, assignment_csv_path, candidates,
+                                   [None] * len(loan_requests) if reasons is None else reasons.tolist())
+
+    def process_loan_requests(self, loan_requests, assignment_csv_path, candidates=None, reasons=None):
+        """
+            Assigns a batch of parsed loans in loan order, see `process_loans_stream()`
+
+            NOTE: This is not an idempotent fuction as it issues side effects. The position in
+            the loans stream is not advanced, see `advance_loans_stream()`.
+
+            Arguments:
+                loan_requests (list of LoanRequest objects)
+                assignment_csv_path (string) or None: Assignments are not logged if None
+                candidates (list of integer bitmap) or None: Static covenant candidates per loan,
+                    see `CovenantIndex.candidates_batch()`. Looked up for the whole batch if None,
+                    see `CovenantIndex.candidates_requests()`.
+                reasons (list of string) or None: Fast rejection reason per loan (None where the
+                    loan may be assignable), see `fast_reject_batch()`. Checked for the whole batch
+                    if None, see `fast_reject_requests()`.
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if assignment_csv_path is not accessible
+
+            Side Effects:
+                Updates facilities and indexes, writing to a file
+        """
+        metrics = self.metrics
+        if reasons is None or candidates is None:
+            # Reject impossible loans and evaluate static covenants of the whole batch at once
+            metrics.lap()
+            if reasons is None:
+                reasons = self.fast_reject_requests(loan_requests)
+            if candidates is None:
+                candidates = self.covenant_index.candidates_requests(loan_requests)
+            metrics.lap('search')
+
+        rejections = []
+        for index, loan_request in enumerate(loan_requests):
+            metrics.lap()
+            reason = reasons[index]
+            if reason is not None:
+                metrics.lap('search')
+                metrics.tick()
+                metrics.increment('fast_rejections')
+                rejections.append((loan_request.loan_id, reason))
+                continue
+
+            # Look up the cheapest eligible facility through the covenant and capacity indexes
+            loan_candidates = candidates[index]
+            position = self.find_facility(loan_request, loan_candidates)
+            metrics.lap('search')
+            metrics.tick()
+            if position is None:
+                rejections.append((loan_request.loan_id,
+                                   self.rejection_reason(loan_request, candidates=loan_candidates)))
+                continue
+
+            # Issue Loan and compute corresponding expected yield
+            # NOTE: Running yields are exported with `self.metrics` snapshots, see `Metrics`
+            self.issue_loan(position, loan_request)
+            metrics.lap('issue')
+
+            # Log Loan Assignment
+            if assignment_csv_path is not None:
+                facility_id = self.facilities_list[position].facility_id
+                self.log_loan_assignment(assignment_csv_path, loan_request.loan_id, facility_id)
+            metrics.lap('log')
+
+        # Rejections in loan order
+        metrics.increment('rejections', len(rejections))
+        self.log_loan_rejections(rejections)
+        metrics.lap('log')
+
+    def advance_loans_stream(self, loans, last_loan_id, assignment_csv_path):
+        """
+            Accounts a fully processed batch of loans, writes a checkpoint every
+            `checkpoint_interval` loans and merges facilities from the watched directory
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Must only be called
+            at batch boundaries, when facility state and the assignment log agree.
+
+            Arguments:
+                loans (integer): Number of loans in the batch
+                last_loan_id (integer): Id of the last loan in the batch
+                assignment_csv_path (string)
+
+            Returns:
+                None
+
+            Side Effects:
+                1. Writing to a file
+                2. Merges facilities, see `merge_pending_facilities()`
+        """
+        self.loans_processed += loans
+        self.last_loan_id = last_loan_id
+        if self.checkpoint_path is not None and \
+                self.loans_processed - self.checkpointed_loans >= self.checkpoint_interval:
+            self.checkpoint(assignment_csv_path)
+        self.merge_pending_facilities()
+
+    def checkpoint(self, assignment_csv_path):
+        """
+            Writes a checkpoint of facility balances, yields, loan counts and state exposures
+            together with the position in the loans stream and the size of the assignment log.
+            No-op if checkpointing is disabled.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                assignment_csv_path (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if the checkpoint or the assignment log are not accessible
+
+            Side Effects:
+                1. Flushes and syncs the assignment log
+                2. Writing to a file
+        """
+        if self.checkpoint_path is None:
+            return
+
+        sink = self.assignment_sinks.get(assignment_csv_path)
+        if sink is not None:
+            sink.flush()
+            os.fsync(sink.csvfile.fileno())
+        assignment_log_offset = os.path.getsize(assignment_csv_path) if os.path.exists(assignment_csv_path) else 0
+
+        checkpoint.write_checkpoint(self.checkpoint_path, self.facilities_list, self.yield_ledger.facility_loans,
+                                    self.loans_processed, self.last_loan_id, assignment_log_offset)
+        self.checkpointed_loans = self.loans_processed
+
+    def recover(self, assignment_csv_path):
+        """
+            Recovers from a crash: restores facility state from the last checkpoint and replays
+            only the tail of the assignment log written after it. Subsequent processing resumes
+            right after the last logged loan, so no assignment is logged twice. Without a
+            checkpoint the whole assignment log is replayed. No-op if checkpointing is disabled
+            or there is nothing to recover.
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Must be called before
+            constructing an assignment engine.
+
+            Replay:
+                1. Facility balances, yields, loan counts and state exposures are set from the
+                   checkpoint
+                2. A partially written last row of the assignment log is truncated
+                3. Loans following the checkpointed stream position are read again. Loans found in
+                   the log tail are issued from their logged facility, others were rejected.
+                   Loans processed after the last logged one are simply processed again. The
+                   deterministic engines (greedy, vectorized, parallel in exact mode) thus reach
+                   the outcome of an uninterrupted run. Windows of the windowed engine depend on
+                   timing and batch boundaries, thus its reprocessed loans may be assigned
+                   differently, still within all covenants and balances.
+
+            Arguments:
+                assignment_csv_path (string)
+
+            Returns:
+                replayed (integer): Number of assignments replayed from the log tail
+
+            Raises:
+                OSError: if the checkpoint or the loans csv are not accessible
+                ValueError: if the checkpoint or the assignment log do not match the facilities or
+                    the loans stream
+        """
+        if self.checkpoint_path is None:
+            return 0
+
+        assignment_log_offset = None
+        if os.path.exists(self.checkpoint_path):
+            state = checkpoint.read_checkpoint(self.checkpoint_path)
+            # NOTE: Facilities merged after the checkpoint was written keep their initial state
+            checkpointed = dict(zip(state['facility_ids'], zip(state['balances'], state['yields'])))
+            if not set(checkpointed) <= set(f.facility_id for f in self.facilities_list):
+                raise ValueError('Checkpoint does not match facilities: %s' % self.checkpoint_path)
+            for position, facility in enumerate(self.facilities_list):
+                if facility.facility_id in checkpointed:
+                    facility.balance_amount, facility.current_yield = checkpointed[facility.facility_id]
+                    if facility.stateful:
+                        facility.state_exposures = dict(state['state_exposures'].get(facility.facility_id, {}))
+                    self.capacity_tree.update(position)
+            self.yield_ledger.restore(dict(zip(state['facility_ids'], state['facility_loans'])))
+            self.loans_processed = self.checkpointed_loans = state['loans_processed']
+            self.last_loan_id = state['last_loan_id']
+            assignment_log_offset = state['assignment_log_offset']
+
+        if not os.path.exists(assignment_csv_path):
+            if assignment_log_offset:
+                raise ValueError('Assignment log missing: %s' % assignment_csv_path)
+            return 0
+
+        # Read the log tail, dropping a partially written last row
+        with open(assignment_csv_path, 'rb+') as csvfile:
+            if assignment_log_offset is None:
+                csvfile.readline()  # header
+                assignment_log_offset = csvfile.tell()
+            csvfile.seek(assignment_log_offset)
+            tail = csvfile.read()
+            complete = tail.rfind(b'\n') + 1
+            if complete < len(tail):
+                csvfile.truncate(assignment_log_offset + complete)
+        assignments = [tuple(int(value) for value in row.split(b','))
+                       for row in tail[:complete].splitlines() if row.strip()]
+        if not assignments:
+            return 0
+
+        # Replay the tail against the loans following the checkpoint
+        positions = {facility.facility_id: position for position, facility in enumerate(self.facilities_list)}
+        replayed = 0
+        loans = 0
+        for loan_requests in self.iter_loan_request_batches():
+            for loan_request in loan_requests:
+                loans += 1
+                loan_id, facility_id = assignments[replayed]
+                if loan_request.loan_id != loan_id:
+                    continue  # Rejected
+                if facility_id not in positions:
+                    raise ValueError('Unknown facility %d in assignment log: %s' % (facility_id, assignment_csv_path))
+                self.issue_loan(positions[facility_id], loan_request)
+                replayed += 1
+                if replayed == len(assignments):
                     break
+            if replayed == len(assignments):
+                break
+        if replayed < len(assignments):
+            raise ValueError('Assignment log does not match loans stream: %s' % assignment_csv_path)
+
+        self.loans_processed += loans
+        self.last_loan_id = assignments[-1][0]
+        return replayed
 
-    @classmethod
     def log_loan_assignment(self, csv_filepath, loan_id, facility_id):
         """
-            Consumes a generic stream writer to log a loan assignment
+            Logs a loan assignment through a long-lived buffered stream writer. One writer is kept
+            open per csv_filepath until `close_assignment_sinks()` is called.
 
             NOTE: This is not an idempotent fuction as it issues side effects
 
@@ -206,9 +1168,83 @@ class LoanFacilitiesServer(object):
             Side Effects:
                 Writing to a file
         """
-        header = ['loan_id', 'facility_id']
-        row_values = [loan_id, facility_id]
-        utils.stream_writer(csv_filepath, header, row_values)
+        sink = self.assignment_sinks.get(csv_filepath)
+        if sink is None:
+            sink = utils.BufferedStreamWriter(csv_filepath, ASSIGNMENT_HEADER)
+            self.assignment_sinks[csv_filepath] = sink
+        sink.write_row([loan_id, facility_id])
+
+    def log_loan_rejections(self, rejections):
+        """
+            Logs loan rejections with their reason codes to `rejection_csv_path` through a
+            long-lived buffered stream writer. No-op if the rejection log is disabled.
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Loans rejected after
+            the last checkpoint may be logged again after a crash recovery.
+
+            Arguments:
+                rejections (list of (loan_id, reason))
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if rejection_csv_path is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        if self.rejection_csv_path is None or not rejections:
+            return
+        sink = self.assignment_sinks.get(self.rejection_csv_path)
+        if sink is None:
+            sink = utils.BufferedStreamWriter(self.rejection_csv_path, REJECTION_HEADER)
+            self.assignment_sinks[self.rejection_csv_path] = sink
+        for loan_id, reason in rejections:
+            sink.write_row([loan_id, reason])
+
+    def flush_assignment_sinks(self):
+        """
+            Flushes all buffered assignment logs while keeping them open
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if an assignment csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        for sink in self.assignment_sinks.values():
+            sink.flush()
+
+    def close_assignment_sinks(self):
+        """
+            Flushes and closes all buffered assignment logs
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if an assignment csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        for sink in self.assignment_sinks.values():
+            sink.close()
+        self.assignment_sinks = {}
 
     def generate_facility_yield_report(self, csv_filepath, facilities_list=None):
         """
@@ -234,9 +1270,28 @@ class LoanFacilitiesServer(object):
         if facilities_list is None:
             facilities_list = self.facilities_list
 
-        drop_columns = ['balance_amount', 'bank_id', 'banned_states', 'initial_amount',
-                        'interest_rate', 'max_default_likelihood', 'current_yield']
-        yield_report = pd.DataFrame(vars(f) for f in facilities_list)
-        yield_report['expected_yield'] = yield_report.current_yield.apply(lambda amount: round(amount))
-        yield_report = yield_report.drop(drop_columns, axis=1)
-        yield_report.to_csv(path_or_buf=csv_filepath, index=False)
+        # NOTE: Written straight from the running facility yields, cheap enough for periodic reports
+        with open(csv_filepath, 'w') as csvfile:
+            writer = csv.writer(csvfile, lineterminator='\n')
+            writer.writerow(YIELD_REPORT_HEADER)
+            writer.writerows([f.facility_id, round(f.current_yield)] for f in facilities_list)
+
+    def generate_bank_yield_report(self, csv_filepath):
+        """
+            Generates a running capacity and yield report per bank
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                csv_filepath (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        self.yield_ledger.write_bank_report(csv_filepath)
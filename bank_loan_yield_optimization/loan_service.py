@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""
+    Asyncio HTTP service around `LoanFacilitiesServer`. Implements the REST API sketched in the
+    README (Q4) on top of the same greedy assignment as the batch stream processor.
+
+    Endpoints:
+        POST /loans                 Request a loan assignment. JSON body with `amount`,
+                                    `interest_rate`, `default_likelihood`, `state` and optional `id`
+        GET /loans/                 All loans and their funding status
+        GET /loans/{id}             Funding status of a loan
+        GET /facilities/            All facilities and their remaining capacity
+        GET /facilities/{id}        Remaining capacity and yield of a facility
+        GET /banks/                 All banks and their running capacity and yield
+        GET /banks/{id}             Running capacity and yield of a bank
+
+    Concurrency:
+        Connections are served concurrently, but facility balances are only ever touched by a
+        single assignment coroutine (`LoanService.assign_loans`). Requests are queued and that
+        coroutine drains the queue in batches, checking and issuing each loan without yielding to
+        the event loop in between. Hence a facility's `balance_amount` can never be double-spent,
+        and under load many requests are assigned per event loop iteration.
+
+    Errors:
+        A loan failing unexpectedly while being assigned fails its own request with a 500
+        response, the assignment coroutine carries on with the next loan.
+"""
+
+import asyncio
+import json
+import logging
+
+from loan_request import LoanRequest
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH_SIZE = 256
+
+HTTP_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error'}
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """
+        HTTP error carrying a status code and a message for the response body
+    """
+
+    def __init__(self, status, message):
+        super(HTTPError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LoanService(object):
+    """
+        Asyncio HTTP loan-assignment service.
+
+        Idempotent Interfaces:
+            LoanService(): Constructor wrapping a `LoanFacilitiesServer`
+
+        Non-Idempotent Interfaces:
+            serve(): Runs the HTTP server until cancelled
+            request_loan(): Queues a loan request and waits for its assignment
+            assign_loans(): Assignment coroutine draining the request queue in batches
+            assign_loan(): Assigns or rejects a single loan
+    """
+
+    def __init__(self, loan_server, assignment_csv_path=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        """
+            Constructor for `LoanService`
+
+            Arguments:
+                loan_server (LoanFacilitiesServer)
+                assignment_csv_path (string) or None: Assignment log, disabled if None
+                max_batch_size (integer): Maximum number of loans assigned per batch
+
+            Returns:
+                `LoanService` object
+        """
+        self.loan_server = loan_server
+        self.assignment_csv_path = assignment_csv_path
+        self.max_batch_size = max_batch_size
+
+        self.yield_ledger = loan_server.yield_ledger
+        self.loans = {}
+        self.next_loan_id = 1
+        self.pending_requests = None
+
+    def parse_loan_request(self, body):
+        """
+            Parses a `POST /loans` JSON body into a `LoanRequest`
+
+            Arguments:
+                body (bytes)
+
+            Returns:
+                loan_request (LoanRequest object)
+
+            Raises:
+                HTTPError: if the body is not a valid loan request
+        """
+        try:
+            loan = json.loads(body.decode('utf-8'))
+            loan_id = int(loan['id']) if 'id' in loan else self.next_loan_id
+            loan_request = LoanRequest(loan_id,
+                                       float(loan['amount']),
+                                       float(loan['default_likelihood']),
+                                       float(loan['interest_rate']),
+                                       str(loan['state']))
+        except (ValueError, TypeError, KeyError) as error:
+            raise HTTPError(400, 'Invalid loan request: %r' % error)
+
+        if loan_id in self.loans:
+            raise HTTPError(400, 'Duplicate loan id: %d' % loan_id)
+        self.next_loan_id = max(self.next_loan_id, loan_id + 1)
+        # Reserve the id right away so concurrent requests cannot reuse it
+        self.loans[loan_id] = {'loan_id': loan_id, 'status': 'pending', 'facility_id': None, 'expected_yield': None,
+                               'reason': None}
+        return loan_request
+
+    async def request_loan(self, loan_request):
+        """
+            Queues a loan request for the assignment coroutine and waits for the outcome
+
+            Arguments:
+                loan_request (LoanRequest)
+
+            Returns:
+                loan (dictionary): Funding status of the loan
+        """
+        assignment = asyncio.get_running_loop().create_future()
+        await self.pending_requests.put((loan_request, assignment))
+        return await assignment
+
+    async def assign_loans(self):
+        """
+            Assignment coroutine. Drains queued loan requests in batches of up to `max_batch_size`
+            and assigns each one in arrival order.
+
+            NOTE: No `await` between finding a facility and issuing the loan, thus this coroutine
+            has exclusive access to facility balances for the whole check-and-issue step.
+
+            NOTE: An exception assigning a loan is set on that loan's future, i.e. its request
+            fails with a 500 response, and the loan is marked 'failed'. Other loans are not
+            affected.
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                1. Issues loans from facilities
+                2. Writing to a file
+        """
+        loan_server = self.loan_server
+        while True:
+            batch = [await self.pending_requests.get()]
+            while len(batch) < self.max_batch_size and not self.pending_requests.empty():
+                batch.append(self.pending_requests.get_nowait())
+            # Facilities from the watched directory join between batches
+            try:
+                loan_server.merge_pending_facilities()
+            except Exception:
+                logger.exception('Merging facilities failed, serving the current facilities')
+
+            for loan_request, assignment in batch:
+                loan = self.loans[loan_request.loan_id]
+                try:
+                    self.assign_loan(loan_request, loan)
+                except Exception as error:
+                    logger.exception('Assigning loan %s failed', loan_request.loan_id)
+                    loan['status'] = 'failed'
+                    if not assignment.cancelled():
+                        assignment.set_exception(error)
+                    continue
+                if not assignment.cancelled():
+                    assignment.set_result(loan)
+
+    def assign_loan(self, loan_request, loan):
+        """
+            Assigns a single loan to the cheapest eligible facility, or rejects it
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                loan_request (LoanRequest)
+                loan (dictionary): Funding status of the loan, updated in place
+
+            Returns:
+                None
+
+            Side Effects:
+                1. Issues the loan from a facility
+                2. Writing to a file
+        """
+        loan_server = self.loan_server
+        position = loan_server.find_facility(loan_request)
+        if position is None:
+            loan['status'] = 'unassigned'
+            loan['reason'] = loan_server.rejection_reason(loan_request)
+            loan_server.metrics.increment('rejections')
+            loan_server.log_loan_rejections([(loan_request.loan_id, loan['reason'])])
+        else:
+            facility = loan_server.facilities_list[position]
+            loan['expected_yield'] = loan_server.issue_loan(position, loan_request)
+            loan['facility_id'] = facility.facility_id
+            loan['status'] = 'assigned'
+            if self.assignment_csv_path is not None:
+                loan_server.log_loan_assignment(self.assignment_csv_path, loan_request.loan_id,
+                                                facility.facility_id)
+
+    async def route(self, method, path, body):
+        """
+            Dispatches a request to its endpoint
+
+            Arguments:
+                method (string)
+                path (string)
+                body (bytes)
+
+            Returns:
+                (status, payload): HTTP status code and JSON serializable payload
+
+            Raises:
+                HTTPError: on invalid requests
+        """
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+        if not parts or parts[0] not in ('loans', 'facilities', 'banks') or len(parts) > 2:
+            raise HTTPError(404, 'Unknown path: %s' % path)
+
+        if parts == ['loans'] and method == 'POST':
+            loan = await self.request_loan(self.parse_loan_request(body))
+            return 201, loan
+        if method != 'GET':
+            raise HTTPError(405, 'Method not allowed: %s %s' % (method, path))
+
+        if parts[0] == 'loans':
+            records, describe = self.loans, lambda loan_id: dict(self.loans[loan_id])
+        elif parts[0] == 'facilities':
+            records, describe = self.yield_ledger.facilities, self.yield_ledger.facility_status
+        else:
+            records, describe = self.yield_ledger.banks, self.yield_ledger.bank_status
+
+        if len(parts) == 1:
+            return 200, [describe(record_id) for record_id in records]
+        try:
+            return 200, describe(int(parts[1]))
+        except (ValueError, KeyError):
+            raise HTTPError(404, 'Unknown %s id: %s' % (parts[0], parts[1]))
+
+    async def handle_connection(self, reader, writer):
+        """
+            Serves HTTP/1.1 requests on a (keep-alive) connection
+
+            Arguments:
+                reader (asyncio.StreamReader)
+                writer (asyncio.StreamWriter)
+
+            Returns:
+                None
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    header_line = await reader.readline()
+                    if header_line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header_line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, payload = await self.route(method, path, body)
+                except HTTPError as error:
+                    status, payload = error.status, {'error': error.message}
+                except Exception as error:
+                    status, payload = 500, {'error': 'Internal error: %r' % error}
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                content = json.dumps(payload).encode('utf-8')
+                writer.write(('HTTP/1.1 %d %s\r\n'
+                              'Content-Type: application/json\r\n'
+                              'Content-Length: %d\r\n'
+                              'Connection: %s\r\n\r\n' % (status, HTTP_REASONS[status], len(content),
+                                                          'keep-alive' if keep_alive else 'close')).encode('latin-1'))
+                writer.write(content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass  # Malformed request or client went away
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+            Runs the HTTP server and the assignment coroutine until cancelled
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                host (string)
+                port (integer)
+
+            Returns:
+                None
+
+            Side Effects:
+                Writing to a file
+        """
+        self.pending_requests = asyncio.Queue()
+        assigner = asyncio.ensure_future(self.assign_loans())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            assigner.cancel()
+            self.loan_server.close_assignment_sinks()
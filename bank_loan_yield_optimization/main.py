@@ -4,23 +4,63 @@
 
     Executes the following steps:
         1. Creates Loan Facilities Sever
-        2. Runs Loan Stream Processor (main loop)
+        2. Runs Loan Stream Processor (main loop) -or- the HTTP loan service (see `loan_service.py`)
         3. Generates Facilities Yield Report
 
     NOTE: This is the only file that contains configuration settings (global variables).
     Ideally, this configuration should be an independent file -or- imported from a database.
 """
 
+import columnar
+
 from loan_facilities_server import LoanFacilitiesServer
 
+# NOTE: Engines and the loan service are imported when selected, thus a short greedy run does not
+# pay for importing NumPy, multiprocessing or asyncio (see `LEAN_IO`)
+
 DIR_PATH = 'large/'
 BANKS_CSV_PATH = DIR_PATH + 'banks.csv'
 COVENANTS_CSV_PATH = DIR_PATH + 'covenants.csv'
 FACILITIES_CSV_PATH = DIR_PATH + 'facilities.csv'
-LOANS_CSV_PATH = DIR_PATH + 'loans.csv'
+LOANS_CSV_PATH = DIR_PATH + 'loans.csv'  # '-' reads loans from stdin
+# NOTE: Inputs converted with `python columnar.py DIR_PATH` (e.g. `loans.npz` next to `loans.csv`)
+# are memory-mapped instead of parsing the csv, unless the csv is newer, see `columnar.py`
+LOANS_CHUNKSIZE = 1024  # Maximum number of loans held in memory at once
+# Parse inputs with the stdlib csv module (see `lean_csv.py`), pandas is only imported by engines that
+# need dataframes ('vectorized', 'parallel'). False streams loans as dataframes instead.
+LEAN_IO = True
+FOLLOW_LOANS_CSV = False  # Keep reading loans appended to LOANS_CSV_PATH, similar to `tail -f`
+METRICS_SNAPSHOT_TARGET = None  # File path (JSON lines) or http(s) URL for periodic metrics snapshots
+# Facility state checkpoint, e.g. DIR_PATH + 'facilities.ckpt'. When set, a restarted batch run
+# resumes from the last checkpoint instead of reprocessing (and re-logging) all loans
+CHECKPOINT_PATH = None
+CHECKPOINT_INTERVAL = 100000  # loans
+
+# Directory watched for new facilities while loans are processed, see `facility_watcher.py`
+# e.g. DIR_PATH + 'incoming/' picks up `<name>facilities.csv` and `<name>covenants.csv` pairs
+FACILITIES_WATCH_DIR = None
+FACILITIES_POLL_INTERVAL = 1.0  # seconds
 
 ASSIGNMENT_CSV_PATH = DIR_PATH + 'assignment.csv'
 YIELDS_CSV_PATH = DIR_PATH + 'yields.csv'
+BANK_YIELDS_CSV_PATH = DIR_PATH + 'bank_yields.csv'
+REJECTIONS_CSV_PATH = None  # e.g. DIR_PATH + 'rejections.csv' logs unassigned loans with a reason code
+
+# Loan assignment engine: 'greedy' (per-loan scan), 'vectorized' (NumPy micro-batches),
+# 'parallel' (worker processes with shared-memory balances, see `parallel_engine.py`) or
+# 'windowed' (yield-maximizing batch solver per window of loans, see `windowed_engine.py`)
+ASSIGNMENT_ENGINE = 'greedy'
+PARALLEL_WORKERS = 4
+PARALLEL_MODE = 'exact'  # 'exact' reproduces the greedy result, 'relaxed' trades that for throughput
+WINDOW_SIZE = 256  # loans
+WINDOW_INTERVAL = 1.0  # seconds a window stays open at most
+WINDOW_TIME_BUDGET = 0.05  # solver seconds per window before falling back to greedy
+WINDOW_DROP_UNPROFITABLE = False  # Leave loans unassigned that lose yield in every facility
+
+# Run mode: 'batch' (process LOANS_CSV_PATH) or 'service' (HTTP loan service until interrupted)
+RUN_MODE = 'batch'
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8080
 
 
 def main():
@@ -28,13 +68,48 @@ def main():
     # see `argparse`: https://docs.python.org/2/library/argparse.html
 
     # Load and Parse Facilities, Covenants and Loans
-    loan_server = LoanFacilitiesServer(FACILITIES_CSV_PATH, COVENANTS_CSV_PATH, LOANS_CSV_PATH)
+    loan_server = LoanFacilitiesServer(columnar.preferred_path(FACILITIES_CSV_PATH),
+                                       columnar.preferred_path(COVENANTS_CSV_PATH),
+                                       columnar.preferred_path(LOANS_CSV_PATH),
+                                       loans_chunksize=LOANS_CHUNKSIZE, follow_loans=FOLLOW_LOANS_CSV,
+                                       metrics_target=METRICS_SNAPSHOT_TARGET,
+                                       banks_csv_path=columnar.preferred_path(BANKS_CSV_PATH),
+                                       checkpoint_path=CHECKPOINT_PATH, checkpoint_interval=CHECKPOINT_INTERVAL,
+                                       rejection_csv_path=REJECTIONS_CSV_PATH, lean_io=LEAN_IO)
+
+    # Merge Facilities added at Runtime, also before recovering checkpoints that include them
+    if FACILITIES_WATCH_DIR is not None:
+        loan_server.watch_facilities(FACILITIES_WATCH_DIR, FACILITIES_POLL_INTERVAL)
+
+    # Recover Facility State after a Crash
+    if RUN_MODE == 'batch':
+        loan_server.recover(ASSIGNMENT_CSV_PATH)
 
     # Process Loans Stream
-    loan_server.process_loans_stream(ASSIGNMENT_CSV_PATH)
+    if RUN_MODE == 'service':
+        import asyncio
+        from loan_service import LoanService
+        try:
+            asyncio.run(LoanService(loan_server, ASSIGNMENT_CSV_PATH).serve(SERVICE_HOST, SERVICE_PORT))
+        except KeyboardInterrupt:
+            pass
+    elif ASSIGNMENT_ENGINE == 'vectorized':
+        from vectorized_engine import VectorizedAssignmentEngine
+        VectorizedAssignmentEngine(loan_server).process_loans_stream(ASSIGNMENT_CSV_PATH)
+    elif ASSIGNMENT_ENGINE == 'windowed':
+        from windowed_engine import WindowedAssignmentEngine
+        WindowedAssignmentEngine(loan_server, WINDOW_SIZE, WINDOW_INTERVAL, WINDOW_TIME_BUDGET,
+                                 drop_unprofitable=WINDOW_DROP_UNPROFITABLE).process_loans_stream(ASSIGNMENT_CSV_PATH)
+    elif ASSIGNMENT_ENGINE == 'parallel':
+        from parallel_engine import ParallelAssignmentEngine
+        ParallelAssignmentEngine(loan_server, PARALLEL_WORKERS, PARALLEL_MODE).process_loans_stream(ASSIGNMENT_CSV_PATH)
+    else:
+        loan_server.process_loans_stream(ASSIGNMENT_CSV_PATH)
+    loan_server.stop_watching_facilities()
 
     # Print Facility Yield Report
     loan_server.generate_facility_yield_report(YIELDS_CSV_PATH)
+    loan_server.generate_bank_yield_report(BANK_YIELDS_CSV_PATH)
 
 
 if __name__ == '__main__':
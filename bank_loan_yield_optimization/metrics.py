@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+import json
+import queue
+import threading
+import time
+
+from urllib.request import Request, urlopen
+
+STAGES = ['read', 'parse', 'search', 'issue', 'log']
+COUNTERS = ['loans', 'facilities_scanned', 'assignments', 'rejections', 'fast_rejections', 'exhausted_facilities',
+            'facilities_added']
+DEFAULT_SNAPSHOT_INTERVAL = 10.0  # seconds
+SNAPSHOT_CHECK_EVERY = 1024  # loans
+EXPORT_TIMEOUT = 1.0  # seconds
+MAX_PENDING_EXPORTS = 4  # snapshots waiting for the sender thread, further ones are dropped
+
+
+class Metrics(object):
+    """
+        Hot-path instrumentation for loan stream processing.
+
+        Keeps per-stage timers (read, parse, search, issue, log) and counters (loans, facilities
+        scanned, assignments, rejections, rejections by global bounds, exhausted facilities,
+        facilities merged at runtime).
+        Running yields per facility and per bank are read from the `YieldLedger` at snapshot
+        time, thus cost nothing per loan.
+
+        Designed to be left on in production: a stage costs one clock read and one addition, and
+        the snapshot interval is only checked once every `SNAPSHOT_CHECK_EVERY` loans.
+
+        Snapshots are exported periodically to `snapshot_target`:
+            1. http(s):// URL: Snapshot is POSTed as JSON by a background sender thread, thus a
+               slow endpoint never stalls the loan stream
+            2. Any other string: Snapshot is appended as a JSON line to that file
+            3. None: Export disabled, `snapshot()` can still be called on demand
+
+        Usage:
+            metrics.lap()             # Start timing
+            ...parse...
+            metrics.lap('parse')      # Time since the previous lap is accounted to 'parse'
+
+        Idempotent Interfaces:
+            Metrics(): Constructor
+            snapshot(): Current metrics as a dictionary
+
+        Non-Idempotent Interfaces:
+            lap(): Accounts time since the previous lap to a stage
+            increment(): Increments a counter
+            timed(): Wraps an iterator, accounting time spent in `next()` to a stage
+            tick(): Counts processed loans and exports a snapshot when due
+            export_snapshot(): Exports a snapshot to `snapshot_target`
+    """
+
+    def __init__(self, yield_ledger, snapshot_target=None, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        """
+            Constructor for `Metrics`
+
+            Arguments:
+                yield_ledger (YieldLedger)
+                snapshot_target (string) or None: File path or http(s) URL
+                snapshot_interval (float): Seconds between exported snapshots
+
+            Returns:
+                `Metrics` object
+        """
+        self.yield_ledger = yield_ledger
+        self.snapshot_target = snapshot_target
+        self.snapshot_interval = snapshot_interval
+
+        self.clock = time.perf_counter
+        self.timers = dict.fromkeys(STAGES, 0.)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.last_lap = self.clock()
+        self.start_time = time.time()
+        self.last_snapshot_time = self.start_time
+        self.loans_until_check = SNAPSHOT_CHECK_EVERY
+
+        # Snapshots to POST, see `send_snapshots()`. Started on the first HTTP export
+        self.exports = None
+        self.sender = None
+
+    def lap(self, stage=None):
+        """
+            Accounts time since the previous lap to `stage`. Without a stage, only restarts timing.
+
+            Arguments:
+                stage (string) or None
+
+            Returns:
+                None
+        """
+        now = self.clock()
+        if stage is not None:
+            self.timers[stage] += now - self.last_lap
+        self.last_lap = now
+
+    def increment(self, counter, value=1):
+        """
+            Increments a counter
+
+            Arguments:
+                counter (string)
+                value (integer)
+
+            Returns:
+                None
+        """
+        self.counters[counter] += value
+
+    def timed(self, iterable, stage):
+        """
+            Wraps an iterable, accounting time spent producing each item to `stage`
+
+            Arguments:
+                iterable (iterable)
+                stage (string)
+
+            Returns:
+                generator
+        """
+        iterator = iter(iterable)
+        while True:
+            self.lap()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.lap(stage)
+            yield item
+
+    def tick(self, loans=1):
+        """
+            Counts processed loans and exports a snapshot if the interval elapsed
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                loans (integer): Number of loans processed
+
+            Returns:
+                None
+
+            Side Effects:
+                Exporting a snapshot
+        """
+        self.counters['loans'] += loans
+        self.loans_until_check -= loans
+        if self.loans_until_check <= 0:
+            self.loans_until_check = SNAPSHOT_CHECK_EVERY
+            if self.snapshot_target is not None and time.time() - self.last_snapshot_time >= self.snapshot_interval:
+                self.export_snapshot()
+
+    def snapshot(self):
+        """
+            Current metrics as a JSON serializable dictionary
+
+            Arguments:
+                None
+
+            Returns:
+                snapshot (dictionary)
+        """
+        now = time.time()
+        loans = self.counters['loans']
+        return {'timestamp': now,
+                'elapsed_seconds': now - self.start_time,
+                'loans_per_second': loans / max(now - self.start_time, 1e-9),
+                'counters': dict(self.counters),
+                'facilities_scanned_per_loan': self.counters['facilities_scanned'] / float(loans) if loans else 0.,
+                'stage_seconds': dict(self.timers),
+                'facility_yields': {str(facility_id): facility_yield
+                                    for facility_id, facility_yield in self.yield_ledger.facility_yields.items()},
+                'bank_yields': {str(bank_id): bank['expected_yield'] for bank_id, bank in self.yield_ledger.banks.items()},
+                'total_yield': sum(self.yield_ledger.facility_yields.values())}
+
+    def export_snapshot(self, wait=False):
+        """
+            Exports a snapshot to `snapshot_target`. HTTP exports are queued for the sender thread.
+
+            NOTE: This is not an idempotent fuction as it issues side effects. An unreachable
+            endpoint does not interrupt stream processing, the snapshot is dropped, as are
+            snapshots exceeding `MAX_PENDING_EXPORTS` while the endpoint lags behind.
+
+            Arguments:
+                wait (bool): Wait until queued snapshots are sent, e.g. at the end of the stream
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if the snapshot file is not accessible
+
+            Side Effects:
+                Writing to a file or an HTTP request
+        """
+        self.last_snapshot_time = time.time()
+        if self.snapshot_target is None:
+            return
+
+        # NOTE: Taken here, the sender thread only serializes and sends it
+        snapshot = self.snapshot()
+        if self.snapshot_target.startswith(('http://', 'https://')):
+            if self.exports is None:
+                self.exports = queue.Queue(MAX_PENDING_EXPORTS)
+                self.sender = threading.Thread(target=self.send_snapshots, name='metrics-sender', daemon=True)
+                self.sender.start()
+            if wait:
+                self.exports.put(snapshot)
+                self.exports.join()
+                return
+            try:
+                self.exports.put_nowait(snapshot)
+            except queue.Full:
+                pass  # Endpoint lagging behind
+        else:
+            with open(self.snapshot_target, 'a') as jsonfile:
+                jsonfile.write(json.dumps(snapshot, sort_keys=True) + '\n')
+
+    def send_snapshots(self):
+        while True:
+            snapshot = self.exports.get()
+            request = Request(self.snapshot_target, data=json.dumps(snapshot, sort_keys=True).encode('utf-8'),
+                              headers={'Content-Type': 'application/json'})
+            try:
+                urlopen(request, timeout=EXPORT_TIMEOUT).close()
+            except (OSError, ValueError):
+                pass  # Monitoring must never take down the stream
+            finally:
+                self.exports.task_done()
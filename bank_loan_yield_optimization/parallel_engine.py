@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+"""
+    Multi-process alternative to `LoanFacilitiesServer.process_loans_stream()`.
+
+    The parent process reads raw loan csv lines (or row ranges of columnar input) in chunks and
+    hands them to worker processes over a queue. Workers parse their chunk and compute covenant candidates in parallel. Facility
+    balances live in shared memory as the leaves of a `CapacityTree`, yields in a shared array.
+    Workers search the shared tree for a candidate and then issue the loan through a
+    reserve-and-commit protocol: the facility's balance is re-checked and decremented, and its
+    yield incremented, atomically under the lock guarding that facility. The parent logs
+    assignments in loan order and finally copies shared state back into the `Facility` objects.
+
+    Modes:
+        'exact': Commits are serialized in chunk order with a turn counter, thus every loan sees
+            exactly the balances it would see in the sequential greedy engine. Output is
+            byte-identical to `process_loans_stream()`. Parsing and candidate search still run in
+            parallel, ahead of the turn.
+        'relaxed': Workers commit as soon as a chunk is ready. Loans from different chunks race
+            for capacity, so assignments may deviate from the sequential greedy result (a loan
+            may land in a slightly more expensive facility, or none), but each facility's balance
+            is never over-spent. Highest throughput.
+
+    NOTE: Requires the 'fork' start method. Facilities and indexes are inherited copy-on-write
+    by the workers instead of being pickled.
+
+    NOTE: Workers run ahead of the logged loan order, so facility state is only checkpointed
+    once the whole stream has been processed, see `LoanFacilitiesServer.checkpoint()`. For the
+    same reason facilities from a watched directory are only merged at the end of the stream,
+    see `LoanFacilitiesServer.watch_facilities()`.
+
+    NOTE: A worker process dying (e.g. killed) fails the whole stream with a `RuntimeError`, see
+    `put_task()` and `log_results()`. Workers waiting for a commit turn that stalls give up once the
+    parent aborts or exits.
+"""
+
+import copy
+import multiprocessing
+import os
+import queue
+
+EXACT_MODE = 'exact'
+RELAXED_MODE = 'relaxed'
+DEFAULT_WORKERS = multiprocessing.cpu_count()
+NUM_LOCK_STRIPES = 64
+LIVENESS_INTERVAL = 1.0  # seconds between checks for dead worker (or parent) processes
+
+
+class ParallelAssignmentEngine(object):
+    """
+        Multi-process loan assignment engine with shared-memory facility balances
+
+        Idempotent Interfaces:
+            ParallelAssignmentEngine(): Constructor that sets up shared memory and locks
+
+        Non-Idempotent Interfaces:
+            process_loans_stream(): Processes loans across worker processes
+            run_worker(): Worker process main loop
+            put_task(): Queues a loan chunk for the workers
+            log_results(): Logs worker results in loan order
+            reserve_and_commit(): Atomically issues a loan from the first candidate with capacity
+    """
+
+    def __init__(self, loan_server, workers=DEFAULT_WORKERS, mode=EXACT_MODE):
+        """
+            Constructor for `ParallelAssignmentEngine`
+
+            Arguments:
+                loan_server (LoanFacilitiesServer): Server owning facilities and loans
+                workers (integer): Number of worker processes
+                mode (string): `EXACT_MODE` or `RELAXED_MODE`
+
+            Returns:
+                `ParallelAssignmentEngine` object
+
+            Raises:
+                ValueError: if mode is unknown, or if a facility carries a stateful covenant type
+        """
+        if mode not in (EXACT_MODE, RELAXED_MODE):
+            raise ValueError('Unknown mode: %s' % mode)
+        # NOTE: Only balances are shared with the workers, exposures of stateful covenant types are not
+        if loan_server.covenant_index.stateful_mask:
+            raise ValueError('Stateful covenant types are not supported, see covenants.py')
+
+        self.loan_server = loan_server
+        self.workers = workers
+        self.mode = mode
+        self.context = multiprocessing.get_context('fork')
+
+        facilities_list = loan_server.facilities_list
+        # Shared-memory copy of the server's capacity tree, its leaves hold facility balances
+        # NOTE: Internal nodes are refreshed without locks. Balances only decrease, thus a racing
+        # refresh can only leave a node too high, never too low. Leaves are always re-checked.
+        self.capacity_tree = copy.copy(loan_server.capacity_tree)
+        self.capacity_tree.tree = self.context.RawArray('d', loan_server.capacity_tree.tree)
+        self.yields = self.context.RawArray('d', [f.current_yield for f in facilities_list])
+        # Striped locks guard facility balances during reserve-and-commit
+        self.locks = [self.context.Lock() for _ in range(min(NUM_LOCK_STRIPES, max(len(facilities_list), 1)))]
+        # Sequence number of the next chunk allowed to commit in exact mode
+        self.commit_turn = self.context.Value('l', 0, lock=False)
+        self.commit_condition = self.context.Condition()
+        # Set by the parent when it gives up on the stream, workers then stop waiting for turns
+        self.aborted = self.context.Value('b', 0, lock=False)
+        self.parent_pid = os.getpid()
+
+    def reserve_and_commit(self, loan_request, candidates):
+        """
+            Issues a loan from the first candidate facility with enough balance. Candidates are
+            searched optimistically in the shared capacity tree, then the balance is re-checked,
+            decremented and the yield incremented under the facility's lock.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                loan_request (LoanRequest)
+                candidates (integer bitmap): Facilities passing the loan's static covenants
+
+            Returns:
+                (position, expected_yield): Position in `facilities_list` and yield of the loan, or
+                    (None, None)
+
+            Side Effects:
+                Updates shared balances and yields
+        """
+        capacity_tree = self.capacity_tree
+        amount = loan_request.amount
+
+        position = 0
+        while candidates >> position:
+            # NOTE: Capacity is not a constraint for non-positive (or NaN) amounts
+            if amount > 0:
+                position = capacity_tree.first_at_least(amount, position)
+                if position is None:
+                    return None, None
+
+            # Skip ahead to the next candidate at or after `position`
+            remaining = candidates >> position
+            if not remaining:
+                return None, None
+            offset = (remaining & -remaining).bit_length() - 1
+            if offset:
+                position += offset
+                continue
+
+            with self.locks[position % len(self.locks)]:
+                balance = capacity_tree.capacity(position)
+                if not amount > balance:
+                    facility = self.loan_server.facilities_list[position]
+                    expected_yield = facility.compute_loan_yield(loan_request)
+                    capacity_tree.set_capacity(position, balance - amount)
+                    self.yields[position] += expected_yield
+                    return position, expected_yield
+
+            # Lost the race for this facility, balances never grow back
+            position += 1
+
+        return None, None
+
+    def run_worker(self, task_queue, result_queue):
+        """
+            Worker process main loop. Pulls loan chunks until a `None` sentinel arrives.
+
+            Arguments:
+                task_queue (multiprocessing.Queue): (sequence, header_line, rows), see
+                    `LoanFacilitiesServer.iter_loan_chunks()`
+                result_queue (multiprocessing.Queue): (sequence, [(loan_id, position, amount, yield), ...],
+                    [(loan_id, reason), ...])
+
+            Returns:
+                None
+        """
+        loan_server = self.loan_server
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            sequence, header_line, rows = task
+
+            # Parallel part: parse and evaluate static covenants
+            loans_df = loan_server.parse_loan_chunk(header_line, rows)
+            loan_requests = [loan_server.parse_loan_request(loan) for loan in loans_df.itertuples()]
+            candidates = loan_server.covenant_index.candidates_batch(loans_df)
+
+            if self.mode == EXACT_MODE:
+                with self.commit_condition:
+                    # NOTE: A dead worker never passes its turn on, the parent then aborts
+                    while not self.commit_condition.wait_for(lambda: self.commit_turn.value == sequence,
+                                                             LIVENESS_INTERVAL):
+                        if self.aborted.value or os.getppid() != self.parent_pid:
+                            return
+
+            assignments = []
+            rejections = []
+            for loan_request, loan_candidates in zip(loan_requests, candidates):
+                position, expected_yield = self.reserve_and_commit(loan_request, loan_candidates)
+                if position is not None:
+                    assignments.append((loan_request.loan_id, position, loan_request.amount, expected_yield))
+                else:
+                    rejections.append((loan_request.loan_id,
+                                       loan_server.rejection_reason(loan_request, self.capacity_tree, loan_candidates)))
+
+            if self.mode == EXACT_MODE:
+                with self.commit_condition:
+                    self.commit_turn.value = sequence + 1
+                    self.commit_condition.notify_all()
+
+            result_queue.put((sequence, assignments, rejections))
+
+    def put_task(self, task_queue, task, processes):
+        """
+            Queues a loan chunk (or the `None` sentinel) for the workers, checking worker liveness
+            while the queue is full
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                task_queue (multiprocessing.Queue)
+                task (tuple) or None: See `run_worker()`
+                processes (list of multiprocessing.Process)
+
+            Returns:
+                None
+
+            Raises:
+                RuntimeError: if a worker process died
+        """
+        while True:
+            try:
+                task_queue.put(task, timeout=LIVENESS_INTERVAL)
+                return
+            except queue.Full:
+                if any(process.exitcode for process in processes):
+                    raise RuntimeError('Worker process died')
+
+    def log_results(self, result_queue, processes, assignment_csv_path, block):
+        """
+            Collects worker results and logs assignments in loan order, regardless of which worker
+            finished first
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                result_queue (multiprocessing.Queue)
+                processes (list of multiprocessing.Process)
+                assignment_csv_path (string)
+                block (bool): Wait until the next chunk in order is available
+
+            Returns:
+                None
+
+            Raises:
+                RuntimeError: if a worker process died
+
+            Side Effects:
+                Writing to a file
+        """
+        while not result_queue.empty() or (block and self.next_sequence not in self.pending_results):
+            try:
+                sequence, assignments, rejections = result_queue.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                if any(process.exitcode for process in processes):
+                    raise RuntimeError('Worker process died')
+                continue
+            self.pending_results[sequence] = assignments, rejections
+            self.loan_server.metrics.increment('assignments', len(assignments))
+            self.loan_server.metrics.increment('rejections', len(rejections))
+
+        facilities_list = self.loan_server.facilities_list
+        while self.next_sequence in self.pending_results:
+            assignments, rejections = self.pending_results.pop(self.next_sequence)
+            for loan_id, position, amount, expected_yield in assignments:
+                facility = facilities_list[position]
+                self.loan_server.yield_ledger.record(facility, amount, expected_yield)
+                self.loan_server.log_loan_assignment(assignment_csv_path, loan_id, facility.facility_id)
+            self.loan_server.log_loan_rejections(rejections)
+            self.next_sequence += 1
+
+    def process_loans_stream(self, assignment_csv_path):
+        """
+            Processes the loan stream across worker processes. Equivalent to
+            `LoanFacilitiesServer.process_loans_stream()` in exact mode.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                assignment_csv_path (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if assignment_csv_path is not accessible
+                RuntimeError: if a worker process died
+
+            Side Effects:
+                1. Issues loans from facilities
+                2. Writing to a file
+        """
+        loan_server = self.loan_server
+        facilities_list = loan_server.facilities_list
+
+        task_queue = self.context.Queue(maxsize=2 * self.workers)
+        result_queue = self.context.Queue()
+        processes = [self.context.Process(target=self.run_worker, args=(task_queue, result_queue))
+                     for _ in range(self.workers)]
+        for process in processes:
+            process.start()
+
+        self.pending_results = {}
+        self.next_sequence = 0
+
+        loans = 0
+        last_rows = None
+        try:
+            sequence = 0
+            for header_line, rows in loan_server.iter_loan_chunks():
+                self.put_task(task_queue, (sequence, header_line, rows), processes)
+                sequence += 1
+                loans += len(rows)
+                last_rows = rows[-1:]
+                loan_server.metrics.tick(len(rows))
+                self.log_results(result_queue, processes, assignment_csv_path, block=False)
+
+            for _ in processes:
+                self.put_task(task_queue, None, processes)
+            while self.next_sequence < sequence:
+                self.log_results(result_queue, processes, assignment_csv_path, block=True)
+            for process in processes:
+                process.join()
+        finally:
+            self.aborted.value = 1
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            # NOTE: Chunks left for dead workers are dropped instead of blocking interpreter exit
+            task_queue.cancel_join_thread()
+            loan_server.close_assignment_sinks()
+
+            # Copy shared state back into the facilities
+            for position, facility in enumerate(facilities_list):
+                facility.balance_amount = self.capacity_tree.capacity(position)
+                facility.current_yield = self.yields[position]
+                loan_server.capacity_tree.update(position)
+            loan_server.metrics.export_snapshot(wait=True)
+
+        if loans:
+            last_loan_id = int(loan_server.parse_loan_chunk(header_line, last_rows).id.iloc[0])
+            loan_server.advance_loans_stream(loans, last_loan_id, assignment_csv_path)
+        loan_server.checkpoint(assignment_csv_path)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+"""
+    What-if scenario runner, e.g. "what would yields be if facility 9 banned TX" or "if ties in
+    interest rate were broken the other way round", without a full rerun of `main.py` per question.
+
+    Facilities and loans are parsed once in the parent process. Worker processes are forked and
+    inherit the parsed inputs copy-on-write. Every scenario applies its overrides to its own copy
+    of the facilities, rebuilds the indexes (`LoanFacilitiesServer.replace_facilities()`) and runs
+    the greedy engine over the shared loans. The result is a table of per-facility yields with
+    one column per scenario, the first column being the baseline without overrides.
+
+    Scenarios are read from a JSON list:
+        [{"name": "facility_9_bans_tx", "facilities": {"9": {"ban_states": ["TX"]}}},
+         {"name": "reversed_ties", "tie_order": "reversed"}]
+
+    Facility overrides:
+        amount, interest_rate, max_default_likelihood: Replace the facility attribute
+        ban_states, unban_states: States added to / removed from the banned states
+        Pluggable covenant type columns (e.g. max_amount, see `covenants.py`): Replace the limit,
+            null drops it
+
+    Tie orders (facilities with the same interest rate):
+        'input': Facilities csv order, same as `LoanFacilitiesServer`
+        'reversed': Reverse facilities csv order
+
+    NOTE: Requires the 'fork' start method, same as `parallel_engine.py`.
+
+    Usage:
+        python scenario_runner.py --dir large/ --scenarios scenarios.json --output scenario_yields.csv
+"""
+
+import argparse
+import copy
+import csv
+import json
+import multiprocessing
+import os
+import queue
+
+import columnar
+
+from covenants import COVENANT_TYPES_BY_COLUMN
+from loan_facilities_server import LoanFacilitiesServer
+
+BASELINE_SCENARIO = 'baseline'
+TIE_ORDERS = ['input', 'reversed']
+FACILITY_ATTRIBUTES = ['amount', 'interest_rate', 'max_default_likelihood']
+STATE_OVERRIDES = ['ban_states', 'unban_states']
+DEFAULT_WORKERS = multiprocessing.cpu_count()
+
+
+def load_scenarios(json_path):
+    """
+        Loads scenarios from a JSON file
+
+        Arguments:
+            json_path (string)
+
+        Returns:
+            scenarios (list of dictionary)
+
+        Raises:
+            OSError: if json_path is not accessible
+            ValueError: if json_path is not valid JSON
+    """
+    with open(json_path) as jsonfile:
+        return json.load(jsonfile)
+
+
+def validate_scenarios(scenarios, facility_ids):
+    """
+        Validates scenarios before any worker is started and normalizes facility ids to integers
+
+        Arguments:
+            scenarios (list of dictionary)
+            facility_ids (set of integer)
+
+        Returns:
+            scenarios (list of dictionary): Baseline first
+
+        Raises:
+            ValueError: if a scenario is invalid
+    """
+    normalized = [{'name': BASELINE_SCENARIO, 'facilities': {}, 'tie_order': TIE_ORDERS[0]}]
+    names = set([BASELINE_SCENARIO])
+    for scenario in scenarios:
+        name = scenario.get('name')
+        if not name or name in names:
+            raise ValueError('Scenario name missing or not unique: %r' % name)
+        names.add(name)
+
+        tie_order = scenario.get('tie_order', TIE_ORDERS[0])
+        if tie_order not in TIE_ORDERS:
+            raise ValueError('Scenario %s: unknown tie_order %r' % (name, tie_order))
+
+        facilities = {}
+        for facility_id, overrides in scenario.get('facilities', {}).items():
+            if int(facility_id) not in facility_ids:
+                raise ValueError('Scenario %s: unknown facility %s' % (name, facility_id))
+            for key in overrides:
+                if key not in FACILITY_ATTRIBUTES and key not in STATE_OVERRIDES and \
+                        key not in COVENANT_TYPES_BY_COLUMN:
+                    raise ValueError('Scenario %s: unknown override %r of facility %s' % (name, key, facility_id))
+            facilities[int(facility_id)] = overrides
+        normalized.append({'name': name, 'facilities': facilities, 'tie_order': tie_order})
+    return normalized
+
+
+def apply_overrides(facility, overrides):
+    """
+        Applies a scenario's overrides to a facility without any loans issued
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            facility (Facility)
+            overrides (dictionary): See module docstring
+
+        Returns:
+            None
+    """
+    if 'amount' in overrides:
+        facility.initial_amount = facility.balance_amount = float(overrides['amount'])
+    if 'interest_rate' in overrides:
+        facility.interest_rate = float(overrides['interest_rate'])
+    if 'max_default_likelihood' in overrides:
+        facility.max_default_likelihood = float(overrides['max_default_likelihood'])
+    facility.banned_states.update(overrides.get('ban_states', []))
+    facility.banned_states.difference_update(overrides.get('unban_states', []))
+    for column in COVENANT_TYPES_BY_COLUMN:
+        if column in overrides:
+            facility.set_covenant_limit(column, None if overrides[column] is None else float(overrides[column]))
+
+
+class ScenarioRunner(object):
+    """
+        Evaluates what-if scenarios in parallel worker processes over inputs parsed once
+
+        Idempotent Interfaces:
+            ScenarioRunner(): Constructor that parses facilities and loans
+            csv_order(): Facilities of a freshly parsed server in facilities csv order
+            scenario_facilities(): Facilities of a scenario in assignment preference order
+
+        Non-Idempotent Interfaces:
+            run_scenario(): Runs the greedy engine for a single scenario
+            run_worker(): Worker process main loop
+            run(): Runs all scenarios across worker processes
+            write_report(): Writes the per-facility yield comparison table
+    """
+
+    def __init__(self, loan_server, scenarios, workers=DEFAULT_WORKERS):
+        """
+            Constructor for `ScenarioRunner`
+
+            Arguments:
+                loan_server (LoanFacilitiesServer): Freshly parsed server, no loans processed yet
+                scenarios (list of dictionary): See `load_scenarios()`
+                workers (integer): Number of worker processes
+
+            Returns:
+                `ScenarioRunner` object
+
+            Raises:
+                ValueError: if a scenario is invalid
+                OSError: if the loans file is not accessible
+        """
+        self.loan_server = loan_server
+        self.workers = workers
+        self.context = multiprocessing.get_context('fork')
+
+        # Pristine facilities in facilities csv order, copied by every scenario
+        self.facilities_list = self.csv_order(loan_server)
+        self.scenarios = validate_scenarios(scenarios, set(f.facility_id for f in self.facilities_list))
+
+        # Loans are parsed once, workers inherit them copy-on-write
+        self.loan_batches = list(loan_server.iter_loan_request_batches())
+
+    @staticmethod
+    def csv_order(loan_server):
+        """
+            Facilities of a freshly parsed server in facilities csv order
+
+            Arguments:
+                loan_server (LoanFacilitiesServer)
+
+            Returns:
+                facilities_list (list of Facility objects)
+        """
+        by_id = dict((facility.facility_id, facility) for facility in loan_server.facilities_list)
+        return [by_id[facility_id] for facility_id in loan_server.facilities_table['id']]
+
+    def scenario_facilities(self, scenario):
+        """
+            Copies the pristine facilities, applies a scenario's overrides and sorts them in
+            assignment preference order
+
+            Arguments:
+                scenario (dictionary)
+
+            Returns:
+                facilities_list (list of Facility objects)
+        """
+        facilities_list = copy.deepcopy(self.facilities_list)
+        for facility in facilities_list:
+            overrides = scenario['facilities'].get(facility.facility_id)
+            if overrides:
+                apply_overrides(facility, overrides)
+        if scenario['tie_order'] == 'reversed':
+            facilities_list.reverse()
+        # NOTE: Stable sort, ties keep the order above
+        facilities_list.sort(key=lambda facility: facility.interest_rate)
+        return facilities_list
+
+    def run_scenario(self, scenario):
+        """
+            Runs the greedy engine over all loans for a single scenario
+
+            NOTE: This is not an idempotent fuction as it issues side effects. Replaces the
+            facilities served by `self.loan_server`, thus meant to run in a worker process.
+
+            Arguments:
+                scenario (dictionary)
+
+            Returns:
+                result (dictionary): Yield by facility_id and loan counts
+        """
+        loan_server = self.loan_server
+        loan_server.replace_facilities(self.scenario_facilities(scenario))
+        assignments = loan_server.metrics.counters['assignments']
+        rejections = loan_server.metrics.counters['rejections']
+        for loan_requests in self.loan_batches:
+            loan_server.process_loan_requests(loan_requests, None)
+        return {'yields': dict((f.facility_id, f.current_yield) for f in loan_server.facilities_list),
+                'assignments': loan_server.metrics.counters['assignments'] - assignments,
+                'rejections': loan_server.metrics.counters['rejections'] - rejections}
+
+    def run_worker(self, task_queue, result_queue):
+        """
+            Worker process main loop. Pulls scenario indexes until a `None` sentinel arrives.
+
+            Arguments:
+                task_queue (multiprocessing.Queue): Index into `self.scenarios`
+                result_queue (multiprocessing.Queue): (index, result), see `run_scenario()`
+
+            Returns:
+                None
+        """
+        # NOTE: Rejection logs of the parent must not be written to by scenarios
+        self.loan_server.rejection_csv_path = None
+        while True:
+            index = task_queue.get()
+            if index is None:
+                break
+            result_queue.put((index, self.run_scenario(self.scenarios[index])))
+
+    def run(self):
+        """
+            Runs all scenarios across worker processes
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                results (list of dictionary): One per scenario in `self.scenarios` order, see
+                    `run_scenario()`
+
+            Raises:
+                RuntimeError: if a worker process died
+        """
+        task_queue = self.context.Queue()
+        result_queue = self.context.Queue()
+        for index in range(len(self.scenarios)):
+            task_queue.put(index)
+        workers = max(min(self.workers, len(self.scenarios)), 1)
+        for _ in range(workers):
+            task_queue.put(None)
+
+        processes = [self.context.Process(target=self.run_worker, args=(task_queue, result_queue))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+
+        results = {}
+        try:
+            while len(results) < len(self.scenarios):
+                try:
+                    index, result = result_queue.get(timeout=1)
+                except queue.Empty:
+                    if any(process.exitcode for process in processes):
+                        raise RuntimeError('Worker process died')
+                    continue
+                results[index] = result
+            for process in processes:
+                process.join()
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        return [results[index] for index in range(len(self.scenarios))]
+
+    def write_report(self, csv_filepath, results):
+        """
+            Writes the per-facility yield comparison table: one row per facility (in baseline
+            assignment preference order) and one column per scenario
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                csv_filepath (string)
+                results (list of dictionary): As returned by `run()`
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        with open(csv_filepath, 'w') as csvfile:
+            writer = csv.writer(csvfile, lineterminator='\n')
+            writer.writerow(['facility_id'] + [scenario['name'] for scenario in self.scenarios])
+            for facility in self.loan_server.facilities_list:
+                writer.writerow([facility.facility_id] +
+                                [round(result['yields'][facility.facility_id]) for result in results])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default='large/', help='Directory with facilities, covenants and loans csv')
+    parser.add_argument('--scenarios', required=True, help='JSON list of scenarios')
+    parser.add_argument('--output', default='scenario_yields.csv', help='Per-facility yield comparison csv')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--chunksize', type=int, default=4096)
+    args = parser.parse_args()
+
+    loan_server = LoanFacilitiesServer(columnar.preferred_path(os.path.join(args.dir, 'facilities.csv')),
+                                       columnar.preferred_path(os.path.join(args.dir, 'covenants.csv')),
+                                       columnar.preferred_path(os.path.join(args.dir, 'loans.csv')),
+                                       loans_chunksize=args.chunksize)
+    runner = ScenarioRunner(loan_server, load_scenarios(args.scenarios), args.workers)
+    results = runner.run()
+    runner.write_report(args.output, results)
+
+    baseline_yield = sum(results[0]['yields'].values())
+    print('%-24s %12s %12s %16s %14s' % ('scenario', 'assignments', 'rejections', 'total_yield', 'vs_baseline'))
+    for scenario, result in zip(runner.scenarios, results):
+        total_yield = sum(result['yields'].values())
+        print('%-24s %12d %12d %16.2f %+14.2f' % (scenario['name'], result['assignments'], result['rejections'],
+                                                 total_yield, total_yield - baseline_yield))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,40 @@
 #!/usr/bin/env python
+import atexit
 import csv
+import importlib
+import os
 import os.path
+import select
+import sys
+import threading
+import time
+
+DEFAULT_FLUSH_ROWS = 1024
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+DEFAULT_POLL_INTERVAL = 0.1  # seconds
+STDIN_PATH = '-'
+STDIN_READ_SIZE = 65536  # bytes
+
+
+class LazyModule(object):
+    """
+        Stand-in for a module that is only imported on first attribute access, e.g.
+        `pd = utils.LazyModule('pandas')`. Keeps heavy imports off the startup path of code that
+        may never use them.
+
+        Idempotent Interfaces:
+            LazyModule(): Constructor, does not import anything
+            __getattr__(): Imports the module once and looks up the attribute
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
 
 
 def stream_writer(csv_filepath, header, row_values):
@@ -38,3 +72,248 @@ def stream_writer(csv_filepath, header, row_values):
 
         # append values
         writer.writerow(row_values)
+
+
+class BufferedStreamWriter(object):
+    """
+        Buffered Stream Logger:
+            Long-lived counterpart of `stream_writer`. Keeps the log file open in _append_ mode and
+            buffers rows in memory, flushing them in batches. Preserves the append-only,
+            header-once semantics of `stream_writer` while avoiding a file open/close per row.
+
+        Rows are flushed when any of the following happens:
+            1. `flush_rows` rows are buffered
+            2. Every `flush_interval` seconds by a background thread, thus rows never wait longer
+               than that, even while nothing else is written
+            3. `flush()` or `close()` is called, including on exiting a `with` block (also on
+               exceptions) and on interpreter shutdown
+
+        NOTE: Buffered rows and the file are guarded by a lock, thus any thread may write rows
+
+        Idempotent Interfaces:
+            BufferedStreamWriter(): Constructor that opens the log file and writes the header once
+
+        Non-Idempotent Interfaces:
+            write_row(): Buffers a single row
+            flush(): Writes all buffered rows to the file
+            close(): Flushes and closes the file
+    """
+
+    def __init__(self, csv_filepath, header, flush_rows=DEFAULT_FLUSH_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+            Constructor for `BufferedStreamWriter`
+
+            Arguments:
+                csv_filepath (string)
+                header (list of strings)
+                flush_rows (integer): Maximum number of buffered rows
+                flush_interval (float): Maximum seconds between flushes
+
+            Returns:
+                `BufferedStreamWriter` object
+
+            Raises:
+                OSError: if csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        self.csv_filepath = csv_filepath
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        file_exists = os.path.exists(csv_filepath)
+
+        self.csvfile = open(csv_filepath, 'a')
+        self.writer = csv.writer(self.csvfile)
+
+        # file doesn't exist yet, write a header
+        if not file_exists:
+            self.writer.writerow(header)
+
+        self.rows = []
+        self.lock = threading.Lock()
+
+        # Flush buffered rows on interpreter shutdown
+        atexit.register(self.close)
+
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='buffered-stream-writer', daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_row(self, row_values):
+        """
+            Buffers a single row, flushing if the row count threshold is reached
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                row_values (list of values)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        with self.lock:
+            self.rows.append(row_values)
+            if len(self.rows) >= self.flush_rows:
+                self.writer.writerows(self.rows)
+                self.rows = []
+                self.csvfile.flush()
+
+    def flush(self):
+        """
+            Writes all buffered rows to the file
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                Writing to a file
+        """
+        with self.lock:
+            if self.csvfile.closed:
+                return
+            if self.rows:
+                self.writer.writerows(self.rows)
+                self.rows = []
+            self.csvfile.flush()
+
+    def run(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass  # Raised again by the next `write_row()`, `flush()` or `close()`
+
+    def close(self):
+        """
+            Flushes buffered rows and closes the file. Safe to call more than once.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                Writing to a file
+        """
+        if self.csvfile.closed:
+            return
+        self.closed.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+        with self.lock:
+            self.csvfile.close()
+        atexit.unregister(self.close)
+
+
+def stream_lines(csv_filepath, follow=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+        Stream Reader:
+            Lazily yields complete lines of a (potentially unbounded) text input, one at a time.
+            Reads from stdin if csv_filepath is `STDIN_PATH`, see `stream_stdin_lines()`. In
+            `follow` mode a regular file is treated as growing (similar to `tail -f`): at end of
+            file the reader polls for newly appended lines instead of stopping. Partially written
+            lines are held back until completed.
+
+        NOTE: `None` is yielded every time the input is drained: in `follow` mode right before
+        polling, on stdin whenever no input arrived for `poll_interval` seconds. Consumers may use
+        this idle marker to flush partial batches.
+
+        Arguments:
+            csv_filepath (string)
+            follow (bool): Ignored for stdin, which ends at end of file
+            poll_interval (float): Seconds to wait before polling a drained input again
+
+        Returns:
+            generator of string (or None)
+
+        Raises:
+            OSError: if csv_filepath is not accessible
+    """
+    if csv_filepath == STDIN_PATH:
+        for line in stream_stdin_lines(poll_interval):
+            yield line
+        return
+
+    textfile = open(csv_filepath)
+    try:
+        partial_line = ''
+        while True:
+            line = textfile.readline()
+            if line.endswith('\n'):
+                yield partial_line + line
+                partial_line = ''
+            elif line:
+                # Writer is midway through a line
+                partial_line += line
+            elif follow:
+                yield None
+                time.sleep(poll_interval)
+            else:
+                if partial_line:
+                    yield partial_line
+                return
+    finally:
+        textfile.close()
+
+
+def stream_stdin_lines(poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+        Stream Reader:
+            Lazily yields complete lines of stdin, one at a time, without blocking on a quiet pipe:
+            `None` is yielded whenever no input arrived for `poll_interval` seconds.
+
+        NOTE: Reads the file descriptor directly, as lines held in the buffer of `sys.stdin` are
+        invisible to `select`. Falls back to blocking reads if stdin has no file descriptor.
+
+        Arguments:
+            poll_interval (float): Seconds to wait for input before yielding `None`
+
+        Returns:
+            generator of string (or None)
+    """
+    try:
+        fd = sys.stdin.fileno()
+    except (AttributeError, ValueError, OSError):
+        # NOTE: e.g. a replaced `sys.stdin`, io.UnsupportedOperation is an OSError
+        for line in sys.stdin:
+            yield line
+        return
+
+    encoding = sys.stdin.encoding or 'utf-8'
+    partial_line = b''
+    while True:
+        if not select.select([fd], [], [], poll_interval)[0]:
+            yield None
+            continue
+        data = os.read(fd, STDIN_READ_SIZE)
+        if not data:
+            if partial_line:
+                yield partial_line.decode(encoding)
+            return
+        lines = (partial_line + data).split(b'\n')
+        partial_line = lines.pop()  # Writer is midway through a line
+        for line in lines:
+            yield line.decode(encoding) + '\n'
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+from loan_facilities_server import REJECT_AMOUNT, REJECT_CAPACITY, REJECT_COVENANTS
+from loan_request import LoanRequest
+
+
+class VectorizedAssignmentEngine(object):
+    """
+        Vectorized alternative to `LoanFacilitiesServer.process_loans_stream()`.
+
+        Facility attributes are mirrored into NumPy arrays (in `facilities_list` order) and loans
+        are processed in micro-batches, i.e. the chunks of `LoanFacilitiesServer.iter_loan_batches()`.
+        Static covenants (banned states, max default likelihood)
+        are evaluated for a whole batch at once into a (loans x facilities) eligibility matrix,
+        leaving only the balance check and the greedy pick to the per-loan step. The pick is the
+        first eligible facility in `facilities_list` order, thus output is byte-identical to the
+        greedy engine.
+
+        NOTE: `Facility` objects remain the source of truth. Loans are issued through
+        `LoanFacilitiesServer.issue_loan()` and the balance array is refreshed from the facility
+        afterwards. Arrays are mirrored again after facilities were merged into the server.
+
+        Idempotent Interfaces:
+            VectorizedAssignmentEngine(): Constructor that mirrors facility attributes into arrays
+            eligibility_matrix(): Computes static covenant eligibility for a batch of loans
+
+        Non-Idempotent Interfaces:
+            process_loans_stream(): Processes loans in micro-batches for facility assignment
+            process_loans_batch(): Processes a single micro-batch of loans
+            mirror_facilities(): Mirrors facility attributes into arrays
+    """
+
+    def __init__(self, loan_server):
+        """
+            Constructor for `VectorizedAssignmentEngine`
+
+            Arguments:
+                loan_server (LoanFacilitiesServer): Server owning facilities and loans
+
+            Returns:
+                `VectorizedAssignmentEngine` object
+        """
+        self.loan_server = loan_server
+        self.mirror_facilities()
+
+    def mirror_facilities(self):
+        """
+            Mirrors facility attributes into arrays, in `facilities_list` order
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                Replaces the facility arrays
+        """
+        facilities_list = self.loan_server.facilities_list
+        self.facilities_version = self.loan_server.facilities_version
+        self.interest_rates = np.array([f.interest_rate for f in facilities_list], dtype=float)
+        self.max_default_likelihoods = np.array([f.max_default_likelihood for f in facilities_list], dtype=float)
+        self.balances = np.array([f.balance_amount for f in facilities_list], dtype=float)
+        # Facilities checked with `Facility.is_valid_assignment()` once picked, see `covenants.py`
+        self.stateful = np.array([f.has_stateful_covenants() for f in facilities_list], dtype=bool)
+        # Limits of pluggable covenant types, NaN where a facility is not constrained
+        self.covenant_limits = [(threshold_index.covenant,
+                                 np.array([f.covenant_limits.get(threshold_index.covenant.column, np.nan)
+                                           for f in facilities_list], dtype=float))
+                                for threshold_index in self.loan_server.covenant_index.threshold_indexes]
+
+        # Banned-state mask: one row per banned state, plus a trailing all-False row shared by
+        # every state that no facility bans
+        self.state_index = {}
+        for facility in facilities_list:
+            for state in facility.banned_states:
+                self.state_index.setdefault(state, len(self.state_index))
+        self.unbanned_state_row = len(self.state_index)
+        self.banned_mask = np.zeros((len(self.state_index) + 1, len(facilities_list)), dtype=bool)
+        for column, facility in enumerate(facilities_list):
+            for state in facility.banned_states:
+                self.banned_mask[self.state_index[state], column] = True
+
+    def eligibility_matrix(self, origin_states, default_likelihoods, loans_df=None):
+        """
+            Evaluates static covenants for a batch of loans
+
+            Arguments:
+                origin_states (sequence of string)
+                default_likelihoods (numpy array of float)
+                loans_df (dataframe) or None: Loan columns of pluggable covenant types, required if
+                    any facility uses one
+
+            Returns:
+                eligible (numpy bool array of shape (loans, facilities))
+        """
+        state_rows = np.fromiter((self.state_index.get(state, self.unbanned_state_row) for state in origin_states),
+                                 dtype=np.intp, count=len(origin_states))
+        # NOTE: Negated comparison mirrors `Facility.is_valid_assignment` exactly, including NaN handling
+        eligible = ~self.banned_mask[state_rows] & ~(default_likelihoods[:, None] > self.max_default_likelihoods[None, :])
+        for covenant, limits in self.covenant_limits:
+            eligible &= ~covenant.violations(loans_df[covenant.loan_attribute].values.astype(float), limits)
+        return eligible
+
+    def process_loans_batch(self, loans_df, assignment_csv_path):
+        """
+            Processes a single micro-batch of loans
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                loans_df (dataframe): Batch of loans
+                assignment_csv_path (string)
+
+            Returns:
+                None
+
+            Side Effects:
+                1. Issues loans from facilities and updates `self.balances`
+                2. Writing to a file
+        """
+        metrics = self.loan_server.metrics
+        metrics.lap()
+        if self.facilities_version != self.loan_server.facilities_version:
+            # Facilities were merged since the last batch
+            self.mirror_facilities()
+        loan_ids = loans_df.id.values
+        amounts = loans_df.amount.values.astype(float)
+        default_likelihoods = loans_df.default_likelihood.values.astype(float)
+        interest_rates = loans_df.interest_rate.values.astype(float)
+        origin_states = loans_df.state.values
+
+        metrics.lap('parse')
+        eligible = self.eligibility_matrix(origin_states, default_likelihoods, loans_df)
+        facilities_list = self.loan_server.facilities_list
+
+        # Loans without any statically eligible facility are never assignable
+        assignable_mask = eligible.any(axis=1)
+        assignable = np.flatnonzero(assignable_mask)
+        rejections = []
+        reasons = None
+        if len(assignable) < len(loans_df):
+            reasons = self.loan_server.fast_reject_batch(loans_df)
+        # NOTE: Every assignable loan is checked against all facilities at once
+        metrics.increment('facilities_scanned', len(assignable) * len(facilities_list))
+        metrics.lap('search')
+        for i in range(len(loans_df)):
+            if not assignable_mask[i]:
+                # Same reason precedence as `LoanFacilitiesServer.rejection_reason()` at this loan's turn
+                reason = reasons.iat[i] if reasons is not None else None
+                if reason is None:
+                    reason = REJECT_AMOUNT if amounts[i] > self.loan_server.capacity_tree.max_capacity() \
+                        else REJECT_COVENANTS
+                rejections.append((i, reason))
+                continue
+
+            candidates = eligible[i] & ~(amounts[i] > self.balances)
+            column = candidates.argmax()
+            loan_request = LoanRequest(int(loan_ids[i]),
+                                       float(amounts[i]),
+                                       float(default_likelihoods[i]),
+                                       float(interest_rates[i]),
+                                       str(origin_states[i]))
+            while candidates[column] and self.stateful[column] and \
+                    not facilities_list[column].is_valid_assignment(loan_request):
+                candidates[column] = False
+                column = candidates.argmax()
+            metrics.lap('search')
+            if not candidates[column]:
+                rejections.append((i, REJECT_AMOUNT if amounts[i] > self.loan_server.capacity_tree.max_capacity()
+                                   else REJECT_CAPACITY))
+                continue
+
+            facility = facilities_list[column]
+            self.loan_server.issue_loan(column, loan_request)
+            self.balances[column] = facility.balance_amount
+            metrics.lap('issue')
+
+            self.loan_server.log_loan_assignment(assignment_csv_path, loan_request.loan_id, facility.facility_id)
+            metrics.lap('log')
+
+        metrics.increment('rejections', len(rejections))
+        self.loan_server.log_loan_rejections([(int(loan_ids[i]), reason) for i, reason in rejections])
+        metrics.lap('log')
+
+    def process_loans_stream(self, assignment_csv_path):
+        """
+            Processes the loan stream in micro-batches. Equivalent to
+            `LoanFacilitiesServer.process_loans_stream()`.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                assignment_csv_path (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if assignment_csv_path is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        metrics = self.loan_server.metrics
+        try:
+            for loans_df in metrics.timed(self.loan_server.iter_loan_batches(), 'read'):
+                self.process_loans_batch(loans_df, assignment_csv_path)
+                metrics.tick(len(loans_df))
+                self.loan_server.advance_loans_stream(len(loans_df), int(loans_df.id.iloc[-1]), assignment_csv_path)
+            self.loan_server.checkpoint(assignment_csv_path)
+        finally:
+            self.loan_server.close_assignment_sinks()
+            metrics.export_snapshot(wait=True)
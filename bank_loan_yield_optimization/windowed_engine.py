@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+"""
+    Windowed batch alternative to `LoanFacilitiesServer.process_loans_stream()`.
+
+    Loans are collected into windows bounded by a number of loans and by the time since the
+    window opened. A window is also closed on time while no loans arrive, as the loan stream
+    reports every drained input (see `LoanFacilitiesServer.iter_loan_request_batches()`). Each
+    window is solved as a generalized assignment problem: facilities are knapsacks holding their
+    remaining balance, a loan placed in a facility is worth its `Facility.compute_loan_yield()`,
+    and the window's total yield is maximized.
+
+    Every loan greedy would assign is served, a window solution assigning fewer loans than greedy
+    is never committed. Thus yield gains come from placement alone. With `drop_unprofitable`,
+    loans whose yield is not positive in any eligible facility are left unassigned instead
+    (`REJECT_UNPROFITABLE`), since funding them lowers yield.
+
+    Solver (per window, all on a scratch copy of the capacity tree):
+        1. Options: the `options` cheapest facilities passing each loan's covenants and holding
+           enough balance at the start of the window (with positive yield if `drop_unprofitable`)
+        2. Construction: loans are placed in order of decreasing regret, i.e. how much yield is
+           lost if the loan misses its best option, each into its best option with room left.
+           Loans whose options all filled up get the next cheapest facilities with room left.
+        3. Improvement: assigned loans are shifted to better options with room left and
+           unassigned loans are placed by ejecting a loan into another of its options, for as
+           long as total yield improves
+
+    The window is committed in loan order through `LoanFacilitiesServer.issue_loan()`. If the time
+    budget runs out, or the solution does not beat greedy on the same window, the window falls
+    back to greedy first-fit, thus per-window latency stays bounded. Loans a committed solution
+    leaves unassigned although some facility passes their covenants are rejected with
+    `REJECT_CAPACITY` (`REJECT_UNPROFITABLE` with `drop_unprofitable`).
+
+    NOTE: Windows are always assigned greedily while some facility carries a stateful covenant
+    type, see `covenants.py`.
+"""
+
+import copy
+import time
+
+from loan_facilities_server import REJECT_CAPACITY, REJECT_UNPROFITABLE
+
+DEFAULT_WINDOW_SIZE = 256  # loans
+DEFAULT_WINDOW_INTERVAL = 1.0  # seconds
+DEFAULT_TIME_BUDGET = 0.05  # seconds per window
+DEFAULT_OPTIONS = 8  # facilities considered per loan
+
+
+class WindowedAssignmentEngine(object):
+    """
+        Windowed batch assignment engine maximizing yield per window
+
+        Idempotent Interfaces:
+            WindowedAssignmentEngine(): Constructor
+            scratch_tree(): Copy of the capacity tree the solver may modify
+            cheapest_facilities(): Cheapest candidate facilities with enough balance
+            greedy_window(): Greedy first-fit assignment of a window
+
+        Non-Idempotent Interfaces:
+            process_loans_stream(): Processes loans window by window
+            process_window(): Solves and commits a window
+            solve_window(): Optimized assignment of a window within the time budget
+    """
+
+    def __init__(self, loan_server, window_size=DEFAULT_WINDOW_SIZE, window_interval=DEFAULT_WINDOW_INTERVAL,
+                 time_budget=DEFAULT_TIME_BUDGET, options=DEFAULT_OPTIONS, drop_unprofitable=False):
+        """
+            Constructor for `WindowedAssignmentEngine`
+
+            Arguments:
+                loan_server (LoanFacilitiesServer): Server owning facilities and loans
+                window_size (integer): Maximum number of loans per window
+                window_interval (float): Maximum seconds a window stays open
+                time_budget (float): Seconds the solver may spend on a window
+                options (integer): Number of facilities considered per loan
+                drop_unprofitable (bool): Leave loans unassigned whose yield is not positive in
+                    any eligible facility
+
+            Returns:
+                `WindowedAssignmentEngine` object
+        """
+        self.loan_server = loan_server
+        self.window_size = window_size
+        self.window_interval = window_interval
+        self.time_budget = time_budget
+        self.options = options
+        self.drop_unprofitable = drop_unprofitable
+        self.clock = time.perf_counter
+
+        # Statistics, see `benchmark_windowed.py`
+        self.windows = 0
+        self.fallbacks = 0
+        self.window_latencies = []
+
+    def scratch_tree(self):
+        """
+            Copy of the server's capacity tree, balances may be changed without touching facilities
+
+            NOTE: Only the node list is copied, the facilities list stays shared and must not be
+            modified through the copy
+
+            Arguments:
+                None
+
+            Returns:
+                tree (CapacityTree)
+        """
+        tree = copy.copy(self.loan_server.capacity_tree)
+        tree.tree = list(tree.tree)
+        return tree
+
+    def cheapest_facilities(self, tree, amount, candidates):
+        """
+            Finds the `options` cheapest candidate facilities with balance >= amount
+
+            Arguments:
+                tree (CapacityTree)
+                amount (float)
+                candidates (integer bitmap)
+
+            Returns:
+                positions (list of integer): Ascending, i.e. cheapest first
+        """
+        positions = []
+        if not amount > 0:
+            # NOTE: Capacity is not a constraint for non-positive (or NaN) amounts
+            return [(candidates & -candidates).bit_length() - 1] if candidates else []
+
+        position = 0
+        while len(positions) < self.options:
+            position = tree.first_at_least(amount, position)
+            if position is None:
+                break
+            remaining = candidates >> position
+            if not remaining:
+                break
+            offset = (remaining & -remaining).bit_length() - 1
+            if offset:
+                position += offset
+                continue
+            positions.append(position)
+            position += 1
+        return positions
+
+    def greedy_window(self, loan_requests, candidates):
+        """
+            Greedy first-fit on a scratch tree, i.e. what the streaming engine would do
+
+            Arguments:
+                loan_requests (list of LoanRequest)
+                candidates (list of integer bitmap)
+
+            Returns:
+                (positions, total_yield)
+        """
+        facilities_list = self.loan_server.facilities_list
+        tree = self.scratch_tree()
+        positions = []
+        total_yield = 0.
+        for loan_request, loan_candidates in zip(loan_requests, candidates):
+            position = tree.find_facility(loan_request.amount, loan_candidates)
+            positions.append(position)
+            if position is not None:
+                tree.set_capacity(position, tree.capacity(position) - loan_request.amount)
+                total_yield += facilities_list[position].compute_loan_yield(loan_request)
+        return positions, total_yield
+
+    def profitable_options(self, loan_options):
+        """
+            Drops options losing yield if `drop_unprofitable`
+
+            Arguments:
+                loan_options (list of (yield, position))
+
+            Returns:
+                loan_options (list of (yield, position))
+        """
+        if not self.drop_unprofitable:
+            return loan_options
+        return [option for option in loan_options if option[0] > 0]
+
+    def solve_window(self, loan_requests, candidates):
+        """
+            Assigns a window of loans maximizing total yield, see module documentation
+
+            Arguments:
+                loan_requests (list of LoanRequest)
+                candidates (list of integer bitmap): Static covenant candidates per loan
+
+            Returns:
+                (positions, total_yield), or None if the time budget ran out before a complete
+                assignment was constructed
+        """
+        deadline = self.clock() + self.time_budget
+        facilities_list = self.loan_server.facilities_list
+        tree = self.scratch_tree()
+
+        # Options per loan as (yield, position), best first. With `drop_unprofitable`, loans losing
+        # yield everywhere get none
+        profitable = self.profitable_options
+        options = []
+        for loan_request, loan_candidates in zip(loan_requests, candidates):
+            options.append(profitable([(facilities_list[position].compute_loan_yield(loan_request), position)
+                                       for position in self.cheapest_facilities(tree, loan_request.amount,
+                                                                                loan_candidates)]))
+            if self.clock() > deadline:
+                return None
+
+        amounts = [loan_request.amount if loan_request.amount > 0 else 0. for loan_request in loan_requests]
+        assigned = [None] * len(loan_requests)
+        facility_loans = {}
+
+        # NOTE: The scratch tree holds residual balances of the window's assignment
+        room = tree.capacity
+
+        def place(loan, option):
+            tree.set_capacity(option[1], room(option[1]) - amounts[loan])
+            assigned[loan] = option
+            facility_loans.setdefault(option[1], set()).add(loan)
+
+        def remove(loan):
+            position = assigned[loan][1]
+            tree.set_capacity(position, room(position) + amounts[loan])
+            assigned[loan] = None
+            facility_loans[position].discard(loan)
+
+        def eject(loan, option):
+            # Make room in `option` by moving one of its loans into another of that loan's options
+            deficit = amounts[loan] - room(option[1])
+            for other in list(facility_loans.get(option[1], ())):
+                if amounts[other] < deficit:
+                    continue
+                for other_option in options[other]:
+                    if other_option[1] == option[1] or amounts[other] > room(other_option[1]):
+                        continue
+                    # NOTE: Serving a loan takes precedence over yield unless dropping unprofitable loans
+                    if option[0] + other_option[0] - assigned[other][0] > 0 or not self.drop_unprofitable:
+                        remove(other)
+                        place(other, other_option)
+                        place(loan, option)
+                        return True
+            return False
+
+        def regret(loan):
+            loan_options = options[loan]
+            return loan_options[0][0] - (loan_options[1][0] if len(loan_options) > 1 else 0.)
+
+        # Construction in order of decreasing regret. Loans whose options all filled up look for
+        # the next cheapest facilities with room left, same as greedy would
+        for loan in sorted((loan for loan in range(len(loan_requests)) if options[loan]), key=regret, reverse=True):
+            for option in options[loan]:
+                if amounts[loan] <= room(option[1]):
+                    place(loan, option)
+                    break
+            else:
+                loan_request = loan_requests[loan]
+                more_options = profitable([(facilities_list[position].compute_loan_yield(loan_request), position)
+                                           for position in self.cheapest_facilities(tree, loan_request.amount,
+                                                                                    candidates[loan])])
+                if more_options:
+                    place(loan, more_options[0])
+                    options[loan] = sorted(set(options[loan] + more_options), reverse=True)
+            if self.clock() > deadline:
+                return None
+
+        # Improvement, every move strictly increases total yield
+        improved = True
+        while improved and self.clock() < deadline:
+            improved = False
+            for loan in range(len(loan_requests)):
+                if self.clock() > deadline:
+                    break
+                current = assigned[loan]
+                for option in options[loan]:
+                    if current is not None and option[0] <= current[0]:
+                        break
+                    if amounts[loan] <= room(option[1]):
+                        if current is not None:
+                            remove(loan)
+                        place(loan, option)
+                        improved = True
+                        break
+                    if current is None and eject(loan, option):
+                        improved = True
+                        break
+
+        total_yield = sum(option[0] for option in assigned if option is not None)
+        return [option[1] if option is not None else None for option in assigned], total_yield
+
+    def process_window(self, loan_requests, assignment_csv_path, window_opened):
+        """
+            Solves a window, commits it in loan order and advances the loans stream past it
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                loan_requests (list of LoanRequest)
+                assignment_csv_path (string)
+                window_opened (float): Clock time the window's first loan arrived
+
+            Returns:
+                None
+
+            Side Effects:
+                1. Issues loans from facilities
+                2. Writing to files
+                3. Checkpoints and merges facilities when due, see
+                   `LoanFacilitiesServer.advance_loans_stream()`
+        """
+        loan_server = self.loan_server
+        metrics = loan_server.metrics
+        metrics.lap()
+        candidates = loan_server.covenant_index.candidates_requests(loan_requests)
+        if loan_server.covenant_index.stateful_mask:
+            # NOTE: Stateful covenants depend on every loan issued before, the scratch tree can't
+            # tell, thus loans are searched one by one while committing, as in the greedy engine
+            self.fallbacks += 1
+            positions = None
+        else:
+            solution = self.solve_window(loan_requests, candidates)
+            greedy_positions, greedy_yield = self.greedy_window(loan_requests, candidates)
+            if solution is None or solution[1] <= greedy_yield or \
+                    (not self.drop_unprofitable and solution[0].count(None) > greedy_positions.count(None)):
+                if solution is None:
+                    self.fallbacks += 1
+                positions = greedy_positions
+            else:
+                positions = solution[0]
+        metrics.lap('search')
+
+        facilities_list = loan_server.facilities_list
+        rejections = []
+        for index, loan_request in enumerate(loan_requests):
+            if positions is None:
+                position = loan_server.find_facility(loan_request, candidates[index])
+                if position is None:
+                    rejections.append((loan_request.loan_id,
+                                       loan_server.rejection_reason(loan_request, candidates=candidates[index])))
+                    continue
+            else:
+                position = positions[index]
+            if position is None:
+                # Loans some facility could still issue were left out by the window's solution
+                rejections.append((loan_request.loan_id, loan_server.rejection_reason(loan_request) or
+                                   (REJECT_UNPROFITABLE if self.drop_unprofitable else REJECT_CAPACITY)))
+                continue
+            loan_server.issue_loan(position, loan_request)
+            loan_server.log_loan_assignment(assignment_csv_path, loan_request.loan_id,
+                                            facilities_list[position].facility_id)
+        metrics.increment('rejections', len(rejections))
+        loan_server.log_loan_rejections(rejections)
+        metrics.lap('issue')
+
+        self.windows += 1
+        self.window_latencies.append(self.clock() - window_opened)
+
+        # NOTE: Windows close in loan order, thus checkpoints cover exactly the closed windows
+        loan_server.advance_loans_stream(len(loan_requests), loan_requests[-1].loan_id, assignment_csv_path)
+
+    def process_loans_stream(self, assignment_csv_path):
+        """
+            Processes the loan stream window by window
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                assignment_csv_path (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if assignment_csv_path is not accessible
+
+            Side Effects:
+                1. Issues loans from facilities
+                2. Writing to a file
+        """
+        loan_server = self.loan_server
+        metrics = loan_server.metrics
+        window = []
+        window_opened = None
+        try:
+            # NOTE: Empty batches arrive whenever the input is drained, thus windows close on time
+            # also while no loans arrive
+            for loan_requests in metrics.timed(loan_server.iter_loan_request_batches(idle=True), 'read'):
+                metrics.lap()
+                for loan_request in loan_requests:
+                    if not window:
+                        window_opened = self.clock()
+                    window.append(loan_request)
+                    if len(window) >= self.window_size or self.clock() - window_opened >= self.window_interval:
+                        metrics.lap('parse')
+                        self.process_window(window, assignment_csv_path, window_opened)
+                        window = []
+                if window and self.clock() - window_opened >= self.window_interval:
+                    metrics.lap('parse')
+                    self.process_window(window, assignment_csv_path, window_opened)
+                    window = []
+                metrics.lap('parse')
+                metrics.tick(len(loan_requests))
+
+            if window:
+                self.process_window(window, assignment_csv_path, window_opened)
+            loan_server.checkpoint(assignment_csv_path)
+        finally:
+            loan_server.close_assignment_sinks()
+            metrics.export_snapshot(wait=True)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import csv
+
+BANK_REPORT_HEADER = ['bank_id', 'name', 'facilities', 'loans', 'initial_amount', 'balance_amount',
+                      'expected_yield']
+
+
+class YieldLedger(object):
+    """
+        Running yield and capacity aggregates per facility and per bank.
+
+        Aggregates are updated in O(1) per issued loan, thus point queries and snapshot reports
+        are available at any moment during a long stream without pausing ingestion. Facility level
+        balances are read from the live `Facility` objects, the ledger adds loan counts and running
+        yields as recorded, see `facility_yields`. Bank level aggregates are maintained
+        incrementally.
+
+        Idempotent Interfaces:
+            YieldLedger(): Constructor that seeds aggregates from facilities and banks
+            facility_status(): Point query for a facility
+            bank_status(): Point query for a bank
+            snapshot(): All facility and bank aggregates
+
+        Non-Idempotent Interfaces:
+            add_facility(): Registers a facility with the ledger
+            record(): Records an issued loan
+            restore(): Recomputes all aggregates after facility state was restored
+            write_bank_report(): Writes the per-bank report
+    """
+
+    def __init__(self, facilities_list, bank_names=None):
+        """
+            Constructor for `YieldLedger`
+
+            Arguments:
+                facilities_list (list of Facility objects)
+                bank_names (dictionary) or None: Bank name by bank_id, as loaded from banks.csv
+
+            Returns:
+                `YieldLedger` object
+        """
+        self.facilities = {}
+        self.facility_loans = {}
+        # NOTE: Same as `Facility.current_yield`, except for engines that copy yields back into the
+        # facilities only at the end of the stream (`parallel_engine.py`)
+        self.facility_yields = {}
+        self.banks = {}
+        for bank_id, name in (bank_names or {}).items():
+            self.banks[bank_id] = self.new_bank(bank_id, name)
+        for facility in facilities_list:
+            self.add_facility(facility)
+
+    @staticmethod
+    def new_bank(bank_id, name=None):
+        return {'bank_id': bank_id, 'name': name, 'facilities': 0, 'loans': 0,
+                'initial_amount': 0., 'balance_amount': 0., 'expected_yield': 0.}
+
+    def add_facility(self, facility):
+        """
+            Registers a facility and adds its current capacity and yield to its bank
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                facility (Facility)
+
+            Returns:
+                None
+        """
+        self.facilities[facility.facility_id] = facility
+        self.facility_loans[facility.facility_id] = 0
+        self.facility_yields[facility.facility_id] = facility.current_yield
+
+        bank = self.banks.get(facility.bank_id)
+        if bank is None:
+            # Bank not listed in banks.csv
+            bank = self.banks[facility.bank_id] = self.new_bank(facility.bank_id)
+        bank['facilities'] += 1
+        bank['initial_amount'] += facility.initial_amount
+        bank['balance_amount'] += facility.balance_amount
+        bank['expected_yield'] += facility.current_yield
+
+    def record(self, facility, amount, expected_yield):
+        """
+            Records a loan issued from a facility
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                facility (Facility)
+                amount (float): Loan amount
+                expected_yield (float): As returned by `Facility.issue_loan()`
+
+            Returns:
+                None
+        """
+        self.facility_loans[facility.facility_id] += 1
+        self.facility_yields[facility.facility_id] += expected_yield
+        bank = self.banks[facility.bank_id]
+        bank['loans'] += 1
+        bank['balance_amount'] -= amount
+        bank['expected_yield'] += expected_yield
+
+    def restore(self, facility_loans):
+        """
+            Recomputes bank aggregates from the current state of all facilities, e.g. after
+            facility balances and yields were restored from a checkpoint
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                facility_loans (dictionary): Number of loans issued by facility_id
+
+            Returns:
+                None
+        """
+        facilities = list(self.facilities.values())
+        for bank_id, bank in self.banks.items():
+            self.banks[bank_id] = self.new_bank(bank_id, bank['name'])
+        for facility in facilities:
+            self.add_facility(facility)
+            loans = facility_loans.get(facility.facility_id, 0)
+            self.facility_loans[facility.facility_id] = loans
+            self.banks[facility.bank_id]['loans'] += loans
+
+    def facility_status(self, facility_id):
+        """
+            Point query for a facility
+
+            Arguments:
+                facility_id (integer)
+
+            Returns:
+                status (dictionary)
+
+            Raises:
+                KeyError: if facility_id is unknown
+        """
+        facility = self.facilities[facility_id]
+        return {'facility_id': facility.facility_id,
+                'bank_id': facility.bank_id,
+                'interest_rate': facility.interest_rate,
+                'max_default_likelihood': facility.max_default_likelihood,
+                'banned_states': sorted(str(state) for state in facility.banned_states),
+                'loans': self.facility_loans[facility_id],
+                'initial_amount': facility.initial_amount,
+                'balance_amount': facility.balance_amount,
+                'expected_yield': self.facility_yields[facility_id]}
+
+    def bank_status(self, bank_id):
+        """
+            Point query for a bank
+
+            Arguments:
+                bank_id (integer)
+
+            Returns:
+                status (dictionary)
+
+            Raises:
+                KeyError: if bank_id is unknown
+        """
+        return dict(self.banks[bank_id])
+
+    def snapshot(self):
+        """
+            All facility and bank aggregates
+
+            Arguments:
+                None
+
+            Returns:
+                snapshot (dictionary): Lists of facility and bank status dictionaries
+        """
+        return {'facilities': [self.facility_status(facility_id) for facility_id in self.facilities],
+                'banks': [self.bank_status(bank_id) for bank_id in sorted(self.banks)]}
+
+    def write_bank_report(self, csv_filepath):
+        """
+            Writes the per-bank capacity and yield report
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                csv_filepath (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if csv_filepath is not accessible
+
+            Side Effects:
+                Writing to a file
+        """
+        with open(csv_filepath, 'w') as csvfile:
+            writer = csv.writer(csvfile, lineterminator='\n')
+            writer.writerow(BANK_REPORT_HEADER)
+            for bank_id in sorted(self.banks):
+                bank = self.banks[bank_id]
+                writer.writerow([bank['bank_id'], bank['name'], bank['facilities'], bank['loans'],
+                                 bank['initial_amount'], bank['balance_amount'], round(bank['expected_yield'])])
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+    Benchmark of compiled postfix evaluation against the former `eval()` based evaluation.
+
+    Generates a large random sheet of `--rows` by `--columns` cells, where cells reference random
+    cells of earlier rows. Both evaluators run over the same dependency graph order, their results
+    must match. Peak memory (max RSS) is reported after loading and evaluating the sheet.
+
+    Usage:
+        python benchmark.py --rows 100000 --columns 4 --repeat 3
+        python benchmark.py --rows 1000000 --columns 4 --repeat 1 --skip-eval    # Millions of cells
+"""
+
+import argparse
+import csv
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import postfix_program
+import utils
+
+from dependency_graph import DependencyGraph
+from postfix_parser import PostfixParser
+from sheet import ERROR_SLOT
+
+OPERATORS = '+-*/'
+
+
+def generate_sheet(csv_filepath, rows, columns, seed, depth=None):
+    """
+        Writes a random sheet of well-formed postfix expressions. Cells reference cells of the 100
+        rows before, or with `depth`, rows are split into that many layers and cells reference
+        cells of the layer before, giving a wide and shallow dependency graph.
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            csv_filepath (string)
+            rows (integer)
+            columns (integer)
+            seed (integer)
+            depth (integer) or None
+
+        Returns:
+            None
+
+        Side Effects:
+            Writing to a file
+    """
+    rng = random.Random(seed)
+    column_names = [utils.column_name(index) for index in range(columns)]
+    layer_rows = -(-rows // depth) if depth else None
+    with open(csv_filepath, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, lineterminator='\n')
+        for row in range(1, rows + 1):
+            if layer_rows:
+                layer_start = (row - 1) // layer_rows * layer_rows + 1
+                first, last = layer_start - layer_rows, layer_start - 1
+            else:
+                first, last = max(1, row - 100), row - 1
+            cells = []
+            for _ in column_names:
+                operands = rng.randint(1, 6)
+                tokens = []
+                for position in range(operands):
+                    if first <= last and rng.random() < 0.3:
+                        tokens.append('%s%d' % (rng.choice(column_names), rng.randint(first, last)))
+                    else:
+                        tokens.append(str(rng.randint(1, 99)))
+                    if position:
+                        tokens.append(rng.choice(OPERATORS))
+                cells.append(' '.join(tokens))
+            writer.writerow(cells)
+
+
+def read_cells(csv_filepath):
+    cells = {}
+    with open(csv_filepath, newline='') as csvfile:
+        for row, fields in enumerate(csv.reader(csvfile), 1):
+            for index, cell in enumerate(fields):
+                cells[row << utils.COLUMN_BITS | index] = cell
+    return cells
+
+
+def eval_cell(cell, sheet, values):
+    """
+        Former evaluation: string stack with one `eval()` per operator
+    """
+    stack = list()
+    try:
+        for token in cell.split():
+            if utils.isValidReference(token):
+                slot = sheet.slot(utils.cell_key(*utils.parse_reference(token)))
+                value = values[ERROR_SLOT if slot is None else slot]
+                if value is postfix_program.ERROR:
+                    return postfix_program.ERROR
+                stack.append(str(value))
+            elif token.isnumeric():
+                stack.append(token)
+            elif token in '+-/*':
+                operand1 = stack.pop()
+                operand2 = stack.pop()
+                stack.append(str(eval(operand2 + token + operand1)))
+        return eval(stack.pop()) if len(stack) == 1 else postfix_program.ERROR
+    except Exception:
+        return postfix_program.ERROR
+
+
+def run_eval(postfix_parser, cells):
+    sheet = postfix_parser.sheet
+    order, _ = DependencyGraph(sheet).topological_order(set(range(sheet.num_slots())))
+    values = [postfix_program.ERROR] * (sheet.num_slots() + 1)  # NOTE: Cyclic cells are left '#ERR'
+    for slot in order:
+        values[slot] = eval_cell(cells.get(sheet.keys[slot], '0'), sheet, values)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-eval', action='store_true', help='Only time the compiled evaluation')
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        csv_filepath = os.path.join(output_dir, 'input.csv')
+        generate_sheet(csv_filepath, args.rows, args.columns, args.seed)
+
+        timings = {'load': [], 'compiled': [], 'eval': []}
+        for _ in range(args.repeat):
+            postfix_parser = None  # NOTE: Frees the previous sheet before measuring the next one
+            start = time.perf_counter()
+            postfix_parser = PostfixParser(csv_filepath)
+            timings['load'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            postfix_parser.evaluate()
+            timings['compiled'].append(time.perf_counter() - start)
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        mismatches = None
+        if not args.skip_eval:
+            cells = read_cells(csv_filepath)
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                eval_values = run_eval(postfix_parser, cells)
+                timings['eval'].append(time.perf_counter() - start)
+            mismatches = sum(1 for value, eval_value in zip(postfix_parser.values, eval_values)
+                             if postfix_program.format_value(value) != postfix_program.format_value(eval_value))
+    finally:
+        shutil.rmtree(output_dir)
+
+    print('%d cells, %s mismatches, max RSS %.0f MB' % (args.rows * args.columns, mismatches, max_rss / 1024.))
+    print('%-10s %12s' % ('stage', 'min seconds'))
+    for stage in ('load', 'compiled', 'eval'):
+        if timings[stage]:
+            print('%-10s %12.4f' % (stage, min(timings[stage])))
+    if timings['eval']:
+        print('speedup %.1fx' % (min(timings['eval']) / min(timings['compiled'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+    Scaling benchmark for `ParallelEvaluator`.
+
+    Generates a wide and shallow random sheet (see `benchmark.generate_sheet()`), evaluates it once
+    with the serial `PostfixParser.evaluate()` as a baseline, then with `ParallelEvaluator` for an
+    increasing number of worker processes. Reports wall-clock time and speedup over the baseline,
+    results must match the baseline.
+
+    Usage:
+        python benchmark_parallel.py --rows 100000 --columns 10 --depth 4 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import postfix_program
+import sheet_arrays
+
+from benchmark import generate_sheet
+from parallel_evaluator import DEFAULT_BATCH_SIZE, ParallelEvaluator
+from postfix_parser import PostfixParser
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=4, help='Dependency levels of the generated sheet')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted(set([1, 2, 4, multiprocessing.cpu_count()])))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        csv_filepath = os.path.join(output_dir, 'input.csv')
+        generate_sheet(csv_filepath, args.rows, args.columns, args.seed, depth=args.depth)
+        postfix_parser = PostfixParser(csv_filepath)
+    finally:
+        shutil.rmtree(output_dir)
+
+    start = time.perf_counter()
+    postfix_parser.evaluate()
+    baseline = time.perf_counter() - start
+    expected = list(map(postfix_program.format_value, postfix_parser.values))
+    _, segments, _ = sheet_arrays.schedule(postfix_parser.sheet)
+    num_levels = len(set(segment.level for segment in segments))
+
+    print('%d cells, %d levels, %d cores' % (args.rows * args.columns, num_levels, multiprocessing.cpu_count()))
+    print('%-10s %8s %10s %10s %8s' % ('mode', 'workers', 'seconds', 'speedup', 'match'))
+    print('%-10s %8d %10.3f %10.2f %8s' % ('serial', 1, baseline, 1., True))
+    for workers in args.workers:
+        start = time.perf_counter()
+        ParallelEvaluator(postfix_parser, workers, args.batch_size).evaluate()
+        elapsed = time.perf_counter() - start
+        print('%-10s %8d %10.3f %10.2f %8s' % ('parallel', workers, elapsed, baseline / elapsed,
+                                               list(map(postfix_program.format_value, postfix_parser.values)) == expected))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+    Startup time benchmark for `PostfixParser` invocations.
+
+    Every case runs in a fresh interpreter, timed from the parent process, thus interpreter
+    startup and module imports are included. Cases:
+        1. interpreter: Bare `python -c pass`, the floor of any invocation
+        2. import pandas: Import cost the csv based parser avoids
+        3. postfix: Full parse, evaluate and report of --input
+
+    Each child also reports whether pandas ended up imported.
+
+    Usage:
+        python benchmark_startup.py --input input.csv --repeat 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RUN_PARSER = """
+from postfix_parser import PostfixParser
+parser = PostfixParser({input!r})
+parser.evaluate()
+parser.generate_report({output!r})
+"""
+REPORT_IMPORTS = """
+import json, sys
+print(json.dumps({'pandas': 'pandas' in sys.modules}))
+"""
+
+
+def run_case(code, repeat):
+    """
+        Times `code` in fresh interpreters
+
+        Arguments:
+            code (string): Python source run with `python -c`
+            repeat (integer)
+
+        Returns:
+            result (dictionary): min / median seconds and whether pandas was imported
+
+        Raises:
+            subprocess.CalledProcessError: if the child fails
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', code + REPORT_IMPORTS],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    result = json.loads(output.decode().splitlines()[-1])
+    result.update({'min': samples[0], 'median': samples[len(samples) // 2]})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default='input.csv', help='Input spreadsheet csv')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        cases = [('interpreter', 'pass'),
+                 ('import pandas', 'import pandas'),
+                 ('postfix', RUN_PARSER.format(input=os.path.abspath(args.input),
+                                               output=os.path.join(output_dir, 'output.csv')))]
+        results = [dict(run_case(code, args.repeat), case=case) for case, code in cases]
+    finally:
+        shutil.rmtree(output_dir)
+
+    print('%-14s %10s %10s %8s' % ('case', 'min ms', 'median ms', 'pandas'))
+    for result in results:
+        print('%-14s %10.1f %10.1f %8s' % (result['case'], 1000 * result['min'], 1000 * result['median'],
+                                           result['pandas']))
+
+    if args.output:
+        with open(args.output, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent=4)
+
+
+if __name__ == '__main__':
+    main()
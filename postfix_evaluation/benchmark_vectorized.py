@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+    Throughput benchmark for `VectorizedEvaluator`.
+
+    Generates a large regular sheet, i.e. every column repeats one expression shape with different
+    operands (literals include zeros, thus divisions produce '#ERR' cells), and evaluates it with
+    the serial `PostfixParser.evaluate()` and with `VectorizedEvaluator`. Reports cells per second
+    and speedup, results must match.
+
+    Usage:
+        python benchmark_vectorized.py --rows 200000 --repeat 3
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import postfix_program
+
+from postfix_parser import PostfixParser
+from vectorized_evaluator import VectorizedEvaluator
+
+# Expression shape of each column, `{row}` is the cell's own row
+COLUMN_SHAPES = [
+    '{literal}',
+    'a{row} 3 *',
+    'a{row} b{row} * 7 +',
+    'c{row} a{row} /',
+    'd{row} 2 * c{row} -',
+    '{literal} {literal} + {literal} *',
+]
+
+
+def generate_sheet(csv_filepath, rows, seed):
+    """
+        Writes a random regular sheet, see `COLUMN_SHAPES`
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            csv_filepath (string)
+            rows (integer)
+            seed (integer)
+
+        Returns:
+            None
+
+        Side Effects:
+            Writing to a file
+    """
+    rng = random.Random(seed)
+    with open(csv_filepath, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, lineterminator='\n')
+        for row in range(1, rows + 1):
+            writer.writerow([shape.replace('{literal}', '%d').format(row=row) % tuple(
+                rng.randint(0, 99) for _ in range(shape.count('{literal}'))) for shape in COLUMN_SHAPES])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        csv_filepath = os.path.join(output_dir, 'input.csv')
+        generate_sheet(csv_filepath, args.rows, args.seed)
+        start = time.perf_counter()
+        postfix_parser = PostfixParser(csv_filepath)
+        load = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output_dir)
+
+    timings = {'serial': [], 'vectorized': []}
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        postfix_parser.evaluate()
+        timings['serial'].append(time.perf_counter() - start)
+        expected = postfix_parser.values
+
+        start = time.perf_counter()
+        VectorizedEvaluator(postfix_parser).evaluate()
+        timings['vectorized'].append(time.perf_counter() - start)
+
+    cells = args.rows * len(COLUMN_SHAPES)
+    # NOTE: Compared as printed, i.e. an int and an equal float do not match
+    match = all(postfix_program.format_value(value) == postfix_program.format_value(expected_value)
+                for value, expected_value in zip(postfix_parser.values, expected))
+    print('%d cells, load %.3f seconds, match %s' % (cells, load, match))
+    print('%-12s %12s %14s' % ('mode', 'min seconds', 'cells/second'))
+    for mode in ('serial', 'vectorized'):
+        print('%-12s %12.4f %14.0f' % (mode, min(timings[mode]), cells / min(timings[mode])))
+    print('speedup %.1fx' % (min(timings['serial']) / min(timings['vectorized'])))
+
+
+if __name__ == '__main__':
+    main()
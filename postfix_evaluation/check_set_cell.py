@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+    Regression check of the incremental `PostfixParser.set_cell()` API.
+
+    Every edit must leave the sheet exactly as a full re-evaluation of the edited spreadsheet
+    would, and must return exactly the cells whose output changed. Runs fixed regression cases,
+    then random edits on random small sheets. Exits with status 1 on the first mismatch.
+
+    Usage:
+        python check_set_cell.py --sheets 200 --edits 8
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import utils
+
+from postfix_parser import PostfixParser
+
+TOKENS = ['0', '1', '2', '3', '+', '-', '*', '/', '+-', 'x', '']
+
+# (rows, ref, expr): Edits of a fixed sheet, each checked after the previous ones
+REGRESSION_CASES = [
+    # NOTE: -0.0 == 0.0, the edit changes the output of both cells nevertheless
+    ([['0 1 - 0 1 / *', 'a1']], [('a1', '0 1 /'), ('a1', '0 1 - 0 1 / *')]),
+    # NOTE: 1 == 1.0, an int becoming an equal float changes the output
+    ([['1', 'a1 1 *']], [('a1', '2 2 /'), ('a1', '1')]),
+    ([['b1', 'a1'], ['a1 b1 +', '']], [('a1', '1'), ('b2', 'a2'), ('a1', 'b1')]),
+]
+
+
+def write_sheet(csv_filepath, rows):
+    with open(csv_filepath, 'w', newline='') as csvfile:
+        csv.writer(csvfile, lineterminator='\n').writerows(rows)
+
+
+def read_report(postfix_parser, csv_filepath):
+    postfix_parser.generate_report(csv_filepath)
+    with open(csv_filepath, newline='') as csvfile:
+        return list(csv.reader(csvfile))
+
+
+def check_edits(rows, edits, output_dir):
+    """
+        Applies edits one by one, comparing each against a full re-evaluation
+
+        Arguments:
+            rows (list of list of string): Spreadsheet
+            edits (list of tuple): (ref, expr) pairs
+            output_dir (string): Scratch directory
+
+        Returns:
+            error (string) or None
+    """
+    input_csv = os.path.join(output_dir, 'input.csv')
+    report_csv = os.path.join(output_dir, 'report.csv')
+    rows = [list(fields) for fields in rows]
+    write_sheet(input_csv, rows)
+    postfix_parser = PostfixParser(input_csv)
+    postfix_parser.evaluate()
+    before = read_report(postfix_parser, report_csv)
+
+    for ref, expr in edits:
+        changed = postfix_parser.set_cell(ref, expr)
+        col, row = utils.parse_reference(ref)
+        fields = rows[row - 1]
+        fields.extend([''] * (utils.column_index(col) + 1 - len(fields)))
+        fields[utils.column_index(col)] = expr
+        write_sheet(input_csv, rows)
+
+        expected_parser = PostfixParser(input_csv)
+        expected_parser.evaluate()
+        expected = read_report(expected_parser, report_csv)
+        actual = read_report(postfix_parser, report_csv)
+        if actual != expected:
+            return 'set_cell(%r, %r) on %r: report %r, expected %r' % (ref, expr, rows, actual, expected)
+
+        expected_changed = set(utils.format_reference(utils.column_name(index), row)
+                               for row, (old, new) in enumerate(zip(before, expected), 1)
+                               for index, (old_text, new_text) in enumerate(zip(old, new)) if old_text != new_text)
+        if changed != expected_changed:
+            return 'set_cell(%r, %r) on %r: changed %r, expected %r' % (ref, expr, rows, changed, expected_changed)
+        before = expected
+    return None
+
+
+def random_expression(rng, num_rows, num_columns):
+    tokens = []
+    for _ in range(rng.randint(0, 6)):
+        if rng.random() < 0.35:
+            tokens.append(utils.format_reference(utils.column_name(rng.randint(0, num_columns)),
+                                                 rng.randint(1, num_rows + 1)))
+        else:
+            tokens.append(rng.choice(TOKENS))
+    return ' '.join(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sheets', type=int, default=200)
+    parser.add_argument('--edits', type=int, default=8, help='Edits per random sheet')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = list(REGRESSION_CASES)
+    for _ in range(args.sheets):
+        num_rows = rng.randint(1, 8)
+        num_columns = rng.randint(1, 4)
+        rows = [[random_expression(rng, num_rows, num_columns) for _ in range(num_columns)] for _ in range(num_rows)]
+        edits = [(utils.format_reference(utils.column_name(rng.randrange(num_columns)), rng.randint(1, num_rows)),
+                  random_expression(rng, num_rows, num_columns)) for _ in range(args.edits)]
+        cases.append((rows, edits))
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        for rows, edits in cases:
+            error = check_edits(rows, edits, output_dir)
+            if error:
+                print('FAIL %s' % error)
+                sys.exit(1)
+    finally:
+        shutil.rmtree(output_dir)
+    print('ok, %d sheets, %d edits' % (len(cases), sum(len(edits) for _, edits in cases)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+import collections
+
+from array import array
+
+
+class DependencyGraph(object):
+    """
+        Graph of cell references of a sheet, by slot (see `sheet.py`).
+
+        An edge goes from a referenced slot to each slot referencing it, thus evaluating cells in
+        topological order guarantees every reference is evaluated before it is used. Forward edges
+        are the resolved references of the sheet itself, see `Sheet.references()`.
+
+        Reverse edges are built once, in compressed sparse row form: the dependents of slot s are
+        dependents[first[s]:first[s + 1]]. Edits add their edges to `added`. Edges dropped by edits
+        are not removed, they are filtered out against the current references of the sheet.
+
+        Interfaces:
+            DependencyGraph(): Constructor, builds the reverse edges of a sheet
+            add_cell(): Adds the edges of an edited cell
+            dependents_of(): Slots referencing a slot
+            transitive_dependents(): Cells affected by a change of a cell
+            topological_order(): Orders cells so that references come first
+    """
+
+    def __init__(self, sheet):
+        """
+            Constructor for `DependencyGraph`
+
+            Arguments:
+                sheet (Sheet): Loaded sheet
+
+            Returns:
+                `DependencyGraph` object
+        """
+        self.sheet = sheet
+        num_slots = sheet.num_slots()
+
+        first = array('q', bytes(8 * (num_slots + 1)))
+        for slot, reference in self.edges():
+            first[reference + 1] += 1
+        for slot in range(num_slots):
+            first[slot + 1] += first[slot]
+
+        dependents = array('q', bytes(8 * first[num_slots]))
+        fill = array('q', first)
+        for slot, reference in self.edges():
+            dependents[fill[reference]] = slot
+            fill[reference] += 1
+
+        self.first = first
+        self.dependents = dependents
+        self.added = collections.defaultdict(list)  # Dependents added by edits, by slot
+
+    def edges(self):
+        """
+            Forward edges of the sheet, one per reference of a cell
+
+            Returns:
+                generator of (slot, reference)
+        """
+        sheet = self.sheet
+        for group in sheet.groups:
+            if not group.loads:
+                continue
+            operands = group.operands
+            width = group.width
+            for position, slot in enumerate(group.slots):
+                if slot < 0:
+                    continue  # NOTE: Cell moved to another group
+                start = position * width
+                for load in group.loads:
+                    reference = operands[start + load]
+                    if reference >= 0:
+                        yield slot, reference
+        for slot in sheet.large_programs:
+            for reference in sheet.references(slot):
+                yield slot, reference
+
+    def add_cell(self, slot):
+        """
+            Adds the edges of an edited cell, from its current references
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                slot (integer)
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes self.added
+        """
+        for reference in self.sheet.references(slot):
+            self.added[reference].append(slot)
+
+    def dependents_of(self, slot):
+        """
+            Slots currently referencing a slot
+
+            Arguments:
+                slot (integer)
+
+            Returns:
+                dependents (list of integer)
+        """
+        dependents = set(self.added.get(slot, ()))
+        if slot + 1 < len(self.first):
+            dependents.update(self.dependents[self.first[slot]:self.first[slot + 1]])
+        references = self.sheet.references
+        return [dependent for dependent in dependents if slot in references(dependent)]
+
+    def transitive_dependents(self, slot):
+        """
+            Collects the cells whose value depends on a cell, directly or through other cells
+
+            Arguments:
+                slot (integer)
+
+            Returns:
+                cells (set of integer): Including slot itself
+        """
+        cells = {slot}
+        pending = [slot]
+        while pending:
+            for dependent in self.dependents_of(pending.pop()):
+                if dependent not in cells:
+                    cells.add(dependent)
+                    pending.append(dependent)
+        return cells
+
+    def topological_order(self, cells):
+        """
+            Orders cells so that every cell comes after the cells it references (Kahn's algorithm).
+            Iterative, thus arbitrarily long reference chains are supported.
+
+            Arguments:
+                cells (set of integer): References to other cells are considered evaluated already
+
+            Returns:
+                (order, cyclic):
+                    order (list of integer): Cells in evaluation order
+                    cyclic (list of integer): Cells on a reference cycle or referencing one. These
+                        can never be evaluated.
+        """
+        references = self.sheet.references
+        pending = {}  # Number of unevaluated references by cell
+        for slot in cells:
+            pending[slot] = len(references(slot) & cells)
+
+        ready = collections.deque(slot for slot, count in pending.items() if not count)
+        order = []
+        while ready:
+            slot = ready.popleft()
+            order.append(slot)
+            for dependent in self.dependents_of(slot):
+                if dependent in pending:
+                    pending[dependent] -= 1
+                    if not pending[dependent]:
+                        ready.append(dependent)
+
+        cyclic = [slot for slot, count in pending.items() if count]
+        return order, cyclic
+
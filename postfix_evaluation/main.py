@@ -16,6 +16,11 @@ from postfix_parser import PostfixParser
 DIR_PATH = './'
 INPUT_CSV_PATH = DIR_PATH + 'input.csv'
 OUTPUT_CSV_PATH = DIR_PATH + 'output.csv'
+# 'serial': `PostfixParser.evaluate()`
+# 'parallel': Independent cells of each dependency level across worker processes, see `parallel_evaluator.py`
+# 'vectorized': Cells of the same shape as NumPy array programs, see `vectorized_evaluator.py`
+EVALUATION_MODE = 'serial'
+WORKERS = None  # Worker processes of the 'parallel' mode, None for one per core
 
 
 def main():
@@ -26,7 +31,14 @@ def main():
     parser = PostfixParser(INPUT_CSV_PATH)
 
     # Evaluate: Postfix Expressions
-    parser.evaluate()
+    if EVALUATION_MODE == 'parallel':
+        from parallel_evaluator import DEFAULT_WORKERS, ParallelEvaluator
+        ParallelEvaluator(parser, WORKERS or DEFAULT_WORKERS).evaluate()
+    elif EVALUATION_MODE == 'vectorized':
+        from vectorized_evaluator import VectorizedEvaluator
+        VectorizedEvaluator(parser).evaluate()
+    else:
+        parser.evaluate()
 
     # Report: Produce Output Spreadsheet
     parser.generate_report(OUTPUT_CSV_PATH)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+    Level-parallel alternative to `PostfixParser.evaluate()`.
+
+    Cells at the same topological depth of the dependency graph are independent, see
+    `sheet_arrays.schedule()`. Levels are evaluated one after the other, the cells of a level are
+    split into ranges of the evaluation order evaluated across a pool of worker processes. Cells
+    without references form the first level.
+
+    Values live in shared memory, see `sheet_arrays.ArrayValues`: workers read the upstream cells
+    and write their results in place. The sheet and the evaluation order are inherited by the
+    forked workers, thus a task is a (start, stop) range only and its result is empty, except for
+    the rare integers beyond float64 precision. The parent does no work per cell.
+
+    NOTE: Levels smaller than a batch are evaluated in the parent process, shipping them costs
+    more than running them. Deep, narrow dependency structures therefore gain nothing, wide and
+    shallow ones scale with the number of workers.
+
+    NOTE: Requires the 'fork' start method.
+"""
+
+import itertools
+import multiprocessing
+import postfix_program
+
+import sheet_arrays
+
+from sheet_arrays import ArrayValues
+
+DEFAULT_WORKERS = multiprocessing.cpu_count()
+DEFAULT_BATCH_SIZE = 8192  # cells
+
+# NOTE: Set by the parent before the pool is forked, thus inherited by the worker processes
+FORKED_STATE = {}
+
+
+def run_range(task):
+    """
+        Worker process entry point, evaluates a range of the evaluation order
+
+        NOTE: This is not an idempotent fuction as it issues side effects
+
+        Arguments:
+            task (tuple): (start, stop, exact)
+                start, stop (integer): Range of `FORKED_STATE['order']`
+                exact (dictionary): Upstream integers beyond float64 precision, by slot
+
+        Returns:
+            exact (dictionary): Results beyond float64 precision, by slot
+
+        Side Effects:
+            Writes the shared values
+    """
+    start, stop, exact = task
+    sheet = FORKED_STATE['sheet']
+    values = FORKED_STATE['values']
+    values.exact.update(exact)
+
+    program = sheet.program
+    run_program = postfix_program.run_program
+    store = values.store
+    exact = {}
+    for slot in FORKED_STATE['order'][start:stop].tolist():
+        value = run_program(program(slot), values)
+        if not store(slot, value):
+            exact[slot] = value
+    return exact
+
+
+class ParallelEvaluator(object):
+    """
+        Multi-process postfix evaluation, level by level
+
+        Idempotent Interfaces:
+            ParallelEvaluator(): Constructor
+
+        Non-Idempotent Interfaces:
+            evaluate(): Evaluates every cell across worker processes
+            evaluate_level(): Evaluates independent cells across worker processes
+    """
+
+    def __init__(self, postfix_parser, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE):
+        """
+            Constructor for `ParallelEvaluator`
+
+            Arguments:
+                postfix_parser (PostfixParser): Parser owning the sheet
+                workers (integer): Number of worker processes
+                batch_size (integer): Cells per task
+
+            Returns:
+                `ParallelEvaluator` object
+        """
+        self.postfix_parser = postfix_parser
+        self.workers = workers
+        self.batch_size = batch_size
+        self.context = multiprocessing.get_context('fork')
+
+    def evaluate_level(self, pool, start, stop, values):
+        """
+            Evaluates cells that do not reference each other
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                pool (multiprocessing.Pool)
+                start, stop (integer): Range of the evaluation order holding the level
+                values (ArrayValues): Shared values, holds every upstream cell of the level
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes values
+        """
+        if stop - start <= self.batch_size:
+            run_range((start, stop, {}))
+            return
+
+        tasks = [(task_start, min(task_start + self.batch_size, stop), values.exact)
+                 for task_start in range(start, stop, self.batch_size)]
+        for exact in pool.map(run_range, tasks, chunksize=1):
+            values.exact.update(exact)
+
+    def evaluate(self):
+        """
+            Evaluates every cell, equivalent to `PostfixParser.evaluate()`
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                1. Starts worker processes
+                2. Writes postfix_parser.values
+        """
+        sheet = self.postfix_parser.sheet
+        order, segments, _ = sheet_arrays.schedule(sheet)
+
+        # NOTE: Zeroed, thus cyclic cells and the trailing `sheet.ERROR_SLOT` are '#ERR'
+        num_values = sheet.num_slots() + 1
+        values = ArrayValues(self.context.RawArray('d', num_values), self.context.RawArray('b', num_values))
+        FORKED_STATE.update(sheet=sheet, order=order, values=values)
+        try:
+            with self.context.Pool(self.workers) as pool:
+                for _, level in itertools.groupby(segments, lambda segment: segment.level):
+                    level = list(level)
+                    self.evaluate_level(pool, level[0].start, level[-1].stop, values)
+        finally:
+            FORKED_STATE.clear()
+        self.postfix_parser.values = values.to_list()
@@ -1,8 +1,17 @@
 #!/usr/bin/env python
 
-import pandas as pd
+import csv
+import postfix_program
 import utils
 
+from dependency_graph import DependencyGraph
+from postfix_program import ERROR
+from sheet import Sheet
+
+PENDING = object()  # Value of cells not evaluated yet
+ACTIVE = object()  # Value of cells waiting for their references to be evaluated
+
+
 class PostfixParser(object):
     """
         PostfixParser class.
@@ -14,18 +23,22 @@ class PostfixParser(object):
         Interfaces:
             PostfixParser(): Constructor that loads & parses input spreadsheet
             parser.evaluate(): Evaluate: Postfix Expressions
+            set_cell(): Edit a cell, recomputing only the cells depending on it
+            get_cell(): Evaluated output of a cell
             generate_report(): Report: Produce Output Spreadsheet
     """
 
     def __init__(self, input_csv_path):
         """
-            Construtor for `PostfixParser`. Loads, cleans, and dereferences spreadsheet
-            thus making it ready for postfix evaluation.
+            Construtor for `PostfixParser`. Loads, cleans, and builds the dependency graph of the
+            spreadsheet thus making it ready for postfix evaluation.
 
             Performs the following steps:
-                1. Loads spreadsheet into a dataframe.
-                2. Fills missing cells with default '0'
-                3. Substitutes cell reference pointers with corresponding value
+                1. Streams the spreadsheet into a sparse `Sheet`, see `sheet.py`
+                2. Leaves out empty cells, which default to '0'
+                3. Compiles cells and resolves their references
+
+            NOTE: The spreadsheet is read with the stdlib `csv` module, pandas is not needed
 
             Arguments:
                 input_csv_path (string)
@@ -37,23 +50,19 @@ class PostfixParser(object):
                 OSError: if any of the input file is not accessible
 
             Side Effects:
-                Writes self.spreadsheet_df
+                Writes self.sheet, self.values, self.dependency_graph
         """
+        self.sheet = Sheet()
+        self.sheet.load_csv(input_csv_path)
+        self.values = None  # Evaluated cells by slot, see `evaluate()`
+        self.dependency_graph = None  # Reverse references, built by the first `set_cell()`
 
-        # Load Spreadsheet
-        column_names = ['a', 'b', 'c', 'd']  # TODO(Future): Ideally this should be autogenerated
-        self.spreadsheet_df = pd.read_csv(input_csv_path, names=column_names, index_col=False)
-
-        # Shift down rows to start rows numbers by 1
-        self.spreadsheet_df.loc[len(self.spreadsheet_df)] = ''
-        self.spreadsheet_df[self.spreadsheet_df == ' '] = '0'   # NOTE: Substituting default '0' for empty cells
-        self.spreadsheet_df = self.spreadsheet_df.shift().dropna()
-
-        self.substitute_cells()
-
-    def substitute_cells(self):
+    def evaluate(self):
         """
-            Resursively substitute cell reference pointers with corresponding values
+            Runs each cell's compiled program exactly once, in slot order. A cell whose references
+            are not evaluated yet waits on a stack until they are (iterative depth-first traversal),
+            thus arbitrarily long reference chains are supported. Cells on a reference cycle, or
+            referencing one, evaluate to '#ERR'.
 
             Arguments:
                 None
@@ -65,61 +74,149 @@ class PostfixParser(object):
                 None
 
             Side Effects:
-                Writes self.spreadsheet_df
+                Writes self.values
+        """
+        sheet = self.sheet
+        groups = sheet.groups
+        group_ids = sheet.group_ids
+        positions = sheet.positions
+        run_program = postfix_program.run_program
+
+        values = [PENDING] * sheet.num_slots()
+        values.append(ERROR)  # NOTE: Value of `sheet.ERROR_SLOT`
+        for slot in range(sheet.num_slots()):
+            if values[slot] is not PENDING:
+                continue
+            stack = [slot]
+            while stack:
+                top = stack[-1]
+                values[top] = ACTIVE
+                group_id = group_ids[top]
+                if group_id >= 0:
+                    group = groups[group_id]
+                    start = positions[top] * group.width
+                    operands = group.operands[start:start + group.width]
+                    program = group.shape, operands
+                    references = [operands[load] for load in group.loads]
+                else:
+                    program = sheet.program(top)
+                    references = sheet.references(top)
+
+                value = None
+                for reference in references:
+                    upstream = values[reference]
+                    if upstream is PENDING:
+                        stack.append(reference)
+                        break
+                    if upstream is ACTIVE:  # NOTE: Reference cycle
+                        value = ERROR
+                        break
+                else:
+                    value = run_program(program, values)
+                if value is not None:
+                    values[top] = value
+                    stack.pop()
+        self.values = values
+
+    def cell_ref(self, ref):
         """
+            Validates a cell reference, e.g. 'b2', against the spreadsheet
 
-        for row in range(1, len(self.spreadsheet_df) + 1):
-            for col in self.spreadsheet_df.columns:
-                cell = self.spreadsheet_df[col][row]
-                self.spreadsheet_df[col][row] = utils.extract_token_reference(self.spreadsheet_df, cell)
+            Arguments:
+                ref (string)
 
+            Returns:
+                cell_ref (integer): Cell key, see `utils.cell_key()`
 
-    def evaluate(self):
+            Raises:
+                ValueError: if ref is not a valid reference
+                KeyError: if ref is outside the spreadsheet
         """
-            Evaluate each of the cells in spreadsheet_df using a stack
+        if not utils.isValidReference(ref):
+            raise ValueError('Invalid cell reference: %s' % ref)
+        cell_ref = utils.cell_key(*utils.parse_reference(ref))
+        if not self.sheet.contains(cell_ref):
+            raise KeyError('Cell outside the spreadsheet: %s' % ref)
+        return cell_ref
+
+    def set_cell(self, ref, expr):
+        """
+            Edits a single cell and recomputes the dirty cells only: the edited cell and its
+            transitive dependents, in topological order. A dependent whose references all kept their
+            values is not re-run.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
 
             Arguments:
-                None
+                ref (string): Cell reference, e.g. 'b2'
+                expr (string): Postfix expression, empty cells default to '0'
 
             Returns:
-                None
+                changed (set of string): References of the cells whose output changed, see
+                    `get_cell()`
 
             Raises:
-                None
+                ValueError: if ref is not a valid reference
+                KeyError: if ref is outside the spreadsheet
 
             Side Effects:
-                Writes self.spreadsheet_df
+                Writes self.sheet, self.values, self.dependency_graph
+        """
+        cell_ref = self.cell_ref(ref)
+        if self.values is None:
+            self.evaluate()
+        if self.dependency_graph is None:
+            self.dependency_graph = DependencyGraph(self.sheet)
+
+        sheet = self.sheet
+        slot = sheet.set_expression(cell_ref, expr)
+        if slot is None:
+            return set()  # NOTE: Empty cell left empty
+
+        values = self.values
+        while len(values) <= sheet.num_slots():
+            values.insert(-1, 0)  # NOTE: New slots of formerly empty cells
+        dependency_graph = self.dependency_graph
+        dependency_graph.add_cell(slot)
+        dirty = dependency_graph.transitive_dependents(slot)
+        order, cyclic = dependency_graph.topological_order(dirty)
+
+        changed = set()
+        for dirty_slot in cyclic:
+            if values[dirty_slot] is not ERROR:
+                values[dirty_slot] = ERROR
+                changed.add(dirty_slot)
+        for dirty_slot in order:
+            # NOTE: Early cutoff, none of the references changed
+            if dirty_slot != slot and changed.isdisjoint(sheet.references(dirty_slot)):
+                continue
+            value = postfix_program.run_program(sheet.program(dirty_slot), values)
+            if not postfix_program.same_value(value, values[dirty_slot]):
+                values[dirty_slot] = value
+                changed.add(dirty_slot)
+
+        return set(utils.format_reference(*utils.cell_coordinates(sheet.keys[changed_slot]))
+                   for changed_slot in changed)
+
+    def get_cell(self, ref):
+        """
+            Evaluated output of a cell, as written by `generate_report()`
+
+            Arguments:
+                ref (string): Cell reference, e.g. 'b2'
 
-            TODO(Future):
-                Raise:
-                  InvalidToken
-                  InvalidExpression
+            Returns:
+                text (string)
+
+            Raises:
+                ValueError: if ref is not a valid reference
+                KeyError: if ref is outside the spreadsheet
         """
-        for row in range(1, len(self.spreadsheet_df) + 1):
-            for col in self.spreadsheet_df.columns:
-                cell = self.spreadsheet_df[col][row]
-                stack = list()
-                try:
-                    for token in cell.split():
-                        if token.isnumeric():
-                            stack.append(token)
-                        elif token in '+-/*':
-                            operand1 = stack.pop()
-                            operand2 = stack.pop()
-                            result = str(eval(operand2 + token + operand1))
-                            stack.append(result)
-                        else:
-                            # raise 'InvalidToken'  # TODO(Future)
-                            pass
-
-                    if len(stack) == 1:
-                        self.spreadsheet_df[col][row] = stack.pop()
-                    else:
-                        self.spreadsheet_df[col][row] = '#ERR'
-                        # raise 'InvalidExpression' # TODO(Future)
-                except:
-                    self.spreadsheet_df[col][row] = '#ERR'
-                    # raise 'InvalidExpression'  # TODO(Future)
+        cell_ref = self.cell_ref(ref)
+        if self.values is None:
+            self.evaluate()
+        slot = self.sheet.slot(cell_ref)
+        return postfix_program.format_value(0 if slot is None else self.values[slot])
 
     def generate_report(self, csv_filepath):
         """
@@ -139,4 +236,14 @@ class PostfixParser(object):
             Side Effects:
                 Writing to a file
         """
-        self.spreadsheet_df.to_csv(path_or_buf=csv_filepath, index=False, header=None)
+        values = self.values
+        keys = self.sheet.keys
+        format_value = postfix_program.format_value
+        empty_row = [format_value(0)] * self.sheet.num_columns
+        with open(csv_filepath, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, lineterminator='\n')
+            for row, slots in self.sheet.rows():
+                fields = list(empty_row)
+                for slot in slots:
+                    fields[keys[slot] & utils.COLUMN_MASK] = format_value(values[slot])
+                writer.writerow(fields)
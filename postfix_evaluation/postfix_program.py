@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+    Compiled postfix expressions.
+
+    A cell's token stream is compiled once into a program that runs on native numbers, without
+    `eval()` and without converting operands to text and back at each step. A program is a
+    (shape, operands) pair:
+        shape (tuple): One opcode per instruction, shared by all programs of the same shape
+        operands (tuple): Arguments of the PUSH and LOAD instructions, in order
+
+    Opcodes:
+        PUSH: Pushes the next operand, an integer
+        LOAD: Pushes the memoized value of the cell referenced by the next operand, a cell key as
+            compiled, a slot once the sheet resolved it
+        Binary function, e.g. `operator.add`: Pops two operands and pushes the result
+
+    Values keep Python's arithmetic types, i.e. integers until a division yields a float, thus
+    results print exactly like the former `str(eval(...))` evaluation did.
+
+    Stack depth is static, therefore malformed expressions (stack underflow, leftover operands,
+    unknown operators) are rejected at compile time and never run.
+
+    NOTE: Sharing shapes keeps millions of compiled cells compact and lets cells of the same shape
+    be evaluated together, see `vectorized_evaluator.py`.
+"""
+
+import math
+import operator
+import utils
+
+ERROR = '#ERR'
+
+# NOTE: Small integers are singletons, opcodes are compared by identity even after pickling
+PUSH = 0
+LOAD = 1
+
+# NOTE: Operator tokens are matched the way the former `token in '+-/*'` test did, '+-' adds a
+# negated operand
+OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '+-': operator.sub,
+}
+UNKNOWN_OPERATORS = ('-/', '/*', '+-/', '-/*', '+-/*')
+
+SHAPES = {}  # Shared shapes
+
+
+def compile_expression(cell):
+    """
+        Compiles a postfix expression into a program
+
+        Arguments:
+            cell (string): Postfix expression
+
+        Returns:
+            (program, references):
+                program (tuple) or None: (shape, operands), None if the expression can never
+                    evaluate
+                references (list of integer): Referenced cell keys, see `utils.cell_key()`
+
+        Raises:
+            None
+
+        Side Effects:
+            Caches shared shapes
+    """
+    shape = []
+    operands = []
+    references = []
+    depth = 0
+    valid = True
+    for token in cell.split():
+        function = OPERATORS.get(token)
+        if function is not None:
+            shape.append(function)
+            depth -= 1
+            if depth < 1:
+                valid = False
+        elif token.isnumeric():
+            try:
+                operands.append(int(token))
+            except ValueError:  # NOTE: Numeric characters that are not digits, e.g. '½'
+                valid = False
+            shape.append(PUSH)
+            depth += 1
+        elif utils.isValidReference(token):
+            reference = utils.cell_key(*utils.parse_reference(token))
+            references.append(reference)
+            operands.append(reference)
+            shape.append(LOAD)
+            depth += 1
+        elif token in UNKNOWN_OPERATORS:
+            valid = False
+        else:
+            pass  # NOTE: Unknown tokens are ignored
+
+    if not valid or depth != 1:
+        return None, references
+    shape = tuple(shape)
+    return (SHAPES.setdefault(shape, shape), tuple(operands)), references
+
+
+def run_program(program, values):
+    """
+        Runs a compiled program
+
+        Arguments:
+            program (tuple) or None: See `compile_expression()`
+            values (sequence): Evaluated cells, `ERROR` for failed cells. Looked up with
+                `values[operand]` for LOAD instructions, i.e. by slot once references are
+                resolved, see `sheet.py`
+
+        Returns:
+            value (number) or `ERROR`: Failed references, division by zero and non-finite
+                intermediate or final results are errors
+
+        Raises:
+            None
+    """
+    if program is None:
+        return ERROR
+
+    shape, operands = program
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    position = 0
+    try:
+        for opcode in shape:
+            if opcode is PUSH:
+                push(operands[position])
+                position += 1
+            elif opcode is LOAD:
+                value = values[operands[position]]
+                if value is ERROR:
+                    return ERROR
+                push(value)
+                position += 1
+            else:
+                operand1 = pop()
+                result = opcode(pop(), operand1)
+                if result.__class__ is float and not math.isfinite(result):
+                    return ERROR
+                push(result)
+    except ArithmeticError:  # ZeroDivisionError, OverflowError
+        return ERROR
+    return stack[0]
+
+
+def format_value(value):
+    """
+        Formats an evaluated value for the report
+
+        Arguments:
+            value (number) or `ERROR`
+
+        Returns:
+            text (string)
+    """
+    if value is ERROR:
+        return ERROR
+    try:
+        return str(value)
+    except ValueError:  # NOTE: Integers beyond `sys.get_int_max_str_digits()`
+        return ERROR
+
+
+def same_value(value1, value2):
+    """
+        Whether two evaluated values are interchangeable, i.e. print the same and give the same
+        results when referenced
+
+        NOTE: Plain `==` is not enough, `1 == 1.0` and `-0.0 == 0.0` although both pairs print
+        differently
+
+        Arguments:
+            value1 (number) or `ERROR`
+            value2 (number) or `ERROR`
+
+        Returns:
+            bool
+    """
+    if value1.__class__ is not value2.__class__ or value1 != value2:
+        return False
+    return value1.__class__ is not float or math.copysign(1., value1) == math.copysign(1., value2)
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+"""
+    Sparse spreadsheet model.
+
+    Cells are identified by integer keys packing their column and row, see `utils.cell_key()`.
+    Every stored cell owns a slot, i.e. a dense index into flat arrays: the cell key, the shape
+    group and the position inside the group of each slot. Slots of loaded cells follow key order,
+    row by row, thus a key is found by bisecting the slots of its row.
+
+    Compiled programs are not stored one by one. Cells sharing a program shape (see
+    `postfix_program.py`) form a `ShapeGroup` holding the operands of all its cells in one flat
+    array. Once the sheet is loaded, references are resolved from cell keys to slots: evaluation
+    indexes values by slot and never looks up keys. Referenced empty cells get a slot holding 0,
+    references outside the sheet resolve to `ERROR_SLOT`.
+
+    Only non-empty cells, i.e. neither blank nor '0', and referenced empty cells are stored. The
+    expressions themselves are not kept. Columns are named 'a' to 'z', 'aa', 'ab' and so on, the
+    sheet is as wide as its widest row.
+
+    NOTE: Values are lists indexed by slot, followed by `ERROR` as the value of `ERROR_SLOT`
+"""
+
+import bisect
+import csv
+import postfix_program
+import utils
+
+from array import array
+from postfix_program import LOAD, PUSH
+
+EMPTY_CELLS = ('', ' ')  # NOTE: Cells defaulting to '0'
+EMPTY_PROGRAM = ((PUSH,), (0,))
+
+ERROR_SLOT = -1  # Slot of references outside the sheet
+ERROR_GROUP = -1  # Group of cells that never evaluate
+LARGE_GROUP = -2  # Group of cells with literals beyond 64 bits, see `Sheet.large_programs`
+
+
+class ShapeGroup(object):
+    """
+        Cells sharing one program shape. The operands of the cell at position p are
+        operands[p * width:(p + 1) * width].
+
+        Interfaces:
+            ShapeGroup(): Constructor for an empty group
+            append(): Adds the operands of a cell
+    """
+
+    def __init__(self, shape):
+        """
+            Constructor for `ShapeGroup`
+
+            Arguments:
+                shape (tuple): See `postfix_program.compile_expression()`
+
+            Returns:
+                `ShapeGroup` object
+        """
+        operand_opcodes = [opcode for opcode in shape if opcode is PUSH or opcode is LOAD]
+        self.shape = shape
+        self.width = len(operand_opcodes)  # Operands per cell
+        self.loads = tuple(index for index, opcode in enumerate(operand_opcodes) if opcode is LOAD)
+        self.slots = array('q')  # Slot of each cell, `ERROR_SLOT` once the cell moved to another group
+        self.operands = array('q')
+
+    def append(self, slot, operands):
+        """
+            Adds the operands of a cell
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                slot (integer)
+                operands (sequence of integer)
+
+            Returns:
+                position (integer): Position of the cell in the group
+
+            Raises:
+                OverflowError: if an operand exceeds 64 bits, the group is left unchanged
+
+            Side Effects:
+                Writes self.slots, self.operands
+        """
+        start = len(self.operands)
+        try:
+            self.operands.extend(operands)
+        except OverflowError:
+            del self.operands[start:]
+            raise
+        self.slots.append(slot)
+        return len(self.slots) - 1
+
+
+class Sheet(object):
+    """
+        Sparse sheet of compiled cells in flat arrays
+
+        Interfaces:
+            Sheet(): Constructor for an empty sheet
+            load_csv(): Streams a csv spreadsheet into the sheet
+            add_cell(): Stores a cell in a new slot
+            store(): Replaces the program of a slot
+            place(): Adds a program to the group of its shape
+            resolve(): Resolves the references of every loaded cell to slots
+            resolve_program(): Resolves the references of a program to slots
+            reference_slot(): Slot a reference resolves to
+            set_expression(): Compiles and stores a single cell of a loaded sheet
+            slot(): Slot of a cell key
+            program(): Compiled program of a slot
+            references(): Slots referenced by a slot
+            rows(): Slots of each row
+            num_slots(): Number of stored cells
+            contains(): Whether a cell key is inside the sheet
+            column_names(): Names of the sheet columns
+    """
+
+    def __init__(self):
+        """
+            Constructor for `Sheet`
+
+            Arguments:
+                None
+
+            Returns:
+                `Sheet` object
+        """
+        self.keys = array('q')  # Cell key by slot
+        self.group_ids = array('i')  # Index into self.groups by slot, or `ERROR_GROUP`, `LARGE_GROUP`
+        self.positions = array('i')  # Position inside its group by slot
+        self.groups = []  # `ShapeGroup` objects
+        self.group_index = {}  # Index into self.groups by shape
+        self.large_programs = {}  # Programs of `LARGE_GROUP` cells by slot
+        self.row_starts = array('q', [0])  # First slot of each loaded row, followed by the end
+        self.added_slots = {}  # Slots of cells stored after loading, by cell key
+        self.num_rows = 0
+        self.num_columns = 0
+
+    def load_csv(self, input_csv_path):
+        """
+            Streams a csv spreadsheet into an empty sheet, one row at a time, then resolves
+            references. Blank lines are skipped.
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                input_csv_path (string)
+
+            Returns:
+                None
+
+            Raises:
+                OSError: if input_csv_path is not accessible
+
+            Side Effects:
+                Writes the sheet
+        """
+        compile_expression = postfix_program.compile_expression
+        keys = self.keys
+        with open(input_csv_path, newline='') as csvfile:
+            for fields in csv.reader(csvfile):
+                if not fields:
+                    continue
+                # NOTE: Row numbers start by 1
+                self.num_rows += 1
+                self.num_columns = max(self.num_columns, len(fields))
+                row_key = self.num_rows << utils.COLUMN_BITS
+                for index, expr in enumerate(fields):
+                    if expr not in EMPTY_CELLS:
+                        program, _ = compile_expression(expr)
+                        if program != EMPTY_PROGRAM:
+                            group_id, position = self.place(len(keys), program)
+                            keys.append(row_key | index)
+                            self.group_ids.append(group_id)
+                            self.positions.append(position)
+                self.row_starts.append(len(keys))
+        self.resolve()
+
+    def add_cell(self, key, program):
+        """
+            Stores a cell in a new slot
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                key (integer): Cell key
+                program (tuple) or None: Compiled program
+
+            Returns:
+                slot (integer)
+
+            Side Effects:
+                Writes self.keys, self.group_ids, self.positions and the groups
+        """
+        slot = len(self.keys)
+        group_id, position = self.place(slot, program)
+        self.keys.append(key)
+        self.group_ids.append(group_id)
+        self.positions.append(position)
+        return slot
+
+    def store(self, slot, program):
+        """
+            Stores the program of a slot, replacing its former program
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                slot (integer)
+                program (tuple) or None: Compiled program
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes self.group_ids, self.positions and the groups
+        """
+        group_id = self.group_ids[slot]
+        if group_id >= 0:
+            # NOTE: Operands of the former program stay in place, unreferenced
+            self.groups[group_id].slots[self.positions[slot]] = ERROR_SLOT
+        elif group_id == LARGE_GROUP:
+            del self.large_programs[slot]
+        self.group_ids[slot], self.positions[slot] = self.place(slot, program)
+
+    def place(self, slot, program):
+        """
+            Adds a program to the group of its shape
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                slot (integer)
+                program (tuple) or None: Compiled program
+
+            Returns:
+                (group_id, position): See self.group_ids, self.positions
+
+            Side Effects:
+                Writes the groups, self.large_programs
+        """
+        if program is None:
+            return ERROR_GROUP, 0
+        shape, operands = program
+        group_id = self.group_index.get(shape)
+        if group_id is None:
+            group_id = self.group_index[shape] = len(self.groups)
+            self.groups.append(ShapeGroup(shape))
+        try:
+            return group_id, self.groups[group_id].append(slot, operands)
+        except OverflowError:
+            self.large_programs[slot] = program
+            return LARGE_GROUP, 0
+
+    def resolve(self):
+        """
+            Resolves the references of every loaded cell from cell keys to slots
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes the operands of every group, may store referenced empty cells
+        """
+        reference_slot = self.reference_slot
+        for group in self.groups:
+            if not group.loads:
+                continue
+            operands = group.operands
+            for start in range(0, len(operands), group.width):
+                for load in group.loads:
+                    operands[start + load] = reference_slot(operands[start + load])
+        for slot, program in list(self.large_programs.items()):
+            self.large_programs[slot] = self.resolve_program(program)
+
+    def resolve_program(self, program):
+        """
+            Resolves the references of a compiled program from cell keys to slots
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                program (tuple) or None
+
+            Returns:
+                program (tuple) or None
+
+            Side Effects:
+                May store referenced empty cells
+        """
+        if program is None:
+            return None
+        shape, operands = program
+        operands = list(operands)
+        opcodes = [opcode for opcode in shape if opcode is PUSH or opcode is LOAD]
+        for index, opcode in enumerate(opcodes):
+            if opcode is LOAD:
+                operands[index] = self.reference_slot(operands[index])
+        return shape, tuple(operands)
+
+    def reference_slot(self, key):
+        """
+            Slot a reference resolves to
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                key (integer): Referenced cell key
+
+            Returns:
+                slot (integer): `ERROR_SLOT` for cells outside the sheet
+
+            Side Effects:
+                Stores referenced empty cells as `EMPTY_PROGRAM`
+        """
+        slot = self.slot(key)
+        if slot is None:
+            if not self.contains(key):
+                return ERROR_SLOT
+            slot = self.added_slots[key] = self.add_cell(key, EMPTY_PROGRAM)
+        return slot
+
+    def set_expression(self, key, expr):
+        """
+            Compiles and stores a single cell of a loaded sheet, replacing its former program
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                key (integer): Cell key
+                expr (string): Postfix expression
+
+            Returns:
+                slot (integer) or None: None if the cell stays empty and unstored
+
+            Side Effects:
+                Writes the sheet
+        """
+        if expr in EMPTY_CELLS:
+            program = EMPTY_PROGRAM
+        else:
+            program, _ = postfix_program.compile_expression(expr)
+
+        slot = self.slot(key)
+        if slot is None:
+            if program == EMPTY_PROGRAM:
+                return None
+            # NOTE: Stored before resolving, thus references to the cell itself resolve
+            slot = self.added_slots[key] = self.add_cell(key, EMPTY_PROGRAM)
+        self.store(slot, self.resolve_program(program))
+        return slot
+
+    def slot(self, key):
+        """
+            Slot of a cell key
+
+            Arguments:
+                key (integer)
+
+            Returns:
+                slot (integer) or None: None for cells not stored
+        """
+        row = key >> utils.COLUMN_BITS
+        if 0 < row < len(self.row_starts):
+            start, end = self.row_starts[row - 1], self.row_starts[row]
+            index = bisect.bisect_left(self.keys, key, start, end)
+            if index < end and self.keys[index] == key:
+                return index
+        return self.added_slots.get(key)
+
+    def program(self, slot):
+        """
+            Compiled program of a slot, references resolved to slots
+
+            Arguments:
+                slot (integer)
+
+            Returns:
+                program (tuple) or None: See `postfix_program.compile_expression()`
+        """
+        group_id = self.group_ids[slot]
+        if group_id >= 0:
+            group = self.groups[group_id]
+            start = self.positions[slot] * group.width
+            return group.shape, group.operands[start:start + group.width]
+        return self.large_programs.get(slot)
+
+    def references(self, slot):
+        """
+            Slots referenced by a slot
+
+            Arguments:
+                slot (integer)
+
+            Returns:
+                references (set of integer): Without `ERROR_SLOT`
+        """
+        group_id = self.group_ids[slot]
+        if group_id >= 0:
+            group = self.groups[group_id]
+            operands = group.operands
+            start = self.positions[slot] * group.width
+            references = set([operands[start + load] for load in group.loads])
+        elif group_id == LARGE_GROUP:
+            shape, operands = self.large_programs[slot]
+            opcodes = [opcode for opcode in shape if opcode is PUSH or opcode is LOAD]
+            references = set([operand for opcode, operand in zip(opcodes, operands) if opcode is LOAD])
+        else:
+            return set()
+        references.discard(ERROR_SLOT)
+        return references
+
+    def rows(self):
+        """
+            Slots of each row
+
+            Returns:
+                generator of (row, slots): Rows from 1, slots in no particular order
+        """
+        added = {}
+        for key, slot in self.added_slots.items():
+            added.setdefault(key >> utils.COLUMN_BITS, []).append(slot)
+        for row in range(1, self.num_rows + 1):
+            slots = range(self.row_starts[row - 1], self.row_starts[row])
+            if row in added:
+                slots = list(slots) + added[row]
+            yield row, slots
+
+    def num_slots(self):
+        return len(self.keys)
+
+    def contains(self, key):
+        """
+            Whether a cell key is inside the sheet
+
+            Arguments:
+                key (integer)
+
+            Returns:
+                bool
+        """
+        return 1 <= key >> utils.COLUMN_BITS <= self.num_rows and (key & utils.COLUMN_MASK) < self.num_columns
+
+    def column_names(self):
+        return [utils.column_name(index) for index in range(self.num_columns)]
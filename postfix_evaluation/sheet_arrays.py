@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+"""
+    NumPy views of a sheet for the parallel and vectorized evaluators.
+
+    Evaluation order is computed once for the whole sheet, with array operations instead of a
+    loop per cell: every slot gets its topological level (see `topological_levels()`), then slots
+    are sorted by level and shape group. Each (level, group) run of the resulting order is a
+    `Segment`, i.e. independent cells sharing one program shape.
+
+    Values are held in a compact `ArrayValues` store: one float64 number and one int8 kind per
+    slot. Integers are exact in float64 below 2 ** 53, larger ones are kept as Python integers.
+
+    NOTE: Operand matrices are zero-copy views of the sheet's arrays, the sheet must not be
+    edited while they are alive
+"""
+
+import collections
+
+import numpy as np
+
+from postfix_program import ERROR
+from sheet import LARGE_GROUP
+
+# Kinds of values. NOTE: Zeroed memory holds errors only
+FAILED = 0
+INTEGER = 1
+FLOAT = 2
+EXACT = 3  # Integer beyond `EXACT_INTEGER_LIMIT`, see `ArrayValues.exact`
+
+EXACT_INTEGER_LIMIT = 2 ** 53  # Integers below are exact in float64
+
+# Cells of `order[start:stop]` are at the same level and share one shape group
+Segment = collections.namedtuple('Segment', ['level', 'group_id', 'start', 'stop'])
+
+
+def operand_matrix(group):
+    """
+        Operands of a shape group, one row per cell
+
+        Arguments:
+            group (ShapeGroup)
+
+        Returns:
+            operands (numpy.ndarray): int64, shape (cells, width)
+    """
+    return np.frombuffer(group.operands, dtype=np.int64).reshape(-1, group.width)
+
+
+def reference_edges(sheet):
+    """
+        Every reference of every cell, as two arrays
+
+        Arguments:
+            sheet (Sheet)
+
+        Returns:
+            (references, dependents) (numpy.ndarray): int64, edge i goes from slot references[i] to
+                slot dependents[i]
+    """
+    # NOTE: Operands of every group concatenated, with the owning slot and a LOAD flag per operand.
+    # Sheets hold many small groups, thus groups are joined as bytes rather than one array each.
+    groups = [group for group in sheet.groups if group.loads and len(group.slots)]
+    operands = np.frombuffer(b''.join([group.operands for group in groups]), dtype=np.int64)
+    slots = np.frombuffer(b''.join([group.slots for group in groups]), dtype=np.int64)
+    widths = np.array([group.width for group in groups], dtype=np.int64)
+    counts = np.array([len(group.slots) for group in groups], dtype=np.int64)
+    loads = np.frombuffer(b''.join([bytes(index in group.loads for index in range(group.width)) * len(group.slots)
+                                    for group in groups]), dtype=np.bool_)
+    owners = np.repeat(slots, np.repeat(widths, counts))
+    # NOTE: Cells moved to another group leave `ERROR_SLOT` behind
+    edges = loads & (operands >= 0) & (owners >= 0)
+    references = [operands[edges]]
+    dependents = [owners[edges]]
+
+    for slot in sheet.large_programs:
+        slot_references = list(sheet.references(slot))
+        references.append(np.array(slot_references, dtype=np.int64))
+        dependents.append(np.full(len(slot_references), slot, dtype=np.int64))
+    return np.concatenate(references), np.concatenate(dependents)
+
+
+def topological_levels(sheet):
+    """
+        Topological level of every slot (Kahn's algorithm, one array step per level). Cells without
+        references are on level 0, every other cell is one level above its deepest reference.
+
+        Arguments:
+            sheet (Sheet)
+
+        Returns:
+            levels (numpy.ndarray): int64 by slot, -1 for cells on a reference cycle or referencing
+                one
+    """
+    num_slots = sheet.num_slots()
+    references, dependents = reference_edges(sheet)
+    pending = np.bincount(dependents, minlength=num_slots)  # Number of unevaluated references by slot
+
+    # NOTE: Reverse edges in compressed sparse row form, the dependents of slot s are
+    # targets[first[s]:first[s + 1]]
+    targets = dependents[np.argsort(references, kind='stable')]
+    first = np.zeros(num_slots + 1, dtype=np.int64)
+    np.cumsum(np.bincount(references, minlength=num_slots), out=first[1:])
+
+    levels = np.full(num_slots, -1, dtype=np.int64)
+    level = np.flatnonzero(pending == 0)
+    depth = 0
+    while level.size:
+        levels[level] = depth
+        starts = first[level]
+        counts = first[level + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            break
+        edges = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        level_dependents = targets[edges]
+        np.subtract.at(pending, level_dependents, 1)
+        level = np.unique(level_dependents[pending[level_dependents] == 0])
+        depth += 1
+    return levels
+
+
+def schedule(sheet):
+    """
+        Evaluation order of the sheet
+
+        Arguments:
+            sheet (Sheet)
+
+        Returns:
+            (order, segments, cyclic):
+                order (numpy.ndarray): Slots sorted by level, then by shape group
+                segments (list of Segment): Runs of `order` by level and group, in order
+                cyclic (numpy.ndarray): Slots on a reference cycle or referencing one
+    """
+    levels = topological_levels(sheet)
+    group_ids = np.frombuffer(sheet.group_ids, dtype=np.int32)
+    cyclic = np.flatnonzero(levels < 0)
+    order = np.flatnonzero(levels >= 0)
+    order = order[np.lexsort((group_ids[order], levels[order]))]
+
+    order_levels = levels[order]
+    order_groups = group_ids[order]
+    bounds = np.flatnonzero((order_levels[1:] != order_levels[:-1]) | (order_groups[1:] != order_groups[:-1])) + 1
+    starts = [0] + bounds.tolist()
+    stops = bounds.tolist() + [len(order)]
+    segments = [Segment(int(order_levels[start]), int(order_groups[start]), start, stop)
+                for start, stop in zip(starts, stops) if start < stop]
+    return order, segments, cyclic
+
+
+class ArrayValues(object):
+    """
+        Evaluated cells by slot, in two flat buffers: a float64 number and an int8 kind per slot.
+        The last slot is `sheet.ERROR_SLOT`, it must be left `FAILED`.
+
+        Buffers may be shared memory, thus worker processes can read and write values in place.
+        Looked up with `values[slot]`, like the values list of `PostfixParser`, see
+        `postfix_program.run_program()`.
+
+        Interfaces:
+            ArrayValues(): Constructor over two buffers
+            store(): Writes a value
+            to_list(): Values as a list, see `PostfixParser.values`
+    """
+
+    def __init__(self, numbers, kinds, exact=None):
+        """
+            Constructor for `ArrayValues`
+
+            Arguments:
+                numbers (buffer): float64 by slot
+                kinds (buffer): int8 by slot, zeroed buffers hold `FAILED` cells only
+                exact (dictionary) or None: `EXACT` integers by slot
+
+            Returns:
+                `ArrayValues` object
+        """
+        self.numbers = memoryview(numbers).cast('B').cast('d')
+        self.kinds = memoryview(kinds).cast('B').cast('b')
+        self.exact = {} if exact is None else exact
+
+    def __getitem__(self, slot):
+        kind = self.kinds[slot]
+        if kind == INTEGER:
+            return int(self.numbers[slot])
+        if kind == FLOAT:
+            return self.numbers[slot]
+        if kind == FAILED:
+            return ERROR
+        return self.exact[slot]
+
+    def store(self, slot, value):
+        """
+            Writes a value
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                slot (integer)
+                value (number) or `ERROR`
+
+            Returns:
+                bool: False for integers kept in self.exact
+
+            Side Effects:
+                Writes the buffers, self.exact
+        """
+        if value is ERROR:
+            self.kinds[slot] = FAILED
+        elif value.__class__ is float:
+            self.numbers[slot] = value
+            self.kinds[slot] = FLOAT
+        elif -EXACT_INTEGER_LIMIT < value < EXACT_INTEGER_LIMIT:
+            self.numbers[slot] = float(value)
+            self.kinds[slot] = INTEGER
+        else:
+            self.exact[slot] = value
+            self.kinds[slot] = EXACT
+            return False
+        return True
+
+    def to_list(self):
+        """
+            Values as a list of Python numbers and `ERROR`, by slot
+
+            Returns:
+                values (list)
+        """
+        numbers = np.frombuffer(self.numbers, dtype=np.float64)
+        kinds = np.frombuffer(self.kinds, dtype=np.int8)
+        values = numbers.astype(object)
+        integers = kinds == INTEGER
+        values[integers] = numbers[integers].astype(np.int64).astype(object)
+        values[kinds == FAILED] = ERROR
+        for slot, value in self.exact.items():
+            values[slot] = value
+        return values.tolist()
+
@@ -1,8 +1,17 @@
 #!/usr/bin/env python
 
+import re
+import string
+
+REFERENCE_PATTERN = re.compile(r'([A-Za-z]+)([0-9]+)')
+COLUMN_BITS = 32  # NOTE: Cell keys pack the column index into the low bits, the row into the high bits
+COLUMN_MASK = (1 << COLUMN_BITS) - 1
+OUTSIDE_KEY = -1  # Key of references that can never be inside a sheet
+
+
 def isValidReference(token):
     """
-        Validate a Token Reference Syntax
+        Validate a Token Reference Syntax: column letters followed by a row number, e.g. 'b2', 'aa10'
 
         Arguments:
             token: string
@@ -16,41 +25,113 @@ def isValidReference(token):
         Side Effects:
             None
     """
-    if len(token) == 2 and token[0].isalpha() and token[1].isnumeric():
+    if REFERENCE_PATTERN.fullmatch(token):
         return True
     else:
         return False
 
 
-def extract_token_reference(spreadsheet_df, cell):
+def parse_reference(token):
     """
-        Resursively dereference cell reference pointers with corresponding values.
+        Splits a valid token reference into its cell coordinates
+
+        NOTE: Column letters are case insensitive
 
         Arguments:
-            spreadsheet_df: source spreadsheet dataframe
-            cell: cell to be dereferenced
+            token: string, see `isValidReference()`
 
         Returns:
+            (column, row): Reference rows start from 1
+
+        Raises:
             None
 
+        Side Effects:
+            None
+    """
+    col, row = REFERENCE_PATTERN.fullmatch(token).groups()
+    return col.lower(), int(row)
+
+
+def format_reference(col, row):
+    """
+        Formats cell coordinates as a token reference, inverse of `parse_reference()`
+
+        Arguments:
+            col: string
+            row: integer
+
+        Returns:
+            token: string
+
         Raises:
             None
 
         Side Effects:
             None
     """
+    return '%s%d' % (col, row)
+
+
+def column_index(col):
+    """
+        Position of a column, counting from 0: 'a' is 0, 'z' is 25, 'aa' is 26
+
+        Arguments:
+            col: string of lowercase letters
 
-    substituted_tokens = []
-    for token in cell.split():
-        if isValidReference(token):
-            # Extract token references
-            col_ref = token[0]
-            row_ref = int(token[1])  # Reference rows start from 1
-            ref_cell = spreadsheet_df[col_ref][row_ref]
-            # NOTE: Recurssively evaluating the substituted cell
-            token = extract_token_reference(spreadsheet_df, ref_cell)
-        else:
-            pass # do nothing
-        substituted_tokens.append(token)
-    # Return cell with tokens references substituted
-    return ' '.join(substituted_tokens)
+        Returns:
+            index: integer
+    """
+    index = 0
+    for letter in col:
+        index = index * 26 + ord(letter) - ord('a') + 1
+    return index - 1
+
+
+def column_name(index):
+    """
+        Letters of a column, inverse of `column_index()`
+
+        Arguments:
+            index: integer
+
+        Returns:
+            col: string
+    """
+    letters = []
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters.append(string.ascii_lowercase[remainder])
+    return ''.join(reversed(letters))
+
+
+def cell_key(col, row):
+    """
+        Packs cell coordinates into a single integer, the compact cell identifier of a sheet
+
+        Arguments:
+            col: string of lowercase letters
+            row: integer
+
+        Returns:
+            key: integer, `OUTSIDE_KEY` for columns beyond `COLUMN_BITS`
+    """
+    index = column_index(col)
+    if index > COLUMN_MASK:
+        return OUTSIDE_KEY
+    return row << COLUMN_BITS | index
+
+
+def cell_coordinates(key):
+    """
+        Unpacks a cell key, inverse of `cell_key()`
+
+        Arguments:
+            key: integer
+
+        Returns:
+            (column, row)
+    """
+    return column_name(key & COLUMN_MASK), key >> COLUMN_BITS
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+    Vectorized alternative to `PostfixParser.evaluate()`.
+
+    The evaluation order is computed once, see `sheet_arrays.schedule()`: cells are sorted by
+    dependency level (cells without references come first), then by the shape of their compiled
+    program, i.e. the sequence of PUSH / LOAD / operator opcodes regardless of operands, see
+    `postfix_program.py`. Each (level, shape) segment is evaluated as one NumPy array program:
+    operands are gathered as columns straight from the operand arrays of the sheet, every operator
+    is applied to whole columns at once. Division by zero, failed references and non-finite
+    results are tracked in a per-cell '#ERR' mask instead of stopping evaluation. Malformed cells
+    never compile, thus are '#ERR' without being evaluated.
+
+    Values are one dense float64 array indexed by slot with a kind per slot, see
+    `sheet_arrays.ArrayValues`, thus LOAD operands are fancy indexing and results are scattered
+    back in one assignment. Results are ints and floats exactly as in
+    `postfix_program.run_program()`. Integers are only exact below 2 ** 53, cells reaching that
+    magnitude are re-run with `postfix_program.run_program()` on Python numbers, keeping output
+    identical to the serial evaluation.
+
+    NOTE: Segments smaller than `min_group_size` are run cell by cell, vectorizing them costs more
+    than it saves. Irregular sheets therefore gain nothing, large regular ones gain most.
+"""
+
+import operator
+
+import numpy as np
+import postfix_program
+
+import sheet_arrays
+
+from postfix_program import LOAD, PUSH
+from sheet import ERROR_GROUP
+from sheet_arrays import EXACT, EXACT_INTEGER_LIMIT, FAILED, FLOAT, INTEGER, ArrayValues
+
+DEFAULT_MIN_GROUP_SIZE = 64  # cells
+
+
+class VectorizedEvaluator(object):
+    """
+        Array program postfix evaluation, shape group by shape group
+
+        Idempotent Interfaces:
+            VectorizedEvaluator(): Constructor
+            operand_columns(): Gathers the operands of cells as value columns and their masks
+
+        Non-Idempotent Interfaces:
+            evaluate(): Evaluates every cell
+            evaluate_segment(): Evaluates independent cells of the same shape
+            evaluate_group(): Evaluates cells of the same shape as one array program
+    """
+
+    def __init__(self, postfix_parser, min_group_size=DEFAULT_MIN_GROUP_SIZE):
+        """
+            Constructor for `VectorizedEvaluator`
+
+            Arguments:
+                postfix_parser (PostfixParser): Parser owning the sheet
+                min_group_size (integer): Smallest segment evaluated as an array program
+
+            Returns:
+                `VectorizedEvaluator` object
+        """
+        self.postfix_parser = postfix_parser
+        self.min_group_size = min_group_size
+
+    @staticmethod
+    def operand_columns(group, positions, numbers, kinds):
+        """
+            Gathers the operands of cells as value columns and their masks
+
+            Arguments:
+                group (ShapeGroup): Group of the cells
+                positions (numpy.ndarray): Positions of the cells inside the group
+                numbers (numpy.ndarray): float64 values by slot
+                kinds (numpy.ndarray): Kinds of values by slot, see `sheet_arrays.py`
+
+            Returns:
+                (columns, errors, inexact):
+                    columns (list of tuple): (values, integers) by operand, float64 values and a
+                        boolean mask of integer cells
+                    errors (numpy.ndarray): Cells referencing a failed cell
+                    inexact (numpy.ndarray): Cells with an operand not exactly representable
+        """
+        operands = sheet_arrays.operand_matrix(group)[positions]
+        errors = np.zeros(len(positions), dtype=bool)
+        inexact = np.zeros(len(positions), dtype=bool)
+        columns = []
+        for index in range(group.width):
+            operand = operands[:, index]
+            if index in group.loads:
+                operand_kinds = kinds[operand]
+                errors |= operand_kinds == FAILED
+                inexact |= operand_kinds == EXACT
+                columns.append((numbers[operand], operand_kinds != FLOAT))
+            else:
+                inexact |= operand >= EXACT_INTEGER_LIMIT
+                columns.append((operand.astype(np.float64), np.ones(len(positions), dtype=bool)))
+        return columns, errors, inexact
+
+    def evaluate_group(self, group, slots, positions, values):
+        """
+            Evaluates cells of the same shape as one array program
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                group (ShapeGroup): Group of the cells
+                slots (numpy.ndarray): Slots of the cells
+                positions (numpy.ndarray): Positions of the cells inside the group
+                values (ArrayValues): Holds every upstream cell of the cells
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes values
+        """
+        numbers = np.frombuffer(values.numbers, dtype=np.float64)
+        kinds = np.frombuffer(values.kinds, dtype=np.int8)
+        columns, errors, inexact = self.operand_columns(group, positions, numbers, kinds)
+
+        stack = []
+        columns = iter(columns)
+        with np.errstate(all='ignore'):
+            for opcode in group.shape:
+                if opcode is PUSH or opcode is LOAD:
+                    stack.append(next(columns))
+                    continue
+
+                operand2, integers2 = stack.pop()
+                operand1, integers1 = stack.pop()
+                if opcode is operator.truediv:
+                    zeros = operand2 == 0
+                    errors |= zeros
+                    result = operand1 / np.where(zeros, 1., operand2)
+                    integers = np.zeros(len(slots), dtype=bool)
+                else:
+                    result = opcode(operand1, operand2)
+                    integers = integers1 & integers2
+                    inexact |= integers & (np.abs(result) >= EXACT_INTEGER_LIMIT)
+                    # NOTE: Python integers have no -0.0, e.g. 0 * (0 - 1) is 0
+                    np.add(result, 0., out=result, where=integers)
+                errors |= ~integers & ~np.isfinite(result)
+                stack.append((result, integers))
+
+        result, integers = stack.pop()
+        numbers[slots] = result
+        kinds[slots] = np.where(errors, FAILED, np.where(integers, INTEGER, FLOAT))
+        program = self.postfix_parser.sheet.program
+        for slot in slots[inexact].tolist():
+            values.store(slot, postfix_program.run_program(program(slot), values))
+
+    def evaluate_segment(self, group_id, slots, positions, values):
+        """
+            Evaluates cells that do not reference each other and share one shape group
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                group_id (integer): See `Sheet.group_ids`
+                slots (numpy.ndarray): Slots of the cells
+                positions (numpy.ndarray): Positions of the cells inside the group
+                values (ArrayValues): Holds every upstream cell of the cells
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes values
+        """
+        if group_id == ERROR_GROUP:
+            return  # NOTE: Values are '#ERR' until written
+        if group_id < 0 or len(slots) < self.min_group_size:
+            program = self.postfix_parser.sheet.program
+            for slot in slots.tolist():
+                values.store(slot, postfix_program.run_program(program(slot), values))
+        else:
+            self.evaluate_group(self.postfix_parser.sheet.groups[group_id], slots, positions, values)
+
+    def evaluate(self):
+        """
+            Evaluates every cell, equivalent to `PostfixParser.evaluate()`
+
+            NOTE: This is not an idempotent fuction as it issues side effects
+
+            Arguments:
+                None
+
+            Returns:
+                None
+
+            Side Effects:
+                Writes postfix_parser.values
+        """
+        sheet = self.postfix_parser.sheet
+        order, segments, _ = sheet_arrays.schedule(sheet)
+        positions = np.frombuffer(sheet.positions, dtype=np.int32)[order]
+
+        # NOTE: Zeroed, thus cyclic cells and the trailing `sheet.ERROR_SLOT` are '#ERR'
+        num_values = sheet.num_slots() + 1
+        values = ArrayValues(np.zeros(num_values, dtype=np.float64), np.zeros(num_values, dtype=np.int8))
+        for segment in segments:
+            self.evaluate_segment(segment.group_id, order[segment.start:segment.stop],
+                                  positions[segment.start:segment.stop], values)
+        self.postfix_parser.values = values.to_list()